@@ -0,0 +1,93 @@
+"""
+Helpers shared by the benchmarks: latency percentiles, peak memory and the JSON report.
+"""
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+
+def percentile(values: List[float], percentile: float) -> float:
+    _sorted = sorted(values)
+    return _sorted[min(len(_sorted) - 1, int(round(percentile / 100 * (len(_sorted) - 1))))]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """
+    Summarizes the measured durations.
+    Args:
+        values (List[float]): The durations in seconds.
+    Returns:
+        Dict[str, float]: The number of samples, the mean, the p50 and the p95 in seconds.
+    """
+    return {
+        "samples": len(values),
+        "mean": sum(values) / len(values),
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+    }
+
+
+def _maxrss_bytes(maxrss: int) -> int:
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def peak_rss() -> Optional[int]:
+    """
+    Returns the peak resident set size of the current process in bytes, None if the platform does not report it.
+    """
+    if resource is None:
+        return None
+    return _maxrss_bytes(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def wait_for_peak_rss(process: subprocess.Popen) -> Optional[int]:
+    """
+    Waits for the child process and returns its peak resident set size in bytes, None if the platform does not report it.
+    Args:
+        process (subprocess.Popen): The child process.
+    Returns:
+        Optional[int]: The peak resident set size of the child process.
+    Raises:
+        RuntimeError: If the child process failed.
+    """
+    if not hasattr(os, "wait4"):
+        process.wait()
+        _maxrss = None
+    else:
+        _, _status, _usage = os.wait4(process.pid, 0)
+        # the process is reaped by wait4, so Popen must not wait for it again
+        process.returncode = os.waitstatus_to_exitcode(_status)
+        _maxrss = _maxrss_bytes(_usage.ru_maxrss)
+    if process.returncode != 0:
+        raise RuntimeError(f"{process.args[1] if len(process.args) > 1 else process.args[0]} exited with {process.returncode}")
+    return _maxrss
+
+
+def write_results(path: str, benchmark: str, parameters: Dict[str, Any], results: List[Dict[str, Any]]) -> None:
+    """
+    Writes the results as JSON, together with the parameters and the environment, so runs can be compared over time.
+    Args:
+        path (str): The path of the JSON file.
+        benchmark (str): The name of the benchmark.
+        parameters (Dict[str, Any]): The parameters of the run.
+        results (List[Dict[str, Any]]): The measured results.
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "benchmark": benchmark,
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "parameters": parameters,
+            "results": results,
+        }, f, indent=2)
@@ -0,0 +1,131 @@
+"""
+Measures the start-up of the command line entry points against the stub Ollama.
+
+Every run is a separate process started with 'python -X importtime', so its wall time includes the interpreter
+start-up and the imports, and the slowest top-level imports are reported from its import time log:
+    help      - '--help' of chat.py, serve.py and embedding_files_processor.py,
+    noop      - embedding_files_processor.py on a corpus indexed by the previous run, nothing changed,
+    client    - chat.py --server against a running serve.py, one question and 'exit'.
+The processor and the server work on a small synthetic corpus indexed before the measurement.
+
+Run it with:
+    python -m benchmarks.import_time --files 200 --repeats 5 --output import_time.json
+"""
+import http.client
+import os
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Dict, List, Tuple
+from benchmarks.common import summarize, write_results
+from benchmarks.ingestion import _build_corpus
+from benchmarks.stub_ollama import StubOllamaConfig, StubOllamaServer
+
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)\s*$")
+
+
+def _top_imports(log: str, count: int) -> List[Tuple[str, float]]:
+    # the top-level imports are not indented, their cumulative time includes the modules they import
+    _imports = []
+    for line in log.splitlines():
+        _match = _IMPORT_LINE.match(line)
+        if _match is not None and not _match.group(3):
+            _imports.append((_match.group(4), int(_match.group(2)) / 1e6))
+    return sorted(_imports, key=lambda item: item[1], reverse=True)[:count]
+
+
+def _run(arguments: List[str], stdin: str = None) -> Tuple[float, str]:
+    _started = time.perf_counter()
+    process = subprocess.run([sys.executable, "-X", "importtime"] + arguments, cwd=_ROOT, input=stdin,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    _seconds = time.perf_counter() - _started
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(arguments)} exited with {process.returncode}: {process.stderr[-500:]}")
+    return _seconds, process.stderr
+
+
+def _measure(name: str, arguments: List[str], repeats: int, top: int, stdin: str = None) -> Dict[str, object]:
+    _seconds, _log = [], ""
+    for _ in range(repeats):
+        _duration, _log = _run(arguments, stdin)
+        _seconds.append(_duration)
+    _imports = _top_imports(_log, top)
+    return {
+        "scenario": name,
+        "seconds": summarize(_seconds),
+        "imported_modules": sum(1 for line in _log.splitlines() if _IMPORT_LINE.match(line)),
+        "top_imports": [{"module": module, "seconds": seconds} for module, seconds in _imports],
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as _socket:
+        _socket.bind(("127.0.0.1", 0))
+        return _socket.getsockname()[1]
+
+
+def _wait_for_server(port: int, process: subprocess.Popen, timeout: float = 120) -> None:
+    _deadline = time.monotonic() + timeout
+    while time.monotonic() < _deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"serve.py exited with {process.returncode}")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/health")
+            connection.getresponse().read()
+            connection.close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError("serve.py did not start")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark the start-up and the imports of the command line entry points')
+    parser.add_argument('--files', type=int, default=200, help='Number of documents in the corpus of the no-op run and of the server')
+    parser.add_argument('--words', type=int, default=300, help='Number of words per document')
+    parser.add_argument('--repeats', type=int, default=5, help='Number of runs of every scenario')
+    parser.add_argument('--top', type=int, default=5, help='Number of the slowest top-level imports reported per scenario')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    results = [_measure(f"help {script}", [script, "--help"], args.repeats, args.top)
+               for script in ["chat.py", "serve.py", "embedding_files_processor.py"]]
+
+    with StubOllamaServer(config=StubOllamaConfig()) as stub, tempfile.TemporaryDirectory() as workspace:
+        directory = os.path.join(workspace, "corpus")
+        chroma_db_path = os.path.join(workspace, "chroma_db")
+        _build_corpus(directory, args.files, args.words)
+        _processor = ["embedding_files_processor.py",
+                      "--directory-to-analyze", directory,
+                      "--extensions", ".md",
+                      "--chroma-db-path", chroma_db_path,
+                      "--ollama-base-url", stub.base_url]
+        _run(_processor)
+        results.append(_measure("noop embedding_files_processor.py", _processor, args.repeats, args.top))
+
+        port = _free_port()
+        server = subprocess.Popen(
+            [sys.executable, "serve.py", "--port", str(port), "--chroma-db-path", chroma_db_path, "--ollama-base-url", stub.base_url],
+            cwd=_ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            _wait_for_server(port, server)
+            results.append(_measure("client chat.py --server", ["chat.py", "--server", f"http://127.0.0.1:{port}"],
+                                    args.repeats, args.top, stdin="What is term42?\nexit\n"))
+        finally:
+            server.terminate()
+            server.wait()
+
+    for result in results:
+        _imports = ", ".join(f"{item['module']} {item['seconds'] * 1000:.0f} ms" for item in result["top_imports"])
+        print(f"{result['scenario']:>36}  p50={result['seconds']['p50'] * 1000:7.0f} ms  p95={result['seconds']['p95'] * 1000:7.0f} ms  "
+              f"{result['imported_modules']:5d} modules  (slowest: {_imports})")
+
+    if args.output:
+        write_results(args.output, "import_time", {key: value for key, value in vars(args).items() if key != "output"}, results)
@@ -0,0 +1,145 @@
+"""
+Measures end-to-end runs of embedding_files_processor.py against the stub Ollama on a synthetic corpus.
+
+Every repeat starts with an empty ChromaDB and runs the scenarios one after another:
+    cold      - the whole corpus is embedded,
+    noop      - nothing changed since the previous run,
+    changed   - '--changed-fraction' of the files got a new paragraph,
+    deleted   - '--deleted-fraction' of the files were deleted.
+Every run is a separate process, so its wall time includes the start-up and its peak RSS is measured alone.
+The processor runs with --reload, otherwise the stored chunks of changed files are kept.
+The number of embedded chunks is counted by the stub.
+
+Run it with:
+    python -m benchmarks.ingestion --files 2000 --repeats 3 --output ingestion.json
+"""
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Dict, List
+from benchmarks.common import summarize, wait_for_peak_rss, write_results
+from benchmarks.stub_ollama import StubOllamaConfig, StubOllamaServer
+
+
+_SCENARIOS = ["cold", "noop", "changed", "deleted"]
+_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "embedding_files_processor.py")
+
+
+def _write_document(path: str, index: int, words: int, revision: int = 0) -> None:
+    _random = random.Random(index * 1000 + revision)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(f"# Document {index}\n\n")
+        for paragraph in range(0, words, 100):
+            f.write(" ".join(f"term{_random.randrange(5000)}" for _ in range(min(100, words - paragraph))) + "\n\n")
+
+
+def _build_corpus(directory: str, files: int, words: int) -> List[str]:
+    _paths = []
+    for index in range(files):
+        _folder = os.path.join(directory, f"folder_{index // 100}")
+        os.makedirs(_folder, exist_ok=True)
+        _paths.append(os.path.join(_folder, f"doc_{index}.md"))
+        _write_document(_paths[-1], index, words)
+    return _paths
+
+
+def _embedded_texts(stub: StubOllamaServer) -> int:
+    with stub.stats_lock:
+        return stub.stats.get("embedded_texts", 0)
+
+
+def _run_processor(stub: StubOllamaServer, directory: str, chroma_db_path: str, extra_args: List[str]) -> Dict[str, float]:
+    _embedded = _embedded_texts(stub)
+    _started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, _SCRIPT,
+         "--directory-to-analyze", directory,
+         "--extensions", ".md",
+         "--chroma-db-path", chroma_db_path,
+         "--ollama-base-url", stub.base_url,
+         "--reload"] + extra_args,
+        stdout=subprocess.DEVNULL)
+    _peak_rss = wait_for_peak_rss(process)
+    return {
+        "seconds": time.perf_counter() - _started,
+        "chunks": _embedded_texts(stub) - _embedded,
+        "peak_rss_bytes": _peak_rss,
+    }
+
+
+def _run_repeat(stub: StubOllamaServer, workspace: str, args) -> Dict[str, Dict[str, float]]:
+    directory = os.path.join(workspace, "corpus")
+    chroma_db_path = os.path.join(workspace, "chroma_db")
+    paths = _build_corpus(directory, args.files, args.words)
+    _random = random.Random(args.files)
+    runs = {}
+
+    runs["cold"] = _run_processor(stub, directory, chroma_db_path, args.processor_args)
+    runs["cold"]["files"] = len(paths)
+
+    runs["noop"] = _run_processor(stub, directory, chroma_db_path, args.processor_args)
+    runs["noop"]["files"] = len(paths)
+
+    _changed = _random.sample(range(len(paths)), max(1, int(len(paths) * args.changed_fraction)))
+    for index in _changed:
+        with open(paths[index], "a", encoding="utf-8") as f:
+            f.write(f"\n\nA new paragraph of document {index} about term{index}.\n")
+    runs["changed"] = _run_processor(stub, directory, chroma_db_path, args.processor_args)
+    runs["changed"]["files"] = len(_changed)
+
+    _deleted = _random.sample(range(len(paths)), max(1, int(len(paths) * args.deleted_fraction)))
+    for index in _deleted:
+        os.remove(paths[index])
+    runs["deleted"] = _run_processor(stub, directory, chroma_db_path, args.processor_args)
+    runs["deleted"]["files"] = len(_deleted)
+    return runs
+
+
+def _summarize_scenario(scenario: str, runs: List[Dict[str, float]]) -> Dict[str, object]:
+    _seconds = [run["seconds"] for run in runs]
+    _peak_rss = [run["peak_rss_bytes"] for run in runs if run["peak_rss_bytes"] is not None]
+    return {
+        "scenario": scenario,
+        "files": runs[0]["files"],
+        "chunks": runs[0]["chunks"],
+        "seconds": summarize(_seconds),
+        "files_per_second": runs[0]["files"] / summarize(_seconds)["p50"],
+        "chunks_per_second": runs[0]["chunks"] / summarize(_seconds)["p50"],
+        "peak_rss_bytes": max(_peak_rss) if _peak_rss else None,
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark the embedding files processor against the stub Ollama')
+    parser.add_argument('--files', type=int, default=1000, help='Number of documents in the corpus')
+    parser.add_argument('--words', type=int, default=600, help='Number of words per document')
+    parser.add_argument('--repeats', type=int, default=3, help='Number of repeats of every scenario')
+    parser.add_argument('--changed-fraction', type=float, default=0.01, help='Fraction of the documents changed before the changed run')
+    parser.add_argument('--deleted-fraction', type=float, default=0.1, help='Fraction of the documents deleted before the deleted run')
+    parser.add_argument('--embed-latency', type=float, default=0.002, help='Stub latency of an embedding request in seconds')
+    parser.add_argument('--embed-item-latency', type=float, default=0.0005, help='Stub latency per embedded text in seconds')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    parser.add_argument('processor_args', nargs='*', help='Extra arguments of embedding_files_processor.py after --, e.g. -- --workers 8')
+    args = parser.parse_args()
+
+    config = StubOllamaConfig(embed_latency=args.embed_latency, embed_item_latency=args.embed_item_latency)
+    runs: Dict[str, List[Dict[str, float]]] = {scenario: [] for scenario in _SCENARIOS}
+    with StubOllamaServer(config=config) as stub:
+        for _ in range(args.repeats):
+            with tempfile.TemporaryDirectory() as workspace:
+                for scenario, run in _run_repeat(stub, workspace, args).items():
+                    runs[scenario].append(run)
+
+    results = [_summarize_scenario(scenario, runs[scenario]) for scenario in _SCENARIOS]
+    for result in results:
+        _peak_rss = f"{result['peak_rss_bytes'] / 2 ** 20:7.1f} MiB" if result["peak_rss_bytes"] is not None else "n/a"
+        print(f"{result['scenario']:>8}  files={result['files']:>6}  chunks={result['chunks']:>7}  "
+              f"p50={result['seconds']['p50']:7.2f}s  p95={result['seconds']['p95']:7.2f}s  "
+              f"files/s={result['files_per_second']:9.1f}  chunks/s={result['chunks_per_second']:8.1f}  peak RSS={_peak_rss}")
+
+    if args.output:
+        write_results(args.output, "ingestion", {key: value for key, value in vars(args).items() if key != "output"}, results)
@@ -0,0 +1,107 @@
+"""
+Measures the throughput of the chat HTTP server (serve.py) at N concurrent clients against the stub Ollama.
+
+A small synthetic corpus is indexed into a temporary Chroma database, then every client sends
+'--requests' streaming /chat requests with distinct prompts one after another.
+
+Run it with:
+    python -m benchmarks.serve_throughput --clients 1 4 16 --requests 20 --output serve.json
+"""
+import asyncio
+import http.client
+import json
+import os
+import statistics
+import tempfile
+import threading
+import time
+from argparse import ArgumentParser
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from benchmarks.common import percentile, write_results
+from benchmarks.stub_ollama import StubOllamaConfig, StubOllamaServer
+from src.LLM import OllamaLLM
+from src.embeding_manager import EmbeddingManager
+from src.files_processor import FilesProcessor
+from src.server import ChatServer
+
+
+def _build_index(directory: str, chroma_db_path: str, base_url: str, files: int) -> None:
+    os.makedirs(directory, exist_ok=True)
+    for index in range(files):
+        with open(os.path.join(directory, f"doc_{index}.md"), "w", encoding="utf-8") as f:
+            f.write(f"# Document {index}\n\n" + " ".join(f"topic{index % 17} fact{index}-{word}" for word in range(300)))
+    embedding = EmbeddingManager(ollama_base_url=base_url, chroma_db_path=chroma_db_path)
+    FilesProcessor(embedding, directory, [".md"], []).process_files()
+
+
+def _chat(port: int, prompt: str) -> float:
+    _started = time.perf_counter()
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+    connection.request("POST", "/chat", body=json.dumps({"prompt": prompt, "stream": True}),
+                       headers={"Content-Type": "application/json"})
+    response = connection.getresponse()
+    response.read()
+    connection.close()
+    if response.status != 200:
+        raise RuntimeError(f"/chat returned {response.status}")
+    return time.perf_counter() - _started
+
+
+def _run_clients(port: int, clients: int, requests: int) -> Dict[str, float]:
+    def _client(client: int) -> List[float]:
+        return [_chat(port, f"What is fact{client}-{request} about topic{request % 17}?") for request in range(requests)]
+
+    _started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as executor:
+        latencies = [latency for result in executor.map(_client, range(clients)) for latency in result]
+    _elapsed = time.perf_counter() - _started
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "requests_per_second": len(latencies) / _elapsed,
+        "p50_latency": statistics.median(latencies),
+        "p95_latency": percentile(latencies, 95),
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark the chat HTTP server against the stub Ollama')
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 4, 16], help='Numbers of concurrent clients')
+    parser.add_argument('--requests', type=int, default=10, help='Requests per client')
+    parser.add_argument('--max-concurrency', type=int, default=4, help='Maximum number of concurrent calls to Ollama')
+    parser.add_argument('--files', type=int, default=50, help='Number of documents in the index')
+    parser.add_argument('--first-token-latency', type=float, default=0.05, help='Stub latency before the first token in seconds')
+    parser.add_argument('--token-latency', type=float, default=0.005, help='Stub latency between tokens in seconds')
+    parser.add_argument('--embed-latency', type=float, default=0.005, help='Stub latency of an embedding request in seconds')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    config = StubOllamaConfig(
+        embed_latency=args.embed_latency,
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency)
+    with StubOllamaServer(config=config) as stub, tempfile.TemporaryDirectory() as workspace:
+        chroma_db_path = os.path.join(workspace, "chroma_db")
+        _build_index(os.path.join(workspace, "corpus"), chroma_db_path, stub.base_url, args.files)
+
+        llm = OllamaLLM(ollama_base_url=stub.base_url, chroma_db_path=chroma_db_path, system_prompt="You are a benchmark.")
+
+        loop = asyncio.new_event_loop()
+        server = ChatServer(llm, port=0, max_concurrency=args.max_concurrency)
+        loop.run_until_complete(server.start())
+        threading.Thread(target=loop.run_forever, name="chat-server-loop", daemon=True).start()
+
+        results = []
+        for clients in args.clients:
+            result = _run_clients(server.port, clients, args.requests)
+            results.append(result)
+            print(f"clients={result['clients']:>3}  requests={result['requests']:>4}  "
+                  f"throughput={result['requests_per_second']:8.2f} req/s  "
+                  f"p50={result['p50_latency'] * 1000:8.1f} ms  p95={result['p95_latency'] * 1000:8.1f} ms")
+
+        asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+    if args.output:
+        write_results(args.output, "serve_throughput", {key: value for key, value in vars(args).items() if key != "output"}, results)
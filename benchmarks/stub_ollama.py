@@ -0,0 +1,295 @@
+"""
+A deterministic local stand-in for the Ollama HTTP API, used by the benchmarks.
+
+It implements the endpoints the project uses (/api/embed, /api/embeddings, /api/generate, /api/chat)
+with configurable latency, so throughput can be measured without a live Ollama and without a GPU.
+Like Ollama, it loads a model on its first request ('load_latency') and unloads it 'keep_alive' seconds
+after its last request (5 minutes unless the request sets 'keep_alive'), and it keeps the last prompt of every
+model: the words a prompt shares with the start of the previous one are not evaluated again ('prompt_token_latency').
+Embeddings are derived from the SHA-256 hash of the text, generated answers repeat the last words of the prompt.
+
+Run it standalone with:
+    python -m benchmarks.stub_ollama --port 11435 --first-token-latency 0.2 --token-latency 0.02
+"""
+import hashlib
+import json
+import math
+import re
+import threading
+import time
+from argparse import ArgumentParser
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import List
+
+
+class StubOllamaConfig:
+    """
+    The latency and output settings of the stub.
+    Attributes:
+        embedding_size (int): The size of the returned embeddings.
+        embed_latency (float): The latency of every embedding request in seconds.
+        embed_item_latency (float): The additional latency per embedded text in seconds.
+        first_token_latency (float): The latency before the first generated token in seconds (prompt evaluation).
+        token_latency (float): The latency between generated tokens in seconds.
+        tokens (int): The number of generated tokens per answer.
+        load_latency (float): The latency of loading a model which is not loaded in seconds.
+        prompt_token_latency (float): The latency of evaluating a prompt word which is not cached in seconds.
+    """
+    def __init__(self,
+                 embedding_size: int = 64,
+                 embed_latency: float = 0.0,
+                 embed_item_latency: float = 0.0,
+                 first_token_latency: float = 0.0,
+                 token_latency: float = 0.0,
+                 tokens: int = 16,
+                 load_latency: float = 0.0,
+                 prompt_token_latency: float = 0.0) -> None:
+        self.embedding_size = embedding_size
+        self.embed_latency = embed_latency
+        self.embed_item_latency = embed_item_latency
+        self.first_token_latency = first_token_latency
+        self.token_latency = token_latency
+        self.tokens = tokens
+        self.load_latency = load_latency
+        self.prompt_token_latency = prompt_token_latency
+
+
+def stub_embedding(text: str, size: int) -> List[float]:
+    """
+    Returns a deterministic unit-length embedding of the text.
+    Args:
+        text (str): The text to embed.
+        size (int): The size of the embedding.
+    Returns:
+        List[float]: The embedding.
+    """
+    _values = []
+    _counter = 0
+    while len(_values) < size:
+        _digest = hashlib.sha256(f"{_counter}\0{text}".encode("utf-8")).digest()
+        _values.extend(byte / 127.5 - 1.0 for byte in _digest)
+        _counter += 1
+    _values = _values[:size]
+    _norm = sum(value * value for value in _values) ** 0.5 or 1.0
+    return [value / _norm for value in _values]
+
+
+def _keep_alive_seconds(value) -> float:
+    # the same formats as Ollama: a number of seconds or a duration like "30s", "5m", "1h"; negative keeps the model forever
+    if value is None:
+        return 300.0
+    if isinstance(value, str):
+        _match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", value.strip())
+        value = float(_match.group(1)) * {"": 1, "s": 1, "m": 60, "h": 3600}[_match.group(2)] if _match else 300.0
+    return math.inf if value < 0 else float(value)
+
+
+class _StubOllamaHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # like the Go server of Ollama, otherwise the separately written headers and body wait for the delayed ACK
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args) -> None:
+        pass
+
+    @property
+    def config(self) -> StubOllamaConfig:
+        return self.server.config
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self.server.stats_lock:
+            self.server.stats[name] = self.server.stats.get(name, 0) + amount
+
+    def _read_json(self) -> dict:
+        _length = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(_length) or b"{}")
+
+    def _send_json(self, payload: dict, status: int = 200) -> None:
+        _body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(_body)))
+        self.end_headers()
+        self.wfile.write(_body)
+
+    def _send_chunk(self, payload: dict) -> None:
+        _line = json.dumps(payload).encode("utf-8") + b"\n"
+        self.wfile.write(f"{len(_line):x}\r\n".encode("ascii") + _line + b"\r\n")
+        self.wfile.flush()
+
+    def _load_model(self, request: dict) -> None:
+        # models load one at a time, the lock makes concurrent first requests wait for the same load
+        _model = request.get("model", "")
+        with self.server.models_lock:
+            if self.server.loaded_models.get(_model, 0.0) <= time.monotonic():
+                self._count("model_loads")
+                self.server.prompt_cache.pop(_model, None)
+                time.sleep(self.config.load_latency)
+            self.server.loaded_models[_model] = time.monotonic() + _keep_alive_seconds(request.get("keep_alive"))
+
+    def do_GET(self) -> None:
+        if self.path == "/api/version":
+            self._send_json({"version": "0.0.0-stub"})
+        elif self.path == "/api/tags":
+            self._send_json({"models": []})
+        elif self.path == "/stub/stats":
+            with self.server.stats_lock:
+                self._send_json(dict(self.server.stats))
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def do_POST(self) -> None:
+        request = self._read_json()
+        if self.path in ("/api/embed", "/api/embeddings", "/api/generate", "/api/chat"):
+            self._load_model(request)
+        if self.path == "/api/embed":
+            _inputs = request.get("input", "")
+            _inputs = [_inputs] if isinstance(_inputs, str) else list(_inputs)
+            self._count("embed_requests")
+            self._count("embedded_texts", len(_inputs))
+            time.sleep(self.config.embed_latency + self.config.embed_item_latency * len(_inputs))
+            self._send_json({
+                "model": request.get("model", ""),
+                "embeddings": [stub_embedding(text, self.config.embedding_size) for text in _inputs],
+            })
+        elif self.path == "/api/embeddings":
+            self._count("embed_requests")
+            self._count("embedded_texts")
+            time.sleep(self.config.embed_latency + self.config.embed_item_latency)
+            self._send_json({"embedding": stub_embedding(request.get("prompt", ""), self.config.embedding_size)})
+        elif self.path == "/api/generate" and not request.get("prompt"):
+            # an empty prompt only loads the model
+            self._send_json({"model": request.get("model", ""), "created_at": "1970-01-01T00:00:00Z",
+                             "response": "", "done": True, "done_reason": "load"})
+        elif self.path == "/api/generate":
+            self._generate(request, request.get("prompt", ""), chat=False)
+        elif self.path == "/api/chat":
+            _messages = request.get("messages", [])
+            self._generate(request, "\n".join(message.get("content", "") for message in _messages), chat=True)
+        elif self.path == "/api/show":
+            self._send_json({"modelfile": "", "parameters": "", "template": "", "details": {}})
+        else:
+            self._send_json({"error": "not found"}, 404)
+
+    def _evaluate_prompt(self, model: str, words: List[str]) -> int:
+        # like the prompt cache of Ollama, only the words after the start shared with the previous prompt are evaluated
+        with self.server.models_lock:
+            _previous = self.server.prompt_cache.get(model, [])
+            self.server.prompt_cache[model] = words
+        _cached = 0
+        while _cached < min(len(words), len(_previous)) and words[_cached] == _previous[_cached]:
+            _cached += 1
+        _evaluated = max(1, len(words) - _cached)
+        self._count("prompt_cached_tokens", len(words) - _evaluated)
+        self._count("prompt_evaluated_tokens", _evaluated)
+        time.sleep(self.config.first_token_latency + self.config.prompt_token_latency * _evaluated)
+        return _evaluated
+
+    def _generate(self, request: dict, prompt: str, chat: bool) -> None:
+        self._count("generate_requests")
+        _started = time.perf_counter_ns()
+        _words = prompt.split()[-self.config.tokens:] or ["ok"]
+        _tokens = [f"{word} " for word in _words]
+        _prompt_eval_count = self._evaluate_prompt(request.get("model", ""), prompt.split())
+        _prompt_eval_duration = time.perf_counter_ns() - _started
+
+        def _message(token: str, done: bool) -> dict:
+            _payload = {"model": request.get("model", ""), "created_at": "1970-01-01T00:00:00Z", "done": done}
+            if chat:
+                _payload["message"] = {"role": "assistant", "content": token}
+            else:
+                _payload["response"] = token
+            if done:
+                _total = time.perf_counter_ns() - _started
+                _payload.update({
+                    "done_reason": "stop",
+                    "total_duration": _total,
+                    "load_duration": 0,
+                    "prompt_eval_count": _prompt_eval_count,
+                    "prompt_eval_duration": _prompt_eval_duration,
+                    "eval_count": len(_tokens),
+                    "eval_duration": _total - _prompt_eval_duration,
+                })
+            return _payload
+
+        if request.get("stream", True) is False:
+            time.sleep(self.config.token_latency * len(_tokens))
+            self._send_json(_message("".join(_tokens), True))
+            return
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for index, token in enumerate(_tokens):
+            if index > 0:
+                time.sleep(self.config.token_latency)
+            self._send_chunk(_message(token, False))
+        self._send_chunk(_message("", True))
+        self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+
+class StubOllamaServer(ThreadingHTTPServer):
+    """
+    The stub Ollama HTTP server. Use start() to serve it on a background thread.
+    Attributes:
+        config (StubOllamaConfig): The latency and output settings.
+        stats (dict): The number of requests and embedded texts served so far.
+    Args:
+        host (str): The host to listen on. Default is "127.0.0.1".
+        port (int): The port to listen on, 0 picks a free port. Default is 0.
+        config (StubOllamaConfig): The latency and output settings. Default is StubOllamaConfig().
+    """
+    daemon_threads = True
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, config: StubOllamaConfig = None) -> None:
+        super().__init__((host, port), _StubOllamaHandler)
+        self.config = config or StubOllamaConfig()
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+        self.loaded_models = {}
+        self.prompt_cache = {}
+        self.models_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self) -> "StubOllamaServer":
+        self._thread = threading.Thread(target=self.serve_forever, name="stub-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "StubOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Run the stub Ollama server')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Host to listen on')
+    parser.add_argument('--port', type=int, default=11435, help='Port to listen on')
+    parser.add_argument('--embedding-size', type=int, default=64, help='Size of the embeddings')
+    parser.add_argument('--embed-latency', type=float, default=0.0, help='Latency of every embedding request in seconds')
+    parser.add_argument('--embed-item-latency', type=float, default=0.0, help='Additional latency per embedded text in seconds')
+    parser.add_argument('--first-token-latency', type=float, default=0.0, help='Latency before the first generated token in seconds')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='Latency between generated tokens in seconds')
+    parser.add_argument('--tokens', type=int, default=16, help='Number of generated tokens per answer')
+    parser.add_argument('--load-latency', type=float, default=0.0, help='Latency of loading a model which is not loaded in seconds')
+    parser.add_argument('--prompt-token-latency', type=float, default=0.0, help='Latency of evaluating a prompt word which is not cached in seconds')
+    args = parser.parse_args()
+
+    server = StubOllamaServer(args.host, args.port, StubOllamaConfig(
+        args.embedding_size, args.embed_latency, args.embed_item_latency,
+        args.first_token_latency, args.token_latency, args.tokens, args.load_latency,
+        args.prompt_token_latency))
+    print(f"Stub Ollama is listening on {server.base_url}")
+    server.serve_forever()
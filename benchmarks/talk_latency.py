@@ -0,0 +1,144 @@
+"""
+Measures the latency of OllamaLLM.talk() and OllamaLLM.stream_talk() against the stub Ollama.
+
+A synthetic corpus is indexed into a temporary ChromaDB, then '--requests' distinct questions are asked
+one after another (the answer cache is disabled). The total latency and the latency of every stage
+(retrieve, prompt, generate and the first streamed token) are reported as p50/p95.
+Before that the stub unloads the models ('--load-latency') and the cold start is measured twice:
+the latency of the first question and the warm-up of OllamaLLM.warm_up(), against the warm latency.
+Finally a conversation of '--turns' questions is held with a ConversationMemory of '--history-budget' tokens:
+the prompt evaluation and the generation time of every turn are reported with the share of the prompt the
+stub reused from the previous prompt ('--prompt-token-latency' per evaluated word).
+
+Run it with:
+    python -m benchmarks.talk_latency --requests 50 --first-token-latency 0.2 --load-latency 2 --prompt-token-latency 0.002 --output talk.json
+"""
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Dict, List
+from benchmarks.common import peak_rss, summarize, write_results
+from benchmarks.serve_throughput import _build_index
+from benchmarks.stub_ollama import StubOllamaConfig, StubOllamaServer
+from src.LLM import OllamaLLM
+from src.conversation_memory import ConversationMemory
+
+
+def _measure_cold_start(llm: OllamaLLM, stub: StubOllamaServer) -> Dict[str, object]:
+    # the first question after the models were unloaded, then the same after an explicit warm-up
+    stub.loaded_models.clear()
+    _started = time.perf_counter()
+    llm.talk("The first question of a cold start")
+    _first_question = time.perf_counter() - _started
+    stub.loaded_models.clear()
+    _reports = llm.warm_up()
+    _started = time.perf_counter()
+    llm.talk("The first question after the warm-up")
+    return {
+        "mode": "cold_start",
+        "first_question": _first_question,
+        "first_question_after_warm_up": time.perf_counter() - _started,
+        "warm_up": {report.model: {"cold": report.cold, "warm": report.warm} for report in _reports},
+    }
+
+
+def _measure_talk(llm: OllamaLLM, prompts: List[str], stream: bool) -> Dict[str, object]:
+    _totals = []
+    _stages: Dict[str, List[float]] = {"retrieve": [], "prompt": [], "generate": [], "first_token": []}
+    for prompt in prompts:
+        _started = time.perf_counter()
+        if stream:
+            "".join(llm.stream_talk(prompt))
+        else:
+            llm.talk(prompt)
+        _totals.append(time.perf_counter() - _started)
+        for stage, values in _stages.items():
+            _value = getattr(llm.last_timings, stage)
+            if _value is not None:
+                values.append(_value)
+    return {
+        "mode": "stream_talk" if stream else "talk",
+        "requests": len(prompts),
+        "total": summarize(_totals),
+        "stages": {stage: summarize(values) for stage, values in _stages.items() if values},
+        "peak_rss_bytes": peak_rss(),
+    }
+
+
+def _measure_conversation(llm: OllamaLLM, stub: StubOllamaServer, turns: int, history_budget: int) -> Dict[str, object]:
+    llm.memory = ConversationMemory(token_budget=history_budget)
+    _stages: Dict[str, List[float]] = {"prompt_eval": [], "generation_eval": [], "generate": []}
+    _prompt_tokens = []
+    _cached, _evaluated = stub.stats.get("prompt_cached_tokens", 0), stub.stats.get("prompt_evaluated_tokens", 0)
+    try:
+        for index in range(turns):
+            llm.talk(f"And what does fact{index}-{index * 7 % 300} say about topic{index % 17}?")
+            for stage, values in _stages.items():
+                values.append(getattr(llm.last_timings, stage))
+            _prompt_tokens.append(llm.last_timings.prompt_tokens)
+    finally:
+        _history_tokens = llm.memory.estimate_tokens()
+        llm.memory = None
+    _cached = stub.stats.get("prompt_cached_tokens", 0) - _cached
+    _evaluated = stub.stats.get("prompt_evaluated_tokens", 0) - _evaluated
+    return {
+        "mode": "conversation",
+        "turns": turns,
+        "stages": {stage: summarize(values) for stage, values in _stages.items()},
+        "prompt_tokens": summarize(_prompt_tokens),
+        "prompt_cached_share": _cached / (_cached + _evaluated) if _cached + _evaluated else 0.0,
+        "history_tokens": _history_tokens,
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark the latency of OllamaLLM.talk against the stub Ollama')
+    parser.add_argument('--requests', type=int, default=30, help='Number of measured questions per mode')
+    parser.add_argument('--warmup', type=int, default=3, help='Number of questions asked before the measurement')
+    parser.add_argument('--files', type=int, default=200, help='Number of documents in the index')
+    parser.add_argument('--first-token-latency', type=float, default=0.05, help='Stub latency before the first token in seconds')
+    parser.add_argument('--token-latency', type=float, default=0.005, help='Stub latency between tokens in seconds')
+    parser.add_argument('--embed-latency', type=float, default=0.005, help='Stub latency of an embedding request in seconds')
+    parser.add_argument('--load-latency', type=float, default=0.5, help='Stub latency of loading a model in seconds')
+    parser.add_argument('--prompt-token-latency', type=float, default=0.0, help='Stub latency of evaluating a prompt word which is not cached in seconds')
+    parser.add_argument('--turns', type=int, default=20, help='Number of questions of the conversation')
+    parser.add_argument('--history-budget', type=int, default=1024, help='Token budget of the conversation history')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    config = StubOllamaConfig(
+        embed_latency=args.embed_latency,
+        first_token_latency=args.first_token_latency,
+        token_latency=args.token_latency,
+        load_latency=args.load_latency,
+        prompt_token_latency=args.prompt_token_latency)
+    with StubOllamaServer(config=config) as stub, tempfile.TemporaryDirectory() as workspace:
+        chroma_db_path = os.path.join(workspace, "chroma_db")
+        _build_index(os.path.join(workspace, "corpus"), chroma_db_path, stub.base_url, args.files)
+
+        llm = OllamaLLM(ollama_base_url=stub.base_url, chroma_db_path=chroma_db_path, system_prompt="You are a benchmark.")
+        cold_start = _measure_cold_start(llm, stub)
+
+        for index in range(args.warmup):
+            llm.talk(f"Warm up question {index}")
+        results = [
+            _measure_talk(llm, [f"What is fact{index}-{index % 300} about topic{index % 17}?" for index in range(args.requests)], False),
+            _measure_talk(llm, [f"What is fact{index}-{index % 300} about topic{index % 17}, streamed?" for index in range(args.requests)], True),
+        ]
+        conversation = _measure_conversation(llm, stub, args.turns, args.history_budget)
+
+    _warm_up = ", ".join(f"{model}: cold {values['cold'] * 1000:.1f} ms, warm {values['warm'] * 1000:.1f} ms"
+                         for model, values in cold_start["warm_up"].items())
+    print(f" cold start  first question {cold_start['first_question'] * 1000:8.1f} ms  "
+          f"after warm-up {cold_start['first_question_after_warm_up'] * 1000:8.1f} ms  (warm-up {_warm_up})")
+    for result in results:
+        _stages = "  ".join(f"{stage}={values['p50'] * 1000:.1f}/{values['p95'] * 1000:.1f}ms" for stage, values in result["stages"].items())
+        print(f"{result['mode']:>11}  total p50={result['total']['p50'] * 1000:8.1f} ms  p95={result['total']['p95'] * 1000:8.1f} ms  "
+              f"(p50/p95 {_stages})")
+    _stages = "  ".join(f"{stage}={values['p50'] * 1000:.1f}/{values['p95'] * 1000:.1f}ms" for stage, values in conversation["stages"].items())
+    print(f"conversation  {conversation['turns']} turns  evaluated prompt tokens p50={conversation['prompt_tokens']['p50']:.0f}  "
+          f"reused {conversation['prompt_cached_share']:.0%} of the prompt  (p50/p95 {_stages})")
+
+    if args.output:
+        write_results(args.output, "talk_latency", {key: value for key, value in vars(args).items() if key != "output"}, [cold_start] + results + [conversation])
@@ -0,0 +1,100 @@
+"""
+Measures the enumeration of a large tree and the detection of stale files by FilesProcessor
+against the previous implementation (recursive os.listdir with os.path.isdir and a list-based diff).
+
+A synthetic tree of '--files' files is created in a temporary folder; a quarter of them has other extensions
+and every tenth folder is excluded. Half of the stored files are stale for the diff. The list-based diff is
+quadratic, so it is measured on '--legacy-diff-sample' stored files and extrapolated to all of them.
+
+Run it with:
+    python -m benchmarks.walk_files --files 100000 --output walk.json
+"""
+import json
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+from typing import Dict, List
+from src.files_processor import FilesProcessor
+
+
+def _build_tree(directory: str, files: int, files_per_folder: int) -> None:
+    for index in range(files):
+        _folder = os.path.join(directory, f"group_{index // (files_per_folder * 10)}", f"folder_{index // files_per_folder}")
+        if index % files_per_folder == 0:
+            os.makedirs(_folder, exist_ok=True)
+        _extension = ".txt" if index % 4 == 3 else ".md"
+        with open(os.path.join(_folder, f"file_{index}{_extension}"), "w") as f:
+            f.write("x")
+
+
+def _legacy_enumerate_files(directory: str, extensions: List[str], exclude_subfolders: List[str]):
+    for filename in os.listdir(directory):
+        if filename in exclude_subfolders:
+            continue
+        full_path = os.path.join(directory, filename)
+        if any([filename.endswith(ext) for ext in extensions]):
+            yield [full_path, os.stat(full_path)]
+        elif os.path.isdir(full_path):
+            yield from _legacy_enumerate_files(full_path, extensions, exclude_subfolders)
+
+
+def _measure(function) -> float:
+    _started = time.perf_counter()
+    function()
+    return time.perf_counter() - _started
+
+
+def _run(directory: str, legacy_diff_sample: int) -> Dict[str, float]:
+    extensions = [".md", ".py", ".rst", ".ipynb"]
+    exclude_subfolders = [f"folder_{index}" for index in range(0, 1000, 10)]
+    processor = FilesProcessor(None, directory, extensions, exclude_subfolders)
+
+    legacy_files = []
+    files = []
+    legacy_walk = _measure(lambda: legacy_files.extend(_legacy_enumerate_files(directory, extensions, exclude_subfolders)))
+    walk = _measure(lambda: files.extend(processor._enumerate_files(directory)))
+    if sorted(file[0] for file in legacy_files) != sorted(file[0] for file in files):
+        raise RuntimeError("The walkers enumerated different files")
+
+    _paths = [file[0] for file in files]
+    # every other stored file is stale
+    stored = {f"{path}.stale" if index % 2 else path: "checksum" for index, path in enumerate(_paths)}
+    _sample = list(stored.keys())[:legacy_diff_sample]
+    legacy_diff = _measure(lambda: [file for file in _sample if file not in _paths]) * len(stored) / max(1, len(_sample))
+    diff = _measure(lambda: stored.keys() - set(_paths))
+
+    return {
+        "files": len(files),
+        "legacy_walk_seconds": legacy_walk,
+        "walk_seconds": walk,
+        "walk_speedup": legacy_walk / walk,
+        "legacy_diff_seconds": legacy_diff,
+        "diff_seconds": diff,
+        "diff_speedup": legacy_diff / diff,
+    }
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(description='Benchmark the directory walker and the stale file detection')
+    parser.add_argument('--files', type=int, default=100000, help='Number of files in the synthetic tree')
+    parser.add_argument('--files-per-folder', type=int, default=100, help='Number of files per folder')
+    parser.add_argument('--legacy-diff-sample', type=int, default=200, help='Number of stored files the list-based diff is measured on')
+    parser.add_argument('--output', type=str, default=None, help='Write the results as JSON to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workspace:
+        _build_tree(workspace, args.files, args.files_per_folder)
+        # the first walk warms the file system cache up, so both walkers see the same state
+        list(_legacy_enumerate_files(workspace, [".md"], []))
+        result = _run(workspace, args.legacy_diff_sample)
+
+    print(f"files={result['files']}  "
+          f"walk: listdir={result['legacy_walk_seconds']:.2f}s scandir={result['walk_seconds']:.2f}s "
+          f"({result['walk_speedup']:.1f}x)  "
+          f"stale diff: list={result['legacy_diff_seconds']:.1f}s set={result['diff_seconds'] * 1000:.1f}ms "
+          f"({result['diff_speedup']:.0f}x)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"benchmark": "walk_files", "results": [result]}, f, indent=2)
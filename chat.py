@@ -1,22 +1,116 @@
-from src.LLM import OllamaLLM
-from src.arguments.chat import RunArguments
+from typing import Any, Callable, Dict, Iterator
+from src.arguments.chat import ChatRunArguments, RunArguments
+from src.conversation_memory import ConversationMemory
 
 
-if __name__ == "__main__":
+def print_timings(timings: Dict[str, Any]) -> None:
+    if timings["cached"]:
+        print(f"[answered from cache in {timings['retrieve']:.3f}s]")
+        return
+    first_token = f", first token {timings['first_token']:.3f}s" if timings["first_token"] is not None else ""
+    print(f"[retrieve {timings['retrieve']:.3f}s, prompt {timings['prompt']:.3f}s, generate {timings['generate']:.3f}s{first_token}]")
+    if timings["prompt_eval"] is not None and timings["generation_eval"] is not None:
+        print(f"[prompt eval {timings['prompt_tokens']} tokens in {timings['prompt_eval']:.3f}s, "
+              f"generation {timings['generated_tokens']} tokens in {timings['generation_eval']:.3f}s]")
 
-    run_args = RunArguments().parse()
 
-    ollama = OllamaLLM(
-        chroma_db_name=run_args.chroma_db_name,
-        chroma_db_path=run_args.chroma_db_path,
-        system_prompt=run_args.system_prompt
-    )
-    
-    # Enter into an interactive loop for conversation
+def converse(run_args: ChatRunArguments, answer: Callable[[str], Iterator[Dict[str, Any]]], memory: ConversationMemory) -> None:
+    # Enter into an interactive loop for conversation, 'answer' yields the messages of the chat server
     while True:
         prompt = input("You: ")
         if prompt.lower() in ["exit", "quit"]:
             print("Exiting the conversation.")
             break
-        response = ollama.talk(prompt)
-        print(f"Ollama: {response}")
\ No newline at end of file
+        if prompt.lower() == "reset":
+            if memory is not None:
+                memory.clear()
+            print("The conversation history is cleared.")
+            continue
+        tokens, sources, timings = [], None, None
+        print("Ollama: ", end="", flush=True)
+        for message in answer(prompt):
+            if "sources" in message:
+                sources = message["sources"]
+            elif "token" in message:
+                tokens.append(message["token"])
+                print(message["token"], end="", flush=True) if not run_args.no_stream else None
+            elif "error" in message:
+                print(f"[error: {message['error']}]", end="")
+            elif "done" in message:
+                timings = message.get("timings")
+        print("".join(tokens) if run_args.no_stream else "")
+        if run_args.show_sources and sources is not None:
+            print(f"[sources: {', '.join(sorted(set(source.get('source') or '' for source in sources)))}]")
+        if run_args.show_timings and timings is not None:
+            print_timings(timings)
+            if memory is not None:
+                print(f"[history {len(memory)} turns, ~{memory.estimate_tokens()} tokens]")
+
+
+if __name__ == "__main__":
+
+    run_args = RunArguments().parse()
+
+    if run_args.server:
+        # the server keeps the models and the vector store loaded, the client only needs the standard library
+        from src.chat_client import ChatClient
+
+        try:
+            client = ChatClient(run_args.server)
+            client.health()
+        except (OSError, ValueError, RuntimeError) as error:
+            raise SystemExit(f"Chat server {run_args.server} is not available: {error}")
+        memory = ConversationMemory(token_budget=run_args.history_budget) if run_args.history_budget > 0 else None
+
+        def answer_remotely(prompt: str) -> Iterator[Dict[str, Any]]:
+            tokens = []
+            for message in client.stream_chat(prompt, memory.pairs() if memory is not None else None):
+                tokens.append(message.get("token", ""))
+                yield message
+                if "done" in message and memory is not None:
+                    memory.add(prompt, "".join(tokens))
+
+        try:
+            converse(run_args, answer_remotely, memory)
+        except (OSError, RuntimeError) as error:
+            raise SystemExit(f"Chat server {run_args.server} failed: {error}")
+        raise SystemExit(0)
+
+    # langchain and chromadb take seconds to import, so --help, argument errors and --server do not wait for them
+    from src.batch_answerer import BatchAnswerer
+    from src.llm_builder import build_llm
+
+    try:
+        ollama = build_llm(
+            run_args,
+            memory=ConversationMemory(token_budget=run_args.history_budget) if run_args.history_budget > 0 and not run_args.batch else None)
+    except (FileNotFoundError, ValueError) as error:
+        raise SystemExit(str(error))
+
+    if run_args.warm_up:
+        for report in ollama.warm_up():
+            print(f"Warm-up {report}")
+
+    if run_args.batch:
+        batch_answerer = BatchAnswerer(
+            ollama,
+            max_concurrency=run_args.batch_concurrency,
+            retrieval_workers=run_args.retrieval_workers,
+            verbose=run_args.verbose)
+        try:
+            print(batch_answerer.run(run_args.batch, run_args.out))
+        except ValueError as error:
+            raise SystemExit(str(error))
+        raise SystemExit(0)
+
+    def answer_locally(prompt: str) -> Iterator[Dict[str, Any]]:
+        if run_args.no_stream:
+            yield {"token": ollama.talk(prompt)}
+        else:
+            stream = ollama.stream_talk(prompt)
+            yield {"sources": [{"source": doc.metadata.get("source", "")} for doc in stream.sources]}
+            for token in stream:
+                yield {"token": token}
+        yield {"done": True, "timings": ollama.last_timings._asdict() if ollama.last_timings is not None else None}
+
+    converse(run_args, answer_locally, ollama.memory)
@@ -1,26 +1,161 @@
-from src.embeding_manager import EmbeddingManager
+from typing import TYPE_CHECKING
 from src.arguments.embedding_files_processor import RunArguments
-from src.files_processor import FilesProcessor
+
+if TYPE_CHECKING:
+    from src.index_version import IndexVersion
+    from src.keyword_index import KeywordIndex
+    from src.run_stats import RunStats
+
+
+def export_stats(stats: "RunStats", run_args) -> None:
+    if run_args.stats_json:
+        stats.write_json(run_args.stats_json)
+    if run_args.stats_prometheus:
+        stats.write_prometheus(run_args.stats_prometheus)
+
+
+def export_snapshot(embedding, run_args, keyword_index: "KeywordIndex", index_version: "IndexVersion", stats: "RunStats") -> None:
+    if not run_args.export_snapshot:
+        return
+    from src.sharded_embedding_manager import ShardedEmbeddingManager
+    from src.vector_snapshot import VectorSnapshot
+    if VectorSnapshot.is_current(run_args.export_snapshot, run_args.snapshot_dtype, index_version.read()):
+        # checked before the vector stores are opened
+        print("Snapshot is up to date") if run_args.verbose else None
+        return
+    vectorstores = embedding.vectorstores if isinstance(embedding, ShardedEmbeddingManager) else [embedding.vectorstore]
+    with stats.stage("snapshot"):
+        exported = VectorSnapshot.export(
+            vectorstores, run_args.export_snapshot, run_args.snapshot_dtype, index_version.read(), keyword_index)
+    print(f"Snapshot exported to {run_args.export_snapshot}" if exported else "Snapshot is up to date") if run_args.verbose else None
 
 
 if __name__ == "__main__":
     run_args = RunArguments().parse()
 
-    embedding = EmbeddingManager(
-        chroma_db_name=run_args.chroma_db_name,
-        chroma_db_path=run_args.chroma_db_path,
-        debug=run_args.verbose
-        )
+    # the pipeline modules import langchain and numpy, so --help and argument errors do not wait for them
+    from src.embeding_manager import EmbeddingManager
+    from src.files_processor import FilesProcessor
+    from src.file_manifest import FileManifest
+    from src.embedding_cache import EmbeddingCache
+    from src.keyword_index import KeywordIndex
+    from src.index_version import IndexVersion
+    from src.ollama_clients import OllamaClients
+    from src.sharded_embedding_manager import ShardedEmbeddingManager
+    from src.files_watcher import FilesWatcher
+    from src.run_stats import RunStats
+
+    stats = RunStats(profile=run_args.profile is not None)
+
+    embedding_cache = None
+    if run_args.embedding_cache_size > 0:
+        embedding_cache = EmbeddingCache(
+            EmbeddingCache.default_path(run_args.chroma_db_path),
+            run_args.embedding_cache_size * 1024 * 1024)
+
+    keyword_index = None
+    if not run_args.no_keyword_index:
+        keyword_index = KeywordIndex(KeywordIndex.default_path(run_args.chroma_db_path, run_args.chroma_db_name))
 
+    index_version = IndexVersion(IndexVersion.default_path(run_args.chroma_db_path, run_args.chroma_db_name))
 
-    files_processor = FilesProcessor(
-        embedding, 
-        run_args.directory_to_analyze, 
-        run_args.extensions, 
-        run_args.exclude_subdirectories, 
-        run_args.reload,
-        run_args.verbose)
+    # the managers of all shards embed through one pool of connections
+    clients = OllamaClients(run_args.ollama_base_url, run_args.keep_alive)
 
-    files_processor.process_files()
+    def create_embedding_manager(chroma_db_name: str) -> EmbeddingManager:
+        return EmbeddingManager(
+            ollama_base_url=run_args.ollama_base_url,
+            ollama_model=run_args.ollama_model,
+            chroma_db_name=chroma_db_name,
+            chroma_db_path=run_args.chroma_db_path,
+            debug=run_args.verbose,
+            embedding_cache=embedding_cache,
+            stats=stats,
+            keyword_index=keyword_index,
+            index_version=index_version,
+            clients=clients
+            )
+
+    if run_args.shard_by == "none":
+        if ShardedEmbeddingManager.read_collections(run_args.chroma_db_path, run_args.chroma_db_name):
+            raise SystemExit(f"The collection '{run_args.chroma_db_name}' is sharded, run with the --shard-by it was built with")
+        embedding = create_embedding_manager(run_args.chroma_db_name)
+    else:
+        try:
+            embedding = ShardedEmbeddingManager(
+                run_args.directory_to_analyze,
+                run_args.shard_by,
+                run_args.shard_count,
+                run_args.chroma_db_name,
+                run_args.chroma_db_path,
+                create_embedding_manager,
+                keyword_index,
+                index_version)
+        except ValueError as error:
+            raise SystemExit(str(error))
+    embedding.sync_keyword_index()
+
+    if run_args.drop_shards:
+        if not isinstance(embedding, ShardedEmbeddingManager):
+            raise SystemExit("--drop-shards needs the --shard-by the collection was built with")
+        with FileManifest(FileManifest.default_path(run_args.chroma_db_path, run_args.chroma_db_name)) as manifest:
+            for shard_name in run_args.drop_shards:
+                try:
+                    print(f"Dropped the shard {shard_name} with {embedding.drop_shard(shard_name, manifest)} files")
+                except ValueError as error:
+                    print(error)
+        raise SystemExit(0)
+
+    if run_args.warm_up:
+        print(f"Warm-up {clients.warm_up_embeddings(run_args.ollama_model)}")
+
+    with FileManifest(FileManifest.default_path(run_args.chroma_db_path, run_args.chroma_db_name)) as manifest:
+        files_processor = FilesProcessor(
+            embedding, 
+            run_args.directory_to_analyze, 
+            run_args.extensions, 
+            run_args.exclude_subdirectories, 
+            run_args.reload,
+            run_args.verbose,
+            manifest,
+            run_args.verify_checksums,
+            run_args.workers,
+            run_args.embed_batch_size,
+            run_args.max_inflight,
+            run_args.include_globs,
+            run_args.exclude_globs,
+            stats,
+            int(run_args.stream_threshold * 1024 * 1024),
+            run_args.checksum_algorithm)
+
+        if run_args.watch:
+            watcher = FilesWatcher(
+                files_processor,
+                run_args.watch_debounce,
+                run_args.watch_poll_interval,
+                run_args.watch_polling,
+                run_args.verbose,
+                lambda: (export_snapshot(embedding, run_args, keyword_index, index_version, stats), export_stats(stats, run_args)))
+            try:
+                watcher.run()
+            except KeyboardInterrupt:
+                print("Stopped watching for changes.")
+        else:
+            files_processor.process_files()
+            export_snapshot(embedding, run_args, keyword_index, index_version, stats)
+
+    if embedding_cache is not None:
+        print(f"Embedding cache: {embedding_cache.hits} hits, {embedding_cache.misses} misses "
+              f"(hit ratio {embedding_cache.hit_ratio():.1%})")
+        embedding_cache.close()
+    if keyword_index is not None:
+        keyword_index.close()
+    clients.close()
     
-    print("Files processing completed.")
\ No newline at end of file
+    print(stats.summary_table())
+    export_stats(stats, run_args)
+    if run_args.profile:
+        stats.write_profile(run_args.profile)
+        print(f"Profile written to {run_args.profile}, inspect it with: python -m pstats {run_args.profile}")
+
+    print("Files processing completed.")
@@ -0,0 +1,34 @@
+import asyncio
+from src.arguments.serve import RunArguments
+
+
+if __name__ == "__main__":
+
+    run_args = RunArguments().parse()
+
+    # langchain and chromadb take seconds to import, so --help and argument errors do not wait for them
+    from src.llm_builder import build_llm
+    from src.server import ChatServer
+
+    try:
+        ollama = build_llm(run_args)
+    except (FileNotFoundError, ValueError) as error:
+        raise SystemExit(str(error))
+
+    if run_args.warm_up:
+        for report in ollama.warm_up():
+            print(f"Warm-up {report}")
+
+    server = ChatServer(
+        ollama,
+        run_args.host,
+        run_args.port,
+        run_args.max_concurrency,
+        run_args.history_budget,
+        run_args.verbose)
+
+    print(f"Serving on http://{run_args.host}:{run_args.port}")
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        print("Server stopped.")
\ No newline at end of file
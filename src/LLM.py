@@ -1,20 +1,157 @@
+import time
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, NamedTuple, Optional, Tuple
 from src.embeding_manager import EmbeddingManager
-from langchain_ollama import OllamaLLM as _OllamaLLM
-from langchain.chains.retrieval import create_retrieval_chain
-from langchain_core.prompts import ChatPromptTemplate
-from langchain.chains.combine_documents import create_stuff_documents_chain
-from langchain_chroma import Chroma
-from langchain_ollama import OllamaEmbeddings
+from src.answer_cache import AnswerCache, CachedAnswer
+from src.cached_embeddings import PrefetchedEmbeddings
+from src.index_version import IndexVersion
+from src.context_packer import ContextPacker
+from src.conversation_memory import ConversationMemory
+from src.fan_out_retriever import FanOutRetriever
+from src.hybrid_retriever import HybridRetriever
+from src.keyword_index import KeywordIndex
+from src.snapshot_retriever import SnapshotRetriever
+from src.vector_snapshot import VectorSnapshot
+from src.ollama_clients import OllamaClients, WarmUpReport
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.documents import Document
+from langchain_core.messages import BaseMessage
+from langchain_core.outputs import LLMResult
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate, format_document
+from langchain_core.retrievers import BaseRetriever
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+
+# the same formatting of the context as create_stuff_documents_chain uses
+_DOCUMENT_PROMPT = PromptTemplate.from_template("{page_content}")
+_DOCUMENT_SEPARATOR = "\n\n"
+
+
+class TalkTimings(NamedTuple):
+    """
+    The duration of every stage of a single talk() or stream_talk() call in seconds.
+    The 'generate' stage is split by Ollama into the evaluation of the prompt and the generation of the answer,
+    the prompt tokens Ollama reuses from the previous prompt (e.g. the system prompt and the conversation history)
+    are not evaluated again and are not counted in 'prompt_tokens'.
+    Attributes:
+        retrieve (float): The time spent retrieving documents from the vector store.
+        prompt (float): The time spent assembling the prompt.
+        generate (float): The time spent generating the answer.
+        first_token (float): The time from the start of the generation to the first streamed token, None for talk().
+        cached (bool): Flag indicating whether the answer was served from the answer cache; 'retrieve' is the lookup time then.
+        prompt_eval (float): The time Ollama spent evaluating the prompt, None if it did not report it.
+        prompt_tokens (int): The number of prompt tokens Ollama evaluated, None if it did not report it.
+        generation_eval (float): The time Ollama spent generating the tokens of the answer, None if it did not report it.
+        generated_tokens (int): The number of generated tokens, None if Ollama did not report it.
+    """
+    retrieve: float
+    prompt: float
+    generate: float
+    first_token: Optional[float] = None
+    cached: bool = False
+    prompt_eval: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    generation_eval: Optional[float] = None
+    generated_tokens: Optional[int] = None
+
+
+class PreparedAnswer(NamedTuple):
+    """
+    A question whose documents are retrieved and whose prompt is assembled, ready for the generation (see prepare_answer()).
+    Attributes:
+        human_prompt (str): The question.
+        sources (List[Document]): The documents of the context, or the sources of the cached answer.
+        prompt_value (Any): The assembled prompt, None for a cached answer.
+        cached_answer (str): The answer from the answer cache, None if it has to be generated.
+        index_version (str): The version of the collection the documents were retrieved from.
+        embedding (List[float]): The embedding of the question if the semantic answer cache computed it.
+        retrieve (float): The time spent retrieving the documents (or looking up the cached answer) in seconds.
+        prompt (float): The time spent assembling the prompt in seconds.
+        cacheable (bool): Flag indicating whether the answer can be stored in the answer cache, False with a conversation history.
+    """
+    human_prompt: str
+    sources: List[Document]
+    prompt_value: Any
+    cached_answer: Optional[str]
+    index_version: str
+    embedding: Optional[List[float]]
+    retrieve: float
+    prompt: float
+    cacheable: bool = True
+
+
+class TalkStream:
+    """
+    The answer of stream_talk(). The documents are retrieved when it is created, so the sources are
+    available before the first token; iterating over it yields the tokens as the model produces them.
+    Attributes:
+        sources (List[Document]): The documents retrieved for the prompt.
+        timings (TalkTimings): The timings of this answer, None until the tokens are consumed.
+    Args:
+        sources (List[Document]): The documents retrieved for the prompt.
+        tokens (Iterator[str]): The tokens of the answer.
+        timings (TalkTimings): The timings of the answer if they are known up front. Default is None.
+    """
+    def __init__(self, sources: List[Document], tokens: Iterator[str], timings: TalkTimings = None) -> None:
+        self.sources = sources
+        self.timings = timings
+        self._tokens = tokens
+
+    def __iter__(self) -> Iterator[str]:
+        return self._tokens
+
+
+class _GenerationStats(BaseCallbackHandler):
+    # collects the durations and the token counts Ollama reports with the last chunk of an answer
+    def __init__(self) -> None:
+        self.info: Dict[str, Any] = {}
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        if response.generations and response.generations[0]:
+            self.info = response.generations[0][0].generation_info or {}
+
+    def timings(self, retrieve: float, prompt: float, generate: float, first_token: Optional[float] = None) -> TalkTimings:
+        _seconds = lambda name: self.info[name] / 1e9 if self.info.get(name) is not None else None
+        return TalkTimings(retrieve, prompt, generate, first_token,
+                           prompt_eval=_seconds("prompt_eval_duration"),
+                           prompt_tokens=self.info.get("prompt_eval_count"),
+                           generation_eval=_seconds("eval_duration"),
+                           generated_tokens=self.info.get("eval_count"))
+
+
+class _RetrievalChain(NamedTuple):
+    key: tuple
+    retriever: BaseRetriever
+    prompt: ChatPromptTemplate
 
 
 class OllamaLLM:
     """
     OllamaLLM is a class that integrates a language model with a vector store for retrieval-augmented generation (RAG).
+    The retriever and the prompt are built once and reused between the calls, they are rebuilt only 
+    when the system prompt or the retriever settings change.
+    The prompt starts with the system prompt and the conversation history and ends with the context and the question,
+    so consecutive prompts share their start and Ollama evaluates only the new part of the prompt.
     Attributes:
         model (object): The language model instance.
+        clients (OllamaClients): The shared client layer of the chat and the embeddings model.
         system_prompt (str): The system prompt to be used in the conversation.
+        search_type (str): The search type of the retriever.
+        search_kwargs (dict): The search arguments of the retriever, e.g. {"k": 4}.
+        keyword_index (KeywordIndex): The BM25 index of the chunks, the retrieval is hybrid when it is set.
+        fusion_kwargs (dict): The settings of the HybridRetriever, e.g. {"rrf_k": 60, "vector_weight": 1.0, "keyword_weight": 1.0, "fetch_k": 20}.
+        context_packer (ContextPacker): The post-retrieval stage which deduplicates, merges, reranks and packs the context into a token budget.
+        last_timings (TalkTimings): The per-stage timings of the last talk() call, None before the first call.
         _oembed (OllamaEmbeddings): The embeddings model for vector store.
-        _vectorstore (Chroma): The vector store instance.
+        _query_embeddings (PrefetchedEmbeddings): The embeddings of the questions, they can be prefetched in batches.
+        _vectorstore (Chroma): The vector store instance, the first one of '_vectorstores'.
+        _vectorstores (List[Chroma]): The collections the documents are retrieved from, empty when a snapshot is used.
+        snapshot (VectorSnapshot): The read-only snapshot the documents are retrieved from instead of the collections.
+        answer_cache (AnswerCache): The optional cache of answers in front of talk() and stream_talk().
+        memory (ConversationMemory): The history of the conversation of talk() and stream_talk(), None answers every question on its own.
+        _chain (_RetrievalChain): The cached retriever and prompt.
+        _index_version (IndexVersion): The version marker of the collection, used to invalidate the answer cache.
     Args:
         model_name (str): The name of the language model to use. Default is "gemma2:2b".
         ollama_base_url (str): The base URL for the Ollama API. Default is "http://localhost:11434".
@@ -22,13 +159,63 @@ class OllamaLLM:
         chroma_db_name (str): The name of the Chroma database. Default is "chroma_db".
         chroma_db_path (str): The path to the Chroma database. Default is "./chroma_db".
         system_prompt (str): The system prompt to be used in the conversation. Default is None.
+        search_type (str): The search type of the retriever. Default is "similarity".
+        search_kwargs (dict): The search arguments of the retriever. Default is None.
+        keyword_index (KeywordIndex): The BM25 index of the chunks for the hybrid retrieval. Default is None.
+        fusion_kwargs (dict): The settings of the HybridRetriever. Default is None.
+        context_packer (ContextPacker): The post-retrieval stage, without it the top 'k' documents are used as they are. Default is None.
+        collections (List[str]): The names of the collections to retrieve from, e.g. the shards of a sharded collection;
+            several collections are searched concurrently with the 'similarity' search (and its 'filter'), other search types
+            raise a ValueError. Default is [chroma_db_name].
+        snapshot (VectorSnapshot): A snapshot exported by the embedding processor to retrieve from instead of the collections,
+            no Chroma client is opened then and only the 'similarity' search without a 'filter' is supported. Default is None.
+        answer_cache (AnswerCache): The cache of answers. Default is None.
+        clients (OllamaClients): The shared client layer, it also sets the base URL and the keep alive of the models.
+            Default is a new OllamaClients of 'ollama_base_url'.
+        memory (ConversationMemory): The history of the conversation, talk() and stream_talk() send it with every
+            question and add their answers to it. The answer cache is only used while it is empty. Default is None.
     Methods:
-        talk(human_prompt):
+        warm_up():
+            Loads the chat and the embeddings model, so the first question does not wait for them.
+            Returns:
+                List[WarmUpReport]: The cold and warm latency of both models.
+        prefetch_embeddings(human_prompts):
+            Embeds the questions in a single call of the embeddings model ahead of their retrieval.
+            Args:
+                human_prompts (List[str]): The questions.
+        prepare_answer(human_prompt, history):
+            Looks up the cached answer or retrieves the documents and assembles the prompt, without generating.
+            Args:
+                human_prompt (str): The prompt provided by the user.
+                history (List[BaseMessage]): The previous questions and answers of the conversation.
+            Returns:
+                PreparedAnswer: The sources, the prompt and the timings of both stages.
+        generate_answer(prepared):
+            Generates the answer of a prepared question, streaming it from the model. Safe to call from several threads.
+            Args:
+                prepared (PreparedAnswer): The result of prepare_answer().
+            Returns:
+                Tuple[str, TalkTimings]: The answer and the timings of the question.
+        talk(human_prompt, memory):
             Generates a response to the given human prompt using the language model and vector store.
             Args:
                 human_prompt (str): The prompt provided by the user.
+                memory (ConversationMemory): The conversation of this call instead of 'memory'.
             Returns:
                 str: The generated response based on the context retrieved from the vector store.
+        retrieve(human_prompt):
+            Retrieves the documents relevant to the human prompt from the vector store.
+            Args:
+                human_prompt (str): The prompt provided by the user.
+            Returns:
+                List[Document]: The retrieved documents.
+        stream_talk(human_prompt, memory):
+            Same as talk(), but yields the tokens of the response as the model produces them.
+            Args:
+                human_prompt (str): The prompt provided by the user.
+                memory (ConversationMemory): The conversation of this call instead of 'memory'.
+            Returns:
+                TalkStream: The retrieved sources and the tokens of the response.
     """
     def __init__(self, 
                  model_name:      str = "gemma2:2b",
@@ -36,52 +223,313 @@ class OllamaLLM:
                  ollama_model:    str = "nomic-embed-text", 
                  chroma_db_name:  str = "chroma_db",
                  chroma_db_path:  str = "./chroma_db",
-                 system_prompt:   str = None):
-        self.model = _OllamaLLM(
-            base_url='http://localhost:11434',
-            model=model_name
-        )
+                 system_prompt:   str = None,
+                 search_type:     str = "similarity",
+                 search_kwargs:   Dict[str, Any] = None,
+                 answer_cache:    AnswerCache = None,
+                 keyword_index:   KeywordIndex = None,
+                 fusion_kwargs:   Dict[str, Any] = None,
+                 context_packer:  ContextPacker = None,
+                 collections:     List[str] = None,
+                 clients:         OllamaClients = None,
+                 snapshot:        VectorSnapshot = None,
+                 memory:          ConversationMemory = None):
+        self.clients = clients if clients is not None else OllamaClients(ollama_base_url)
+        self.model = self.clients.llm(model_name)
         self.system_prompt = system_prompt
-        self._oembed = OllamaEmbeddings(base_url=ollama_base_url, model=ollama_model)
-        self._vectorstore = Chroma(chroma_db_name, self._oembed, chroma_db_path)
-    
-    def talk(self, human_prompt):
+        self.search_type = search_type
+        self.search_kwargs = dict(search_kwargs or {})
+        self.keyword_index = keyword_index
+        self.fusion_kwargs = dict(fusion_kwargs or {})
+        self.context_packer = context_packer
+        self.last_timings = None
+        self._oembed = self.clients.embeddings(ollama_model)
+        self._query_embeddings = PrefetchedEmbeddings(self._oembed)
+        self.snapshot = snapshot
+        self._vectorstores = [] if snapshot is not None else \
+            self._open_collections(collections or [chroma_db_name], chroma_db_path)
+        self._vectorstore = self._vectorstores[0] if self._vectorstores else None
+        self._chain = None
+        self.answer_cache = answer_cache
+        self.memory = memory
+        self._index_version = IndexVersion(IndexVersion.default_path(chroma_db_path, chroma_db_name))
+
+    def _open_collections(self, names: List[str], chroma_db_path: str) -> List["Chroma"]:
+        # chromadb takes about a second to import, a chat retrieving from a snapshot never imports it
+        from langchain_chroma import Chroma
+        return [Chroma(name, self._query_embeddings, chroma_db_path) for name in names]
+
+    def _get_chain(self) -> _RetrievalChain:
         """
-        Engage in a conversation based on the provided human prompt.
-        This method uses a vector store to retrieve relevant documents and incorporates them into a 
-        question-answering chain to generate a response. If no documents are loaded in the vector store, 
-        it returns a message indicating that there is nothing to talk about.
-        Args:
-            human_prompt (str): The prompt or question provided by the user.
+        Returns the retriever and the prompt for the current configuration, building them only if
+        the system prompt or the retriever settings changed since the last call.
         Returns:
-            str: The generated response based on the context from the retrieved documents or a message 
-                 indicating that the information is not available in the provided context.
+            _RetrievalChain: The cached retriever and prompt.
         """
-        if self._vectorstore is None:
-            return "Nothing to talk about. Please load some documents first."
-        
-        retriever = self._vectorstore.as_retriever()
+        key = (self.system_prompt, self.search_type, repr(sorted(self.search_kwargs.items())),
+               self.keyword_index is not None, repr(sorted(self.fusion_kwargs.items())),
+               repr(sorted(vars(self.context_packer).items())) if self.context_packer is not None else None)
+        if self._chain is not None and self._chain.key == key:
+            return self._chain
+
+        # the context packer chooses the 'k' documents of the context from a larger set of candidates
+        _k = self.search_kwargs.get("k", 4)
+        _candidates = max(_k, self.context_packer.fetch_k) if self.context_packer is not None else _k
+        if self.keyword_index is None:
+            retriever = self._vector_retriever(_candidates)
+        else:
+            # both rankings are fetched deeper than 'k', so the fusion can promote documents ranked low by one of them
+            _fusion_kwargs = dict(self.fusion_kwargs)
+            _fetch_k = max(_fusion_kwargs.pop("fetch_k", max(20, _k * 4)), _candidates)
+            retriever = HybridRetriever(
+                vector_retriever=self._vector_retriever(_fetch_k),
+                keyword_index=self.keyword_index,
+                k=_candidates,
+                fetch_k=_fetch_k,
+                **_fusion_kwargs)
         # 2. Incorporate the retriever into a question-answering chain.
+        # the parts which stay the same between the questions come first, the context changes with every question
         system_prompt = (
-            f"{self.system_prompt}"
-            "\n\n"
-            "{context}"
-            "You must answer the user's question strictly based on the context provided. "
+            (f"{self.system_prompt}\n\n" if self.system_prompt else "") +
+            "You must answer the user's question strictly based on the context provided with it. "
             "If the answer cannot be determined from the context, respond with 'The information is not available in the provided context.'"
         )
 
         prompt = ChatPromptTemplate.from_messages(
             [
                 ("system", system_prompt),
-                ("human", "{input}"),
+                MessagesPlaceholder("history", optional=True),
+                ("human", "Context:\n{context}\n\nQuestion: {input}"),
             ]
         )
 
-        question_answer_chain = create_stuff_documents_chain(self.model, prompt)
-        rag_chain = create_retrieval_chain(retriever, question_answer_chain)
+        self._chain = _RetrievalChain(key, retriever, prompt)
+        return self._chain
+
+    def _vector_retriever(self, k: int) -> BaseRetriever:
+        if len(self._vectorstores) == 1:
+            return self._vectorstore.as_retriever(search_type=self.search_type, search_kwargs=dict(self.search_kwargs, k=k))
+        # the results of several collections are merged by their distance, an MMR or threshold search would differ from one collection
+        _source = "a snapshot" if self.snapshot is not None else "several collections"
+        if self.search_type != "similarity":
+            raise ValueError(f"The search type '{self.search_type}' is not supported with {_source}, use 'similarity'")
+        if self.snapshot is not None:
+            if self.search_kwargs.get("filter") is not None:
+                raise ValueError(f"A 'filter' is not supported with {_source}")
+            return SnapshotRetriever(snapshot=self.snapshot, embeddings=self._query_embeddings, k=k)
+        return FanOutRetriever(vectorstores=self._vectorstores, embeddings=self._query_embeddings, k=k,
+                               filter=self.search_kwargs.get("filter"))
 
-        result = rag_chain.invoke({"input": human_prompt})
-        return result["answer"]
+    def _stored_embeddings(self, documents: List[Document]) -> Dict[str, Any]:
+        _ids = list(dict.fromkeys(document.id for document in documents if document.id))
+        if self.snapshot is not None:
+            return self.snapshot.vectors_by_ids(_ids)
+        _embeddings: Dict[str, Any] = {}
+        for vectorstore in self._vectorstores:
+            _missing = [chunk_id for chunk_id in _ids if chunk_id not in _embeddings]
+            if not _missing:
+                break
+            results = vectorstore._collection.get(ids=_missing, include=["embeddings"])
+            _embeddings.update(zip(results["ids"], results["embeddings"]))
+        return _embeddings
 
+    def _select_documents(self, chain: _RetrievalChain, human_prompt: str) -> List[Document]:
+        """
+        Retrieves the candidates for the prompt and, with a context packer, selects the context from them.
+        Args:
+            chain (_RetrievalChain): The current retriever and prompt.
+            human_prompt (str): The prompt or question provided by the user.
+        Returns:
+            List[Document]: The documents of the context.
+        """
+        documents = chain.retriever.invoke(human_prompt)
+        if self.context_packer is None:
+            return documents
+        return self.context_packer.pack(documents, self.search_kwargs.get("k", 4), self._stored_embeddings(documents))
+
+    @staticmethod
+    def _format_context(documents: List[Document]) -> str:
+        return _DOCUMENT_SEPARATOR.join(format_document(document, _DOCUMENT_PROMPT) for document in documents)
+    
+    def _retrieve_and_assemble(self, human_prompt: str, history: List[BaseMessage] = None) -> Tuple[List[Document], Any, float, float]:
+        """
+        Retrieves the documents for the prompt and assembles the prompt for the model.
+        Args:
+            human_prompt (str): The prompt or question provided by the user.
+            history (List[BaseMessage]): The previous questions and answers of the conversation. Default is None.
+        Returns:
+            Tuple[List[Document], Any, float, float]: The documents, the prompt value and the durations of both stages.
+        """
+        chain = self._get_chain()
+
+        _started = time.perf_counter()
+        documents = self._select_documents(chain, human_prompt)
+        _retrieved = time.perf_counter()
+        prompt_value = chain.prompt.invoke({"input": human_prompt, "context": self._format_context(documents), "history": history or []})
+        _assembled = time.perf_counter()
+        return documents, prompt_value, _retrieved - _started, _assembled - _retrieved
     
+    def warm_up(self) -> List[WarmUpReport]:
+        return [self.clients.warm_up_llm(self.model.model), self.clients.warm_up_embeddings(self._oembed.model)]
+
+    def prefetch_embeddings(self, human_prompts: List[str]) -> None:
+        self._query_embeddings.prefetch(human_prompts)
+
+    def retrieve(self, human_prompt: str) -> List[Document]:
+        """
+        Retrieves the documents relevant to the prompt from the vector store, without generating an answer.
+        Args:
+            human_prompt (str): The prompt or question provided by the user.
+        Returns:
+            List[Document]: The retrieved documents.
+        """
+        if self._vectorstore is None and self.snapshot is None:
+            return []
+        return self._select_documents(self._get_chain(), human_prompt)
+
+    def _lookup_answer(self, human_prompt: str) -> Tuple[Optional[CachedAnswer], str, Optional[List[float]]]:
+        """
+        Looks up the answer for the prompt in the answer cache.
+        Args:
+            human_prompt (str): The prompt or question provided by the user.
+        Returns:
+            Tuple[Optional[CachedAnswer], str, Optional[List[float]]]: The cached answer (or None), the current index 
+                version and the embedding of the prompt (None if the semantic level is disabled).
+        """
+        if self.answer_cache is None:
+            return None, "", None
+        _index_version = self._index_version.read()
+        _embedding = None
+        cached = self.answer_cache.get(human_prompt, self.system_prompt, _index_version)
+        if cached is None and self.answer_cache.semantic:
+            _embedding = self._query_embeddings.embed_query(human_prompt)
+            cached = self.answer_cache.get(human_prompt, self.system_prompt, _index_version, _embedding)
+        return cached, _index_version, _embedding
+
+    def _store_answer(self, prepared: PreparedAnswer, answer: str) -> None:
+        if self.answer_cache is not None and prepared.cacheable:
+            self.answer_cache.put(prepared.human_prompt, self.system_prompt, prepared.index_version, answer, prepared.sources, prepared.embedding)
+
+    def _memory(self, memory: Optional[ConversationMemory]) -> Optional[ConversationMemory]:
+        return memory if memory is not None else self.memory
+    
+    def prepare_answer(self, human_prompt: str, history: List[BaseMessage] = None) -> PreparedAnswer:
+        """
+        Looks up the answer in the answer cache or retrieves the documents and assembles the prompt.
+        The generation is left to generate_answer(), so the retrieval of many questions can run ahead of their generation.
+        The answer to a question depends on the conversation before it, so the answer cache is skipped with a history.
+        Args:
+            human_prompt (str): The prompt or question provided by the user.
+            history (List[BaseMessage]): The previous questions and answers of the conversation. Default is None.
+        Returns:
+            PreparedAnswer: The sources, the assembled prompt (or the cached answer) and the timings of both stages.
+        """
+        if history:
+            documents, prompt_value, _retrieve, _prompt = self._retrieve_and_assemble(human_prompt, history)
+            return PreparedAnswer(human_prompt, documents, prompt_value, None, "", None, _retrieve, _prompt, cacheable=False)
+        _started = time.perf_counter()
+        cached, _index_version, _embedding = self._lookup_answer(human_prompt)
+        if cached is not None:
+            return PreparedAnswer(human_prompt, cached.sources, None, cached.answer, _index_version, _embedding,
+                                  time.perf_counter() - _started, 0.0)
+        documents, prompt_value, _retrieve, _prompt = self._retrieve_and_assemble(human_prompt)
+        return PreparedAnswer(human_prompt, documents, prompt_value, None, _index_version, _embedding, _retrieve, _prompt)
+
+    def generate_answer(self, prepared: PreparedAnswer) -> Tuple[str, TalkTimings]:
+        """
+        Generates the answer of a prepared question. The answer is streamed from the model, so the time to the
+        first token is measured, and stored in the answer cache. Unlike talk() it does not set 'last_timings',
+        so it can be called from several threads at once.
+        Args:
+            prepared (PreparedAnswer): The result of prepare_answer().
+        Returns:
+            Tuple[str, TalkTimings]: The answer and the timings of the question.
+        """
+        if prepared.cached_answer is not None:
+            return prepared.cached_answer, TalkTimings(prepared.retrieve, 0.0, 0.0, cached=True)
+        _stats = _GenerationStats()
+        _started = time.perf_counter()
+        _first_token = None
+        _answer = []
+        for token in self.model.stream(prepared.prompt_value, config={"callbacks": [_stats]}):
+            if _first_token is None:
+                _first_token = time.perf_counter() - _started
+            _answer.append(token)
+        answer = "".join(_answer)
+        self._store_answer(prepared, answer)
+        return answer, _stats.timings(prepared.retrieve, prepared.prompt, time.perf_counter() - _started, _first_token)
+
+    def talk(self, human_prompt: str, memory: ConversationMemory = None) -> str:
+        """
+        Engage in a conversation based on the provided human prompt.
+        This method uses a vector store to retrieve relevant documents and incorporates them into a 
+        question-answering chain to generate a response. If no documents are loaded in the vector store, 
+        it returns a message indicating that there is nothing to talk about.
+        If the answer cache is configured, a cached answer to the same (or a similar) question is returned instead.
+        With a conversation memory the previous turns are sent along and the answer is added to them.
+        The duration of the retrieval, the prompt assembly and the generation is stored in 'last_timings'.
+        Args:
+            human_prompt (str): The prompt or question provided by the user.
+            memory (ConversationMemory): The conversation of this call, e.g. of a session of the chat server. Default is 'memory'.
+        Returns:
+            str: The generated response based on the context from the retrieved documents or a message 
+                 indicating that the information is not available in the provided context.
+        """
+        if self._vectorstore is None and self.snapshot is None:
+            return "Nothing to talk about. Please load some documents first."
+
+        _memory = self._memory(memory)
+        prepared = self.prepare_answer(human_prompt, _memory.messages() if _memory is not None else None)
+        if prepared.cached_answer is not None:
+            self.last_timings = TalkTimings(prepared.retrieve, 0.0, 0.0, cached=True)
+            _memory.add(human_prompt, prepared.cached_answer) if _memory is not None else None
+            return prepared.cached_answer
+
+        _stats = _GenerationStats()
+        _started = time.perf_counter()
+        answer = self.model.invoke(prepared.prompt_value, config={"callbacks": [_stats]})
+
+        self.last_timings = _stats.timings(prepared.retrieve, prepared.prompt, time.perf_counter() - _started)
+        self._store_answer(prepared, answer)
+        _memory.add(human_prompt, answer) if _memory is not None else None
+        return answer
+
+    def stream_talk(self, human_prompt: str, memory: ConversationMemory = None) -> TalkStream:
+        """
+        Same as talk(), but the answer is streamed token by token as the model produces it.
+        The documents are retrieved before this method returns, so they are available as 'sources' up front.
+        The timings, including the time to the first token, are stored in 'last_timings' and the answer is added
+        to the conversation memory once the stream is consumed.
+        Args:
+            human_prompt (str): The prompt or question provided by the user.
+            memory (ConversationMemory): The conversation of this call, e.g. of a session of the chat server. Default is 'memory'.
+        Returns:
+            TalkStream: The retrieved sources and the iterator over the tokens of the answer.
+        """
+        if self._vectorstore is None and self.snapshot is None:
+            return TalkStream([], iter(["Nothing to talk about. Please load some documents first."]))
+
+        _memory = self._memory(memory)
+        prepared = self.prepare_answer(human_prompt, _memory.messages() if _memory is not None else None)
+        if prepared.cached_answer is not None:
+            self.last_timings = TalkTimings(prepared.retrieve, 0.0, 0.0, cached=True)
+            _memory.add(human_prompt, prepared.cached_answer) if _memory is not None else None
+            return TalkStream(prepared.sources, iter([prepared.cached_answer]), self.last_timings)
+
+        def _tokens() -> Iterator[str]:
+            _stats = _GenerationStats()
+            _started = time.perf_counter()
+            _first_token = None
+            _answer = []
+            for token in self.model.stream(prepared.prompt_value, config={"callbacks": [_stats]}):
+                if _first_token is None:
+                    _first_token = time.perf_counter() - _started
+                _answer.append(token)
+                yield token
+            self.last_timings = _stream.timings = _stats.timings(prepared.retrieve, prepared.prompt, time.perf_counter() - _started, _first_token)
+            answer = "".join(_answer)
+            self._store_answer(prepared, answer)
+            _memory.add(human_prompt, answer) if _memory is not None else None
 
+        _stream = TalkStream(prepared.sources, _tokens())
+        return _stream
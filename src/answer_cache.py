@@ -0,0 +1,152 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from typing import List, NamedTuple, Optional
+import numpy as np
+from langchain_core.documents import Document
+
+
+class CachedAnswer(NamedTuple):
+    """
+    An answer stored in the AnswerCache.
+    Attributes:
+        answer (str): The generated answer.
+        sources (List[Document]): The documents the answer is based on.
+        system_prompt (str): The system prompt the answer was generated with.
+        index_version (str): The version of the collection the answer was generated from.
+        embedding (np.ndarray): The normalized embedding of the question, None if the semantic level is disabled.
+        created (float): The time the answer was stored at.
+    """
+    answer: str
+    sources: List[Document]
+    system_prompt: Optional[str]
+    index_version: str
+    embedding: Optional[np.ndarray]
+    created: float
+
+
+class AnswerCache:
+    """
+    An in-memory two-level cache of chat answers with TTL and LRU eviction.
+    The exact level is keyed by the normalized prompt, the system prompt and the index version.
+    The optional semantic level reuses an answer when the cosine distance between the question embeddings
+    is within 'semantic_distance'. Entries of an older index version never match, so the cache is
+    invalidated as soon as the embedding processor changes the collection.
+    Attributes:
+        max_entries (int): The maximum number of cached answers.
+        ttl (float): The time to live of an answer in seconds.
+        semantic_distance (float): The maximum cosine distance for the semantic level, None disables it.
+        hits (int): The number of answers served from the cache.
+        misses (int): The number of lookups which did not find an answer.
+        _entries (OrderedDict): The cached answers by their exact key, the least recently used first.
+        _lock (threading.Lock): The lock guarding the entries.
+    Args:
+        max_entries (int): The maximum number of cached answers. Default is 256.
+        ttl (float): The time to live of an answer in seconds. Default is 3600.
+        semantic_distance (float): The maximum cosine distance for the semantic level. Default is None.
+    Methods:
+        normalize(prompt: str) -> str: Normalizes the prompt for the exact level.
+        get(prompt: str, system_prompt: str, index_version: str, embedding: List[float]) -> Optional[CachedAnswer]: Looks up an answer.
+        put(prompt: str, system_prompt: str, index_version: str, answer: str, sources: List[Document], embedding: List[float]) -> None: Stores an answer.
+        clear() -> None: Removes all answers.
+    """
+    def __init__(self, max_entries: int = 256, ttl: float = 3600, semantic_distance: float = None) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.semantic_distance = semantic_distance
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, CachedAnswer]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def semantic(self) -> bool:
+        return self.semantic_distance is not None
+
+    @staticmethod
+    def normalize(prompt: str) -> str:
+        return " ".join(prompt.lower().split())
+
+    @classmethod
+    def _key(cls, prompt: str, system_prompt: Optional[str], index_version: str) -> str:
+        return hashlib.sha256(f"{cls.normalize(prompt)}\0{system_prompt}\0{index_version}".encode("utf-8")).hexdigest()
+
+    def get(self, prompt: str, system_prompt: Optional[str], index_version: str, embedding: List[float] = None) -> Optional[CachedAnswer]:
+        """
+        Looks up an answer by the exact key first, then by the closest question embedding if the semantic level is enabled.
+        Args:
+            prompt (str): The prompt provided by the user.
+            system_prompt (str): The system prompt of the conversation.
+            index_version (str): The current version of the collection.
+            embedding (List[float]): The embedding of the prompt, required for the semantic level only.
+        Returns:
+            Optional[CachedAnswer]: The cached answer, or None if there is no fresh answer for the prompt.
+        """
+        with self._lock:
+            self._expire()
+            key = self._key(prompt, system_prompt, index_version)
+            entry = self._entries.get(key)
+            if entry is None and self.semantic and embedding is not None:
+                key, entry = self._closest(system_prompt, index_version, self._normalize_vector(embedding))
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self,
+            prompt: str,
+            system_prompt: Optional[str],
+            index_version: str,
+            answer: str,
+            sources: List[Document],
+            embedding: List[float] = None) -> None:
+        """
+        Stores an answer and evicts the least recently used answers above 'max_entries'.
+        Args:
+            prompt (str): The prompt provided by the user.
+            system_prompt (str): The system prompt of the conversation.
+            index_version (str): The version of the collection the answer was generated from.
+            answer (str): The generated answer.
+            sources (List[Document]): The documents the answer is based on.
+            embedding (List[float]): The embedding of the prompt, required for the semantic level only.
+        Returns:
+            None
+        """
+        _embedding = self._normalize_vector(embedding) if self.semantic and embedding is not None else None
+        with self._lock:
+            key = self._key(prompt, system_prompt, index_version)
+            self._entries[key] = CachedAnswer(answer, sources, system_prompt, index_version, _embedding, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def _expire(self) -> None:
+        _oldest_allowed = time.monotonic() - self.ttl
+        for key in [key for key, entry in self._entries.items() if entry.created < _oldest_allowed]:
+            del self._entries[key]
+
+    def _closest(self, system_prompt: Optional[str], index_version: str, embedding: np.ndarray):
+        _candidates = [
+            (key, entry) for key, entry in self._entries.items()
+            if entry.embedding is not None and entry.system_prompt == system_prompt and entry.index_version == index_version
+        ]
+        if not _candidates:
+            return None, None
+        _similarities = np.stack([entry.embedding for _, entry in _candidates]) @ embedding
+        _best = int(np.argmax(_similarities))
+        if 1.0 - float(_similarities[_best]) > self.semantic_distance:
+            return None, None
+        return _candidates[_best]
+
+    @staticmethod
+    def _normalize_vector(embedding: List[float]) -> np.ndarray:
+        _vector = np.asarray(embedding, dtype=np.float32)
+        _norm = np.linalg.norm(_vector)
+        return _vector / _norm if _norm > 0 else _vector
@@ -1,4 +1,5 @@
 from argparse import ArgumentParser, Namespace
+from src.arguments.common import add_llm_arguments, positive_int
 
 # interface for the run arguments which we will return from the parse method
 class ChatRunArguments:
@@ -8,6 +9,30 @@ class ChatRunArguments:
         system_prompt (str): The system prompt to be used in the chat session.
         chroma_db_name (str): The name of the Chroma database.
         chroma_db_path (str): The file path to the Chroma database.
+        show_timings (bool): Flag indicating whether to print per-stage timings after every answer.
+        no_stream (bool): Flag indicating whether to print the answer only once it is complete.
+        show_sources (bool): Flag indicating whether to print the sources of every answer.
+        answer_cache_size (int): Maximum number of cached answers, 0 disables the answer cache.
+        answer_cache_ttl (float): Time to live of a cached answer in seconds.
+        semantic_cache_distance (float): Maximum cosine distance between questions to reuse an answer, None disables the semantic level.
+        retrieval (str): The retrieval mode, 'hybrid' (vector and BM25 keyword search) or 'vector'.
+        rrf_k (int): The rank constant of the reciprocal rank fusion.
+        vector_weight (float): The weight of the vector ranking in the fusion.
+        keyword_weight (float): The weight of the keyword ranking in the fusion.
+        k (int): The maximum number of documents in the context.
+        context_budget (int): The maximum estimated number of tokens of the context, 0 disables the context packing.
+        collections (list): The names of the collections to search, None for the collection (or the shards) of chroma_db_name.
+        ollama_base_url (str): The base URL of the Ollama API.
+        keep_alive (str): How long Ollama keeps the models loaded after a request, None for the server default.
+        warm_up (bool): Flag indicating whether to load the models at the start and report their cold and warm latency.
+        snapshot (str): The path to a vector snapshot to retrieve from instead of the Chroma collection.
+        history_budget (int): The maximum estimated number of tokens of the conversation history, 0 disables the history.
+        batch (str): The path to a JSONL file of questions to answer instead of the interactive conversation.
+        out (str): The path to the JSONL file of the answers of the batch, appended to when the batch is resumed.
+        batch_concurrency (int): The maximum number of answers of the batch generated at the same time.
+        retrieval_workers (int): The number of threads retrieving the documents of the batch.
+        server (str): The URL of a running chat server (serve.py) to chat with instead of loading the models and the vector store.
+        verbose (bool): Flag indicating whether to print the progress of the batch.
     Args:
         namespace (Namespace): A namespace object containing the arguments for the chat session.
     """
@@ -15,6 +40,30 @@ class ChatRunArguments:
         self._system_prompt = namespace.system_prompt
         self._chroma_db_name = namespace.chroma_db_name
         self._chroma_db_path = namespace.chroma_db_path
+        self._show_timings = namespace.show_timings
+        self._no_stream = namespace.no_stream
+        self._show_sources = namespace.show_sources
+        self._answer_cache_size = namespace.answer_cache_size
+        self._answer_cache_ttl = namespace.answer_cache_ttl
+        self._semantic_cache_distance = namespace.semantic_cache_distance
+        self._retrieval = namespace.retrieval
+        self._rrf_k = namespace.rrf_k
+        self._vector_weight = namespace.vector_weight
+        self._keyword_weight = namespace.keyword_weight
+        self._k = namespace.k
+        self._context_budget = namespace.context_budget
+        self._collections = namespace.collections
+        self._ollama_base_url = namespace.ollama_base_url
+        self._keep_alive = namespace.keep_alive
+        self._warm_up = namespace.warm_up
+        self._snapshot = namespace.snapshot
+        self._history_budget = namespace.history_budget
+        self._batch = namespace.batch
+        self._out = namespace.out
+        self._batch_concurrency = namespace.batch_concurrency
+        self._retrieval_workers = namespace.retrieval_workers
+        self._server = namespace.server
+        self._verbose = namespace.verbose
 
     @property
     def system_prompt(self):
@@ -27,6 +76,102 @@ class ChatRunArguments:
     @property
     def chroma_db_path(self):
         return self._chroma_db_path
+    
+    @property
+    def show_timings(self):
+        return self._show_timings
+    
+    @property
+    def no_stream(self):
+        return self._no_stream
+    
+    @property
+    def show_sources(self):
+        return self._show_sources
+    
+    @property
+    def answer_cache_size(self):
+        return self._answer_cache_size
+    
+    @property
+    def answer_cache_ttl(self):
+        return self._answer_cache_ttl
+    
+    @property
+    def semantic_cache_distance(self):
+        return self._semantic_cache_distance
+    
+    @property
+    def retrieval(self):
+        return self._retrieval
+    
+    @property
+    def rrf_k(self):
+        return self._rrf_k
+    
+    @property
+    def vector_weight(self):
+        return self._vector_weight
+    
+    @property
+    def keyword_weight(self):
+        return self._keyword_weight
+    
+    @property
+    def k(self):
+        return self._k
+    
+    @property
+    def context_budget(self):
+        return self._context_budget
+    
+    @property
+    def collections(self):
+        return self._collections
+    
+    @property
+    def ollama_base_url(self):
+        return self._ollama_base_url
+    
+    @property
+    def keep_alive(self):
+        return self._keep_alive
+    
+    @property
+    def warm_up(self):
+        return self._warm_up
+    
+    @property
+    def snapshot(self):
+        return self._snapshot
+    
+    @property
+    def history_budget(self):
+        return self._history_budget
+    
+    @property
+    def batch(self):
+        return self._batch
+    
+    @property
+    def out(self):
+        return self._out
+    
+    @property
+    def batch_concurrency(self):
+        return self._batch_concurrency
+    
+    @property
+    def retrieval_workers(self):
+        return self._retrieval_workers
+    
+    @property
+    def server(self):
+        return self._server
+    
+    @property
+    def verbose(self):
+        return self._verbose
 
 
 class RunArguments:
@@ -45,28 +190,85 @@ class RunArguments:
     def __init__(self):
         self.parser = ArgumentParser(description='Run the program')
 
+        add_llm_arguments(self.parser)
+
+        self.parser.add_argument(
+            '--show-timings',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Print retrieve, prompt assembly and generation timings, the prompt evaluation and generation time of Ollama and the size of the history after every answer')
+
         self.parser.add_argument(
-            '--system-prompt',
+            '--no-stream',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Print the answer only once it is complete instead of token by token')
+
+        self.parser.add_argument(
+            '--show-sources',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Print the sources the answer is based on')
+
+        # the oldest turns are dropped down to half of the budget, so the start of the prompt stays the same for several turns
+        self.parser.add_argument(
+            '--history-budget',
+            type=int,
+            required=False,
+            default=1024,
+            help='Maximum estimated number of tokens of the previous questions and answers sent with a question, 0 answers every question on its own')
+
+        self.parser.add_argument(
+            '--batch',
             type=str,
             required=False,
             default=None,
-            help='System prompt')
+            help='Answer the questions of this JSONL file (one string or {"id": ..., "question": ...} per line) instead of chatting')
 
         self.parser.add_argument(
-            '--chroma-db-name',
+            '--out',
             type=str,
             required=False,
-            default='chroma_db',
-            help='Chroma db name')
-        
+            default=None,
+            help='JSONL file of the answers of --batch, in the order of the questions; an existing file is resumed')
+
+        self.parser.add_argument(
+            '--batch-concurrency',
+            type=positive_int,
+            required=False,
+            default=2,
+            help='Maximum number of answers of --batch generated at the same time')
+
+        self.parser.add_argument(
+            '--retrieval-workers',
+            type=positive_int,
+            required=False,
+            default=8,
+            help='Number of threads retrieving the documents of --batch')
+
+        # the retrieval and the answer cache options are those of the server then
         self.parser.add_argument(
-            '--chroma-db-path',
+            '--server',
             type=str,
             required=False,
-            default='./chroma_db',
-            help='Chroma db path')
+            default=None,
+            help='Chat with a running serve.py at this URL, e.g. http://127.0.0.1:8000, instead of loading the vector store at every start')
+
+        self.parser.add_argument(
+            '--verbose',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Print the progress of --batch')
         
     def parse(self) -> ChatRunArguments:
         return_namespace = self.parser.parse_args()
+        if return_namespace.batch and not return_namespace.out:
+            self.parser.error('--batch requires --out')
+        if return_namespace.batch and return_namespace.server:
+            self.parser.error('--batch cannot be used with --server')
         return ChatRunArguments(return_namespace)
         
\ No newline at end of file
@@ -0,0 +1,154 @@
+from argparse import ArgumentParser, ArgumentTypeError
+
+
+def positive_int(value: str) -> int:
+    """
+    Argument type of the counts and sizes which have to be at least 1, e.g. the number of worker threads.
+    Args:
+        value (str): The value of the argument.
+    Returns:
+        int: The value as an integer.
+    Raises:
+        ArgumentTypeError: If the value is not an integer of at least 1.
+    """
+    try:
+        _number = int(value)
+    except ValueError:
+        raise ArgumentTypeError(f"invalid int value: '{value}'")
+    if _number < 1:
+        raise ArgumentTypeError(f"{value} is not a positive number, use 1 or more")
+    return _number
+
+
+def add_llm_arguments(parser: ArgumentParser) -> None:
+    """
+    Adds the arguments of the language model, its retrieval and its answer cache which chat.py and serve.py share
+    (see build_llm() of src/llm_builder.py).
+    Args:
+        parser (ArgumentParser): The parser to add the arguments to.
+    Returns:
+        None
+    """
+    parser.add_argument(
+        '--system-prompt',
+        type=str,
+        required=False,
+        default=None,
+        help='System prompt')
+
+    parser.add_argument(
+        '--chroma-db-name',
+        type=str,
+        required=False,
+        default='chroma_db',
+        help='Chroma db name')
+
+    parser.add_argument(
+        '--chroma-db-path',
+        type=str,
+        required=False,
+        default='./chroma_db',
+        help='Chroma db path')
+
+    parser.add_argument(
+        '--answer-cache-size',
+        type=int,
+        required=False,
+        default=256,
+        help='Maximum number of cached answers, 0 disables the answer cache')
+
+    parser.add_argument(
+        '--answer-cache-ttl',
+        type=float,
+        required=False,
+        default=3600,
+        help='Time to live of a cached answer in seconds')
+
+    parser.add_argument(
+        '--semantic-cache-distance',
+        type=float,
+        required=False,
+        default=None,
+        help='Reuse the answer of a cached question within this cosine distance (e.g. 0.05), disabled by default')
+
+    # the hybrid retrieval falls back to the vector search when the keyword index was not built
+    parser.add_argument(
+        '--retrieval',
+        type=str,
+        choices=['hybrid', 'vector'],
+        required=False,
+        default='hybrid',
+        help='Fuse the vector search with the BM25 keyword index (hybrid) or use the vector search only')
+
+    parser.add_argument(
+        '--rrf-k',
+        type=int,
+        required=False,
+        default=60,
+        help='Rank constant of the reciprocal rank fusion, higher values flatten the top ranks')
+
+    parser.add_argument(
+        '--vector-weight',
+        type=float,
+        required=False,
+        default=1.0,
+        help='Weight of the vector ranking in the hybrid retrieval')
+
+    parser.add_argument(
+        '--keyword-weight',
+        type=float,
+        required=False,
+        default=1.0,
+        help='Weight of the keyword ranking in the hybrid retrieval')
+
+    parser.add_argument(
+        '--k',
+        type=int,
+        required=False,
+        default=4,
+        help='Maximum number of documents in the context of the prompt')
+
+    # duplicates and overlaps are removed before the budget is applied, so the budget holds more distinct text
+    parser.add_argument(
+        '--context-budget',
+        type=int,
+        required=False,
+        default=2048,
+        help='Maximum estimated number of tokens of the context, 0 disables the deduplication, merging and MMR reranking')
+
+    # the shards of a collection sharded by the embedding processor are found without this argument
+    parser.add_argument(
+        '--collections',
+        type=str,
+        nargs='+',
+        required=False,
+        default=None,
+        help='Names of the collections to search concurrently, by default the collection or the shards of --chroma-db-name')
+
+    parser.add_argument(
+        '--ollama-base-url',
+        type=str,
+        required=False,
+        default='http://localhost:11434',
+        help='Base URL of the Ollama API')
+
+    parser.add_argument(
+        '--keep-alive',
+        type=str,
+        required=False,
+        default=None,
+        help='How long Ollama keeps the models loaded after a request, e.g. 300, 30m or -1 (forever); default is the server setting')
+
+    parser.add_argument(
+        '--warm-up',
+        action='store_true',
+        required=False,
+        default=False,
+        help='Load the chat and the embeddings model at the start and print their cold and warm latency')
+
+    parser.add_argument(
+        '--snapshot',
+        type=str,
+        required=False,
+        default=None,
+        help='Retrieve from this vector snapshot (exported by the embedding processor with --export-snapshot) instead of the Chroma collection')
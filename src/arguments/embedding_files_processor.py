@@ -1,5 +1,7 @@
 from argparse import ArgumentParser, Namespace
 from typing import Sequence
+from src.arguments.common import positive_int
+from src.checksum import CHECKSUM_ALGORITHMS, DEFAULT_CHECKSUM_ALGORITHM
 
 # interface for the run arguments which we will return from the parse method
 class LlmRunArguments:
@@ -13,6 +15,32 @@ class LlmRunArguments:
         chroma_db_name (str): The name of the Chroma database.
         chroma_db_path (str): The path to the Chroma database.
         exclude_subdirectories (bool): Flag indicating whether to exclude subdirectories.
+        verify_checksums (bool): Flag indicating whether to rehash all files ignoring the manifest.
+        workers (int): Number of threads hashing, loading and splitting files.
+        embed_batch_size (int): Number of chunks embedded and stored per call.
+        max_inflight (int): Maximum number of prepared files waiting for the embedding.
+        embedding_cache_size (int): Maximum size of the chunk embedding cache in MiB, 0 disables the cache.
+        watch (bool): Flag indicating whether to keep watching the directory for changes after the first pass.
+        watch_debounce (float): Quiet period in seconds after the last change before re-indexing.
+        watch_poll_interval (float): Interval in seconds between the scans of the directory in the polling mode.
+        watch_polling (bool): Flag indicating whether to poll the directory instead of using file system events.
+        include_globs (list): Gitignore-style patterns the analyzed files have to match.
+        exclude_globs (list): Gitignore-style patterns of files and folders to skip.
+        ollama_base_url (str): The base URL of the Ollama API.
+        ollama_model (str): The model used for the embeddings.
+        stats_json (str): The path to write the run statistics to as JSON.
+        stats_prometheus (str): The path to write the run statistics to in the Prometheus textfile format.
+        profile (str): The path to write the cProfile statistics of the processing stages to.
+        stream_threshold (int): The size in MiB from which files are streamed in bounded batches.
+        checksum_algorithm (str): The hash algorithm of the file checksums.
+        no_keyword_index (bool): Flag indicating whether to skip the BM25 keyword index of the chunks.
+        shard_by (str): The sharding of the collection, 'none', 'directory' or 'hash'.
+        shard_count (int): The number of shards of the 'hash' sharding.
+        drop_shards (list): The collection names of the shards to drop.
+        keep_alive (str): How long Ollama keeps the embeddings model loaded after a request, None for the server default.
+        warm_up (bool): Flag indicating whether to load the embeddings model before the first file and report its cold and warm latency.
+        export_snapshot (str): The path to export the read-only vector snapshot of the collection to after every processing pass.
+        snapshot_dtype (str): The type of the vectors of the snapshot, 'float32' or 'int8'.
     Args:
         namespace (Namespace): A namespace object containing the arguments.
     """
@@ -24,6 +52,32 @@ class LlmRunArguments:
         self._chroma_db_name = namespace.chroma_db_name
         self._chroma_db_path = namespace.chroma_db_path
         self._exclude_subdirectories = namespace.exclude_subdirectories
+        self._verify_checksums = namespace.verify_checksums
+        self._workers = namespace.workers
+        self._embed_batch_size = namespace.embed_batch_size
+        self._max_inflight = namespace.max_inflight
+        self._embedding_cache_size = namespace.embedding_cache_size
+        self._watch = namespace.watch
+        self._watch_debounce = namespace.watch_debounce
+        self._watch_poll_interval = namespace.watch_poll_interval
+        self._watch_polling = namespace.watch_polling
+        self._include_globs = namespace.include_globs
+        self._exclude_globs = namespace.exclude_globs
+        self._ollama_base_url = namespace.ollama_base_url
+        self._ollama_model = namespace.ollama_model
+        self._stats_json = namespace.stats_json
+        self._stats_prometheus = namespace.stats_prometheus
+        self._profile = namespace.profile
+        self._stream_threshold = namespace.stream_threshold
+        self._checksum_algorithm = namespace.checksum_algorithm
+        self._no_keyword_index = namespace.no_keyword_index
+        self._shard_by = namespace.shard_by
+        self._shard_count = namespace.shard_count
+        self._drop_shards = namespace.drop_shards
+        self._keep_alive = namespace.keep_alive
+        self._warm_up = namespace.warm_up
+        self._export_snapshot = namespace.export_snapshot
+        self._snapshot_dtype = namespace.snapshot_dtype
 
     @property
     def directory_to_analyze(self):
@@ -52,6 +106,110 @@ class LlmRunArguments:
     @property
     def exclude_subdirectories(self):
         return self._exclude_subdirectories
+    
+    @property
+    def verify_checksums(self):
+        return self._verify_checksums
+    
+    @property
+    def workers(self):
+        return self._workers
+    
+    @property
+    def embed_batch_size(self):
+        return self._embed_batch_size
+    
+    @property
+    def max_inflight(self):
+        return self._max_inflight
+    
+    @property
+    def embedding_cache_size(self):
+        return self._embedding_cache_size
+    
+    @property
+    def watch(self):
+        return self._watch
+    
+    @property
+    def watch_debounce(self):
+        return self._watch_debounce
+    
+    @property
+    def watch_poll_interval(self):
+        return self._watch_poll_interval
+    
+    @property
+    def watch_polling(self):
+        return self._watch_polling
+    
+    @property
+    def include_globs(self):
+        return self._include_globs
+    
+    @property
+    def exclude_globs(self):
+        return self._exclude_globs
+    
+    @property
+    def ollama_base_url(self):
+        return self._ollama_base_url
+    
+    @property
+    def ollama_model(self):
+        return self._ollama_model
+    
+    @property
+    def stats_json(self):
+        return self._stats_json
+    
+    @property
+    def stats_prometheus(self):
+        return self._stats_prometheus
+    
+    @property
+    def profile(self):
+        return self._profile
+    
+    @property
+    def stream_threshold(self):
+        return self._stream_threshold
+    
+    @property
+    def checksum_algorithm(self):
+        return self._checksum_algorithm
+    
+    @property
+    def no_keyword_index(self):
+        return self._no_keyword_index
+    
+    @property
+    def shard_by(self):
+        return self._shard_by
+    
+    @property
+    def shard_count(self):
+        return self._shard_count
+    
+    @property
+    def drop_shards(self):
+        return self._drop_shards
+    
+    @property
+    def keep_alive(self):
+        return self._keep_alive
+    
+    @property
+    def warm_up(self):
+        return self._warm_up
+    
+    @property
+    def export_snapshot(self):
+        return self._export_snapshot
+    
+    @property
+    def snapshot_dtype(self):
+        return self._snapshot_dtype
 
 
 
@@ -80,6 +238,58 @@ class RunArguments:
             Path to the chroma database.
         --exclude-subdirectories (list of str, optional, default=[]):
             Subfolders to exclude from analysis.
+        --verify-checksums (bool, optional, default=False):
+            Rehash all files instead of trusting the file manifest.
+        --workers (int, optional, default=4):
+            Number of threads hashing, loading and splitting files.
+        --embed-batch-size (int, optional, default=64):
+            Number of chunks embedded and added to the vectorstore per call.
+        --max-inflight (int, optional, default=128):
+            Maximum number of prepared files waiting for the embedding.
+        --embedding-cache-size (int, optional, default=1024):
+            Maximum size of the chunk embedding cache in MiB, 0 disables the cache.
+        --watch (bool, optional, default=False):
+            Keep watching the directory and re-index changed files after the first pass.
+        --watch-debounce (float, optional, default=2.0):
+            Quiet period in seconds after the last change before re-indexing.
+        --watch-poll-interval (float, optional, default=5.0):
+            Interval in seconds between the scans of the directory in the polling mode.
+        --watch-polling (bool, optional, default=False):
+            Poll the directory instead of using file system events.
+        --include-globs (list of str, optional, default=[]):
+            Gitignore-style patterns the analyzed files have to match, e.g. 'docs/**/*.md'.
+        --exclude-globs (list of str, optional, default=[]):
+            Gitignore-style patterns of files and folders to skip, e.g. 'build/' or '*_test.py'.
+        --ollama-base-url (str, optional, default='http://localhost:11434'):
+            Base URL of the Ollama API.
+        --ollama-model (str, optional, default='nomic-embed-text'):
+            Model used for the embeddings.
+        --stats-json (str, optional, default=None):
+            Write the run statistics (time per stage and counters) to this file as JSON.
+        --stats-prometheus (str, optional, default=None):
+            Write the run statistics to this file in the Prometheus textfile format.
+        --profile (str, optional, default=None):
+            Profile the processing stages with cProfile and write the statistics to this file.
+        --stream-threshold (float, optional, default=16):
+            Size in MiB from which files are read, split and embedded in bounded batches instead of at once.
+        --checksum-algorithm (str, optional, default='sha256'):
+            Hash algorithm of the file checksums, switching it requires one run with --reload.
+        --no-keyword-index (bool, optional, default=False):
+            Do not maintain the BM25 keyword index of the chunks used by the hybrid retrieval of the chat.
+        --shard-by (str, optional, default='none'):
+            Spread the files over several collections by their top-level directory ('directory') or by the hash of their path ('hash').
+        --shard-count (int, optional, default=8):
+            Number of shards of the 'hash' sharding.
+        --drop-shards (list of str, optional, default=[]):
+            Drop these shards (collection names) and exit, the next run indexes their files again.
+        --keep-alive (str, optional, default=None):
+            How long Ollama keeps the embeddings model loaded after a request, e.g. 300, 30m or -1 (forever).
+        --warm-up (bool, optional, default=False):
+            Load the embeddings model before the first file and print its cold and warm latency.
+        --export-snapshot (str, optional, default=None):
+            Export a read-only vector snapshot of the collection to this folder after every processing pass, for the chat --snapshot.
+        --snapshot-dtype (str, optional, default='float32'):
+            Type of the vectors of the snapshot, 'int8' is a quarter of the size with a slightly less precise distance.
     """
     def __init__(self):
         self.parser = ArgumentParser(description='Run the program')
@@ -135,6 +345,202 @@ class RunArguments:
             default=[],
             help='Subfolders to exclude')
 
+        # gitignore-style patterns matched against the paths relative to the analyzed directory
+        self.parser.add_argument(
+            '--include-globs',
+            type=str,
+            nargs='+',
+            required=False,
+            default=[],
+            help='Gitignore-style patterns the analyzed files have to match')
+
+        self.parser.add_argument(
+            '--exclude-globs',
+            type=str,
+            nargs='+',
+            required=False,
+            default=[],
+            help='Gitignore-style patterns of files and folders to skip')
+
+        self.parser.add_argument(
+            '--ollama-base-url',
+            type=str,
+            required=False,
+            default='http://localhost:11434',
+            help='Base URL of the Ollama API')
+
+        self.parser.add_argument(
+            '--ollama-model',
+            type=str,
+            required=False,
+            default='nomic-embed-text',
+            help='Model used for the embeddings')
+
+        # the summary table of the run is always printed, these options export it for dashboards and regressions
+        self.parser.add_argument(
+            '--stats-json',
+            type=str,
+            required=False,
+            default=None,
+            help='Write the run statistics (time per stage and counters) to this file as JSON')
+
+        self.parser.add_argument(
+            '--stats-prometheus',
+            type=str,
+            required=False,
+            default=None,
+            help='Write the run statistics to this file in the Prometheus textfile format')
+
+        self.parser.add_argument(
+            '--profile',
+            type=str,
+            required=False,
+            default=None,
+            help='Profile the processing stages with cProfile and write the statistics to this file')
+
+        self.parser.add_argument(
+            '--stream-threshold',
+            type=float,
+            required=False,
+            default=16,
+            help='Size in MiB from which files are read, split and embedded in bounded batches instead of at once')
+
+        # the algorithm is stored next to the checksum in the chunk metadata, existing sha256 indexes stay valid
+        self.parser.add_argument(
+            '--checksum-algorithm',
+            type=str,
+            choices=CHECKSUM_ALGORITHMS,
+            required=False,
+            default=DEFAULT_CHECKSUM_ALGORITHM,
+            help='Hash algorithm of the file checksums, switching it requires one run with --reload')
+
+        # the keyword index is updated together with the vector store, it is filled from the vector store if it is empty
+        self.parser.add_argument(
+            '--no-keyword-index',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Do not maintain the BM25 keyword index of the chunks used by the hybrid retrieval of the chat')
+
+        # every shard is a collection of its own, so it can be re-indexed or dropped without touching the others
+        self.parser.add_argument(
+            '--shard-by',
+            type=str,
+            choices=['none', 'directory', 'hash'],
+            required=False,
+            default='none',
+            help="Spread the files over several collections by their top-level directory ('directory') or by the hash of their path ('hash')")
+
+        self.parser.add_argument(
+            '--shard-count',
+            type=positive_int,
+            required=False,
+            default=8,
+            help="Number of shards of the 'hash' sharding")
+
+        self.parser.add_argument(
+            '--drop-shards',
+            type=str,
+            nargs='+',
+            required=False,
+            default=[],
+            help='Drop these shards (collection names) and exit, the next run indexes their files again')
+
+        self.parser.add_argument(
+            '--keep-alive',
+            type=str,
+            required=False,
+            default=None,
+            help='How long Ollama keeps the embeddings model loaded after a request, e.g. 300, 30m or -1 (forever); default is the server setting')
+
+        self.parser.add_argument(
+            '--warm-up',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Load the embeddings model before the first file and print its cold and warm latency')
+
+        self.parser.add_argument(
+            '--export-snapshot',
+            type=str,
+            required=False,
+            default=None,
+            help='Export a read-only vector snapshot of the collection to this folder after every processing pass')
+
+        # the SNAPSHOT_DTYPES of src/vector_snapshot.py, listed here so parsing the arguments does not import numpy
+        self.parser.add_argument(
+            '--snapshot-dtype',
+            type=str,
+            choices=['float32', 'int8'],
+            required=False,
+            default='float32',
+            help='Type of the vectors of the snapshot, int8 is a quarter of the size with a slightly less precise distance')
+
+        # argument to force a full rehash of all files (the manifest is used only to skip unchanged files otherwise)
+        self.parser.add_argument(
+            '--verify-checksums',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Rehash all files and check them against the vectorstore, ignoring the file manifest')
+
+        self.parser.add_argument(
+            '--workers',
+            type=positive_int,
+            required=False,
+            default=4,
+            help='Number of threads hashing, loading and splitting files')
+
+        self.parser.add_argument(
+            '--embed-batch-size',
+            type=positive_int,
+            required=False,
+            default=64,
+            help='Number of chunks embedded and added to the vectorstore per call')
+
+        self.parser.add_argument(
+            '--max-inflight',
+            type=positive_int,
+            required=False,
+            default=128,
+            help='Maximum number of prepared files waiting for the embedding')
+
+        self.parser.add_argument(
+            '--embedding-cache-size',
+            type=int,
+            required=False,
+            default=1024,
+            help='Maximum size of the chunk embedding cache in MiB, 0 disables the cache')
+
+        # watch mode uses file system events of the optional watchdog package and falls back to polling without it
+        self.parser.add_argument(
+            '--watch',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Keep watching the directory and re-index changed files after the first pass')
+
+        self.parser.add_argument(
+            '--watch-debounce',
+            type=float,
+            required=False,
+            default=2.0,
+            help='Quiet period in seconds after the last change before re-indexing')
+
+        self.parser.add_argument(
+            '--watch-poll-interval',
+            type=float,
+            required=False,
+            default=5.0,
+            help='Interval in seconds between the scans of the directory in the polling mode')
+
+        self.parser.add_argument(
+            '--watch-polling',
+            action='store_true',
+            required=False,
+            default=False,
+            help='Poll the directory instead of using file system events')
+
 
     def parse(self, args: Sequence[str] = None) -> LlmRunArguments:
         return_namespace = self.parser.parse_args(args=args)
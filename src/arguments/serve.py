@@ -0,0 +1,204 @@
+from argparse import ArgumentParser, Namespace
+from typing import Sequence
+from src.arguments.common import add_llm_arguments, positive_int
+
+# interface for the run arguments which we will return from the parse method
+class ServeRunArguments:
+    """
+    ServeRunArguments is a class that encapsulates the arguments required for running the chat HTTP server.
+    Attributes:
+        host (str): The host to listen on.
+        port (int): The port to listen on.
+        max_concurrency (int): The maximum number of concurrent calls to Ollama.
+        system_prompt (str): The system prompt to be used in the chat sessions.
+        chroma_db_name (str): The name of the Chroma database.
+        chroma_db_path (str): The file path to the Chroma database.
+        answer_cache_size (int): Maximum number of cached answers, 0 disables the answer cache.
+        answer_cache_ttl (float): Time to live of a cached answer in seconds.
+        semantic_cache_distance (float): Maximum cosine distance between questions to reuse an answer, None disables the semantic level.
+        retrieval (str): The retrieval mode, 'hybrid' (vector and BM25 keyword search) or 'vector'.
+        rrf_k (int): The rank constant of the reciprocal rank fusion.
+        vector_weight (float): The weight of the vector ranking in the fusion.
+        keyword_weight (float): The weight of the keyword ranking in the fusion.
+        k (int): The maximum number of documents in the context.
+        context_budget (int): The maximum estimated number of tokens of the context, 0 disables the context packing.
+        collections (list): The names of the collections to search, None for the collection (or the shards) of chroma_db_name.
+        ollama_base_url (str): The base URL of the Ollama API.
+        keep_alive (str): How long Ollama keeps the models loaded after a request, None for the server default.
+        warm_up (bool): Flag indicating whether to load the models at the start and report their cold and warm latency.
+        snapshot (str): The path to a vector snapshot to retrieve from instead of the Chroma collection.
+        history_budget (int): The maximum estimated number of tokens of the conversation history sent with a prompt, 0 ignores the history.
+        verbose (bool): Flag indicating whether to run in verbose mode.
+    Args:
+        namespace (Namespace): A namespace object containing the arguments for the server.
+    """
+    def __init__(self, namespace: Namespace):
+        self._host = namespace.host
+        self._port = namespace.port
+        self._max_concurrency = namespace.max_concurrency
+        self._system_prompt = namespace.system_prompt
+        self._chroma_db_name = namespace.chroma_db_name
+        self._chroma_db_path = namespace.chroma_db_path
+        self._answer_cache_size = namespace.answer_cache_size
+        self._answer_cache_ttl = namespace.answer_cache_ttl
+        self._semantic_cache_distance = namespace.semantic_cache_distance
+        self._retrieval = namespace.retrieval
+        self._rrf_k = namespace.rrf_k
+        self._vector_weight = namespace.vector_weight
+        self._keyword_weight = namespace.keyword_weight
+        self._k = namespace.k
+        self._context_budget = namespace.context_budget
+        self._collections = namespace.collections
+        self._ollama_base_url = namespace.ollama_base_url
+        self._keep_alive = namespace.keep_alive
+        self._warm_up = namespace.warm_up
+        self._snapshot = namespace.snapshot
+        self._history_budget = namespace.history_budget
+        self._verbose = namespace.verbose
+
+    @property
+    def host(self):
+        return self._host
+    
+    @property
+    def port(self):
+        return self._port
+    
+    @property
+    def max_concurrency(self):
+        return self._max_concurrency
+
+    @property
+    def system_prompt(self):
+        return self._system_prompt
+    
+    @property
+    def chroma_db_name(self):
+        return self._chroma_db_name
+    
+    @property
+    def chroma_db_path(self):
+        return self._chroma_db_path
+    
+    @property
+    def answer_cache_size(self):
+        return self._answer_cache_size
+    
+    @property
+    def answer_cache_ttl(self):
+        return self._answer_cache_ttl
+    
+    @property
+    def semantic_cache_distance(self):
+        return self._semantic_cache_distance
+    
+    @property
+    def retrieval(self):
+        return self._retrieval
+    
+    @property
+    def rrf_k(self):
+        return self._rrf_k
+    
+    @property
+    def vector_weight(self):
+        return self._vector_weight
+    
+    @property
+    def keyword_weight(self):
+        return self._keyword_weight
+    
+    @property
+    def k(self):
+        return self._k
+    
+    @property
+    def context_budget(self):
+        return self._context_budget
+    
+    @property
+    def collections(self):
+        return self._collections
+    
+    @property
+    def ollama_base_url(self):
+        return self._ollama_base_url
+    
+    @property
+    def keep_alive(self):
+        return self._keep_alive
+    
+    @property
+    def warm_up(self):
+        return self._warm_up
+    
+    @property
+    def snapshot(self):
+        return self._snapshot
+    
+    @property
+    def history_budget(self):
+        return self._history_budget
+    
+    @property
+    def verbose(self):
+        return self._verbose
+
+
+class RunArguments:
+    """
+    A class to handle the parsing of command-line arguments for running the chat HTTP server.
+    Attributes:
+    parser : ArgumentParser
+        An ArgumentParser object to handle the command-line arguments.
+    
+    Methods:
+    __init__():
+        Initializes the RunArguments class and sets up the argument parser with the required arguments.
+    parse(args: Sequence[str] = None) -> ServeRunArguments:
+        Parses the command-line arguments and returns a ServeRunArguments object containing the parsed values.
+    """
+    def __init__(self):
+        self.parser = ArgumentParser(description='Run the chat HTTP server')
+
+        self.parser.add_argument(
+            '--host',
+            type=str,
+            required=False,
+            default='127.0.0.1',
+            help='Host to listen on')
+
+        self.parser.add_argument(
+            '--port',
+            type=int,
+            required=False,
+            default=8000,
+            help='Port to listen on')
+
+        self.parser.add_argument(
+            '--max-concurrency',
+            type=positive_int,
+            required=False,
+            default=2,
+            help='Maximum number of concurrent calls to Ollama')
+
+        add_llm_arguments(self.parser)
+
+        # the history is trimmed like the history of chat.py, so a history trimmed by chat.py --server is kept as it is
+        self.parser.add_argument(
+            '--history-budget',
+            type=int,
+            required=False,
+            default=1024,
+            help='Maximum estimated number of tokens of the conversation history sent with a prompt, 0 ignores the history')
+
+        self.parser.add_argument(
+            '--verbose', 
+            action='store_true', 
+            required=False,
+            default=False,
+            help='Verbose mode')
+        
+    def parse(self, args: Sequence[str] = None) -> ServeRunArguments:
+        return_namespace = self.parser.parse_args(args=args)
+        return ServeRunArguments(return_namespace)
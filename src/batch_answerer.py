@@ -0,0 +1,222 @@
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, NamedTuple, Set
+from src.LLM import OllamaLLM
+
+
+class BatchReport(NamedTuple):
+    """
+    The outcome of BatchAnswerer.run().
+    Attributes:
+        questions (int): The number of questions in the input file.
+        answered (int): The number of questions answered by this run.
+        resumed (int): The number of questions skipped because the output file already had their answer.
+        failed (int): The number of questions whose answer failed, they are written with an 'error'.
+        seconds (float): The wall time of the run.
+        latencies (List[float]): The latency of every answered question in seconds.
+    """
+    questions: int
+    answered: int
+    resumed: int
+    failed: int
+    seconds: float
+    latencies: List[float]
+
+    def __str__(self) -> str:
+        _lines = [f"Questions: {self.questions}, answered {self.answered}, resumed {self.resumed}, failed {self.failed} "
+                  f"in {self.seconds:.1f}s ({self.answered / self.seconds if self.seconds > 0 else 0.0:.2f} questions/s)"]
+        if self.latencies:
+            _sorted = sorted(self.latencies)
+            _percentile = lambda share: _sorted[min(len(_sorted) - 1, int(round(share * (len(_sorted) - 1))))]
+            _lines.append(f"Latency per question: p50 {_percentile(0.5):.3f}s, p95 {_percentile(0.95):.3f}s")
+        return "\n".join(_lines)
+
+
+class BatchAnswerer:
+    """
+    Answers a JSONL file of questions and writes the answers as JSONL in the order of the questions.
+    Every input line is an object with a 'question' (and optionally an 'id', by default the line number) or a plain
+    JSON string; the other fields of the object (e.g. the expected answer of an evaluation set) are copied to the output.
+    The questions are processed in windows of 'embed_batch_size': the questions of a window are embedded in a single
+    request, then retrieved on 'retrieval_workers' threads, while at most 'max_concurrency' answers are generated at
+    once by streaming requests to Ollama. The next window is embedded and retrieved while the answers of the previous
+    one are generated, so Ollama is kept busy.
+    Every answer is written and flushed as soon as the answers before it are written, so an interrupted run is
+    resumed by running it again with the same output file: the questions whose ID is already there are skipped.
+    Failed questions are written with an 'error' and are not repeated; delete their lines to repeat them.
+    Attributes:
+        llm (OllamaLLM): The model answering the questions.
+        max_concurrency (int): The maximum number of answers generated at the same time.
+        retrieval_workers (int): The number of threads retrieving the documents.
+        embed_batch_size (int): The number of questions embedded per request and per window.
+        verbose (bool): A flag to indicate if the progress should be printed.
+    Args:
+        llm (OllamaLLM): The model answering the questions.
+        max_concurrency (int): The maximum number of answers generated at the same time. Default is 2.
+        retrieval_workers (int): The number of threads retrieving the documents. Default is 8.
+        embed_batch_size (int): The number of questions embedded per request. Default is 64.
+        verbose (bool): A flag to indicate if the progress should be printed. Default is False.
+    Raises:
+        ValueError: If 'max_concurrency', 'retrieval_workers' or 'embed_batch_size' is less than 1.
+    Methods:
+        read_questions(path: str) -> List[Dict[str, Any]]: Reads the questions of a JSONL file.
+        run(input_path: str, output_path: str) -> BatchReport: Answers the questions which are not answered yet.
+    """
+    def __init__(self,
+                 llm: OllamaLLM,
+                 max_concurrency: int = 2,
+                 retrieval_workers: int = 8,
+                 embed_batch_size: int = 64,
+                 verbose: bool = False) -> None:
+        if max_concurrency < 1 or retrieval_workers < 1 or embed_batch_size < 1:
+            raise ValueError(f"The concurrency ({max_concurrency}), the retrieval workers ({retrieval_workers}) "
+                             f"and the embedding batch size ({embed_batch_size}) have to be at least 1")
+        self.llm = llm
+        self.max_concurrency = max_concurrency
+        self.retrieval_workers = retrieval_workers
+        self.embed_batch_size = embed_batch_size
+        self.verbose = verbose
+
+    @staticmethod
+    def _key(record_id: Any) -> str:
+        # the IDs of the input and of the output are compared by their JSON, so 1 and "1" stay different
+        return json.dumps(record_id, sort_keys=True)
+
+    @staticmethod
+    def read_questions(path: str) -> List[Dict[str, Any]]:
+        """
+        Reads the questions of a JSONL file.
+        Args:
+            path (str): The path to the JSONL file.
+        Returns:
+            List[Dict[str, Any]]: The input records, every one with an 'id' and a 'question'.
+        Raises:
+            ValueError: If a line is not a question or an ID is used twice.
+        """
+        _records = []
+        _keys: Set[str] = set()
+        with open(path, "r", encoding="utf-8") as f:
+            for line_number, line in enumerate(f, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    _value = json.loads(line)
+                except json.JSONDecodeError as error:
+                    raise ValueError(f"{path}:{line_number}: invalid JSON ({error})")
+                _record = {"question": _value} if isinstance(_value, str) else _value
+                if not isinstance(_record, dict) or not isinstance(_record.get("question"), str):
+                    raise ValueError(f"{path}:{line_number}: expected a string or an object with a 'question'")
+                _record = dict(_record)
+                _record.setdefault("id", line_number)
+                _key = BatchAnswerer._key(_record["id"])
+                if _key in _keys:
+                    raise ValueError(f"{path}:{line_number}: the id {_record['id']!r} is used twice")
+                _keys.add(_key)
+                _records.append(_record)
+        return _records
+
+    def _read_answered(self, output_path: str) -> Set[str]:
+        """
+        Returns the keys of the IDs in the output file. A last line cut by an interrupted run is removed.
+        """
+        _answered: Set[str] = set()
+        if not os.path.exists(output_path):
+            return _answered
+        with open(output_path, "rb") as f:
+            _lines = f.read().splitlines(keepends=True)
+        _offset = 0
+        for line in _lines:
+            try:
+                _answered.add(self._key(json.loads(line)["id"]))
+            except (ValueError, KeyError):
+                if line.endswith(b"\n"):
+                    raise ValueError(f"{output_path}: the line at byte {_offset} is not an answer")
+                with open(output_path, "rb+") as f:
+                    f.truncate(_offset)
+                return _answered
+            _offset += len(line)
+        if _lines and not _lines[-1].endswith(b"\n"):
+            # a complete last record without its line end, it is finished before anything is appended
+            with open(output_path, "ab") as f:
+                f.write(b"\n")
+        return _answered
+
+    def _answer(self, record: Dict[str, Any], prepared: Future) -> Dict[str, Any]:
+        _result = dict(record)
+        try:
+            answer, timings = self.llm.generate_answer(prepared.result())
+        except Exception as error:
+            _result["error"] = f"{type(error).__name__}: {error}"
+            return _result
+        _result["answer"] = answer
+        _result["sources"] = sorted(set(document.metadata.get("source", "") for document in prepared.result().sources))
+        _result["cached"] = timings.cached
+        _result["latency"] = {
+            "retrieve": timings.retrieve,
+            "prompt": timings.prompt,
+            "generate": timings.generate,
+            "first_token": timings.first_token,
+            "prompt_eval": timings.prompt_eval,
+            "generation_eval": timings.generation_eval,
+            "total": timings.retrieve + timings.prompt + timings.generate,
+        }
+        return _result
+
+    def run(self, input_path: str, output_path: str) -> BatchReport:
+        """
+        Answers the questions of the input file which are not in the output file yet and appends their answers.
+        Args:
+            input_path (str): The path to the JSONL file of questions.
+            output_path (str): The path to the JSONL file of answers, created if missing.
+        Returns:
+            BatchReport: The numbers of answered, resumed and failed questions and the latencies.
+        Raises:
+            ValueError: If the input file or the existing output file is invalid.
+        """
+        _started = time.perf_counter()
+        _records = self.read_questions(input_path)
+        _answered = self._read_answered(output_path)
+        _pending = [record for record in _records if self._key(record["id"]) not in _answered]
+        print(f"{len(_records) - len(_pending)} of {len(_records)} questions already answered in {output_path}") if self.verbose else None
+
+        _latencies: List[float] = []
+        _failed = 0
+        _windows: deque = deque()
+        with open(output_path, "a", encoding="utf-8") as output, \
+                ThreadPoolExecutor(self.retrieval_workers, thread_name_prefix="batch-retrieve") as retrieval_pool, \
+                ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="batch-generate") as generation_pool:
+
+            def _write_window() -> None:
+                nonlocal _failed
+                for future in _windows.popleft():
+                    _result = future.result()
+                    output.write(json.dumps(_result, ensure_ascii=False) + "\n")
+                    output.flush()
+                    if "error" in _result:
+                        _failed += 1
+                    else:
+                        _latencies.append(_result["latency"]["total"])
+                print(f"{len(_latencies) + _failed} of {len(_pending)} questions answered") if self.verbose else None
+
+            for start in range(0, len(_pending), self.embed_batch_size):
+                _window = _pending[start:start + self.embed_batch_size]
+                try:
+                    self.llm.prefetch_embeddings([record["question"] for record in _window])
+                except Exception as error:
+                    # the questions are embedded one by one by their retrieval then
+                    print(f"Batched embedding failed: {error}") if self.verbose else None
+                # the generation threads take the questions in order, so a question waits only for its own retrieval
+                _windows.append([
+                    generation_pool.submit(self._answer, record, retrieval_pool.submit(self.llm.prepare_answer, record["question"]))
+                    for record in _window])
+                # one window is retrieved while the previous one is generated
+                if len(_windows) > 1:
+                    _write_window()
+            while _windows:
+                _write_window()
+
+        return BatchReport(len(_records), len(_latencies) + _failed, len(_records) - len(_pending), _failed,
+                           time.perf_counter() - _started, _latencies)
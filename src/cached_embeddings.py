@@ -0,0 +1,96 @@
+import threading
+from collections import OrderedDict
+from typing import List
+from langchain_core.embeddings import Embeddings
+from src.embedding_cache import EmbeddingCache
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings which consult an EmbeddingCache before calling the underlying embeddings model,
+    so only new or changed chunks are sent to the model.
+    Attributes:
+        embeddings (Embeddings): The underlying embeddings model, e.g. OllamaEmbeddings.
+        cache (EmbeddingCache): The cache of the chunk embeddings.
+        model (str): The name of the embedding model, used as a part of the cache key.
+    Args:
+        embeddings (Embeddings): The underlying embeddings model.
+        cache (EmbeddingCache): The cache of the chunk embeddings.
+        model (str): The name of the embedding model.
+    """
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache, model: str) -> None:
+        self.embeddings = embeddings
+        self.cache = cache
+        self.model = model
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        result = self.cache.get_many(self.model, texts)
+        # identical chunks are sent to the model only once
+        _missing = list(dict.fromkeys(texts[index] for index, vector in enumerate(result) if vector is None))
+        if _missing:
+            _vectors = self.embeddings.embed_documents(_missing)
+            self.cache.put_many(self.model, _missing, _vectors)
+            _embedded = dict(zip(_missing, _vectors))
+            result = [vector if vector is not None else _embedded[text] for text, vector in zip(texts, result)]
+        return result
+
+    def embed_query(self, text: str) -> List[float]:
+        # queries are not chunks, they are embedded as is
+        return self.embeddings.embed_query(text)
+
+
+class PrefetchedEmbeddings(Embeddings):
+    """
+    Embeddings of queries which can be embedded ahead of time in batches: prefetch() embeds many queries
+    in a single call of the underlying model and embed_query() returns the prefetched vector, so answering a set of
+    questions costs one embedding request per batch instead of one per question. The answer cache and the
+    retrieval of the same question share the vector as well. Queries which were not prefetched are embedded as usual.
+    Attributes:
+        embeddings (Embeddings): The underlying embeddings model, e.g. OllamaEmbeddings.
+        max_entries (int): The maximum number of kept query vectors, the least recently used are dropped first.
+        _vectors (OrderedDict[str, List[float]]): The prefetched vectors by their query.
+        _lock (threading.Lock): The lock guarding the vectors.
+    Args:
+        embeddings (Embeddings): The underlying embeddings model.
+        max_entries (int): The maximum number of kept query vectors. Default is 4096.
+    """
+    def __init__(self, embeddings: Embeddings, max_entries: int = 4096) -> None:
+        self.embeddings = embeddings
+        self.max_entries = max_entries
+        self._vectors: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def model(self) -> str:
+        return self.embeddings.model
+
+    def _remember(self, text: str, vector: List[float]) -> None:
+        self._vectors[text] = vector
+        self._vectors.move_to_end(text)
+        while len(self._vectors) > self.max_entries:
+            self._vectors.popitem(last=False)
+
+    def prefetch(self, texts: List[str]) -> None:
+        with self._lock:
+            _missing = list(dict.fromkeys(text for text in texts if text not in self._vectors))
+        if not _missing:
+            return
+        # the model embeds a query and a document the same way, embed_query() is embed_documents() of one text
+        _vectors = self.embeddings.embed_documents(_missing)
+        with self._lock:
+            for text, vector in zip(_missing, _vectors):
+                self._remember(text, vector)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        with self._lock:
+            _vector = self._vectors.get(text)
+            if _vector is not None:
+                self._vectors.move_to_end(text)
+                return _vector
+        _vector = self.embeddings.embed_query(text)
+        with self._lock:
+            self._remember(text, _vector)
+        return _vector
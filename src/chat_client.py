@@ -0,0 +1,87 @@
+import http.client
+import json
+from typing import Any, Dict, Iterator, List
+from urllib.parse import urlsplit
+
+
+class ChatClient:
+    """
+    A client of the chat server (serve.py) using the standard library only, so a chat started with
+    'chat.py --server' starts without importing langchain and chromadb and without opening the vector store:
+    the server keeps them loaded between the conversations.
+    Attributes:
+        base_url (str): The URL of the chat server.
+        timeout (float): The timeout of a connection and of a read in seconds.
+        _host (str): The host of the server.
+        _port (int): The port of the server.
+        _https (bool): True if the server is reached over HTTPS.
+    Args:
+        base_url (str): The URL of the chat server, e.g. "http://127.0.0.1:8000".
+        timeout (float): The timeout of a connection and of a read in seconds. Default is 300.
+    Methods:
+        health() -> Dict[str, Any]: Returns the status of the server.
+        stream_chat(prompt: str, history: List[List[str]]) -> Iterator[Dict[str, Any]]: Yields the messages of the answer.
+    """
+    def __init__(self, base_url: str, timeout: float = 300) -> None:
+        _url = urlsplit(base_url if "://" in base_url else f"http://{base_url}")
+        if _url.scheme not in ("http", "https") or not _url.hostname:
+            raise ValueError(f"Invalid chat server URL {base_url}")
+        self.base_url = base_url
+        self.timeout = timeout
+        self._host = _url.hostname
+        self._https = _url.scheme == "https"
+        self._port = _url.port or (443 if self._https else 80)
+
+    def _request(self, method: str, path: str, payload: Dict[str, Any] = None) -> http.client.HTTPResponse:
+        _class = http.client.HTTPSConnection if self._https else http.client.HTTPConnection
+        connection = _class(self._host, self._port, timeout=self.timeout)
+        _body = json.dumps(payload).encode("utf-8") if payload is not None else None
+        _headers = {"Content-Type": "application/json"} if _body is not None else {}
+        connection.request(method, path, body=_body, headers=_headers)
+        response = connection.getresponse()
+        if response.status != 200:
+            try:
+                _error = json.loads(response.read()).get("error", "")
+            except ValueError:
+                _error = ""
+            finally:
+                connection.close()
+            raise RuntimeError(f"The chat server answered {response.status} {response.reason}: {_error}")
+        return response
+
+    def health(self) -> Dict[str, Any]:
+        """
+        Returns the status of the server.
+        Returns:
+            Dict[str, Any]: The status and the number of requests in flight.
+        Raises:
+            OSError: If the server is not reachable.
+        """
+        response = self._request("GET", "/health")
+        try:
+            return json.loads(response.read())
+        finally:
+            response.close()
+
+    def stream_chat(self, prompt: str, history: List[List[str]] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Sends a prompt and yields the messages of the answer as the server sends them:
+        {"sources": [...]}, then {"token": str} per token and {"done": true, "timings": {...}} at the end,
+        or {"error": str} if the answer failed.
+        Args:
+            prompt (str): The prompt or question of the user.
+            history (List[List[str]]): The previous turns of the conversation as [question, answer] pairs. Default is None.
+        Returns:
+            Iterator[Dict[str, Any]]: The messages of the answer.
+        Raises:
+            OSError: If the server is not reachable.
+            RuntimeError: If the server rejects the request.
+        """
+        response = self._request("POST", "/chat", {"prompt": prompt, "stream": True, "history": history or []})
+        try:
+            # http.client removes the chunked transfer encoding, every line is one message
+            for line in response:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            response.close()
@@ -0,0 +1,74 @@
+import hashlib
+from typing import Dict, Tuple
+
+
+# the algorithm of the indexes built before the algorithm became configurable, its checksums are stored without a prefix
+DEFAULT_CHECKSUM_ALGORITHM = "sha256"
+CHECKSUM_ALGORITHMS = ["sha256", "blake2b", "blake2s", "sha512", "sha1", "md5"]
+
+_BUFFER_SIZE = 1024 * 1024
+
+
+def calculate_checksum(file_path: str, algorithm: str = DEFAULT_CHECKSUM_ALGORITHM) -> str:
+    """
+    Calculates the checksum of a file. The file is hashed with hashlib.file_digest where available (Python 3.11+),
+    otherwise it is read into a reused 1 MiB buffer; either way no bytes object is allocated per block and
+    hashlib releases the GIL while hashing, so the worker threads hash in parallel.
+    Args:
+        file_path (str): The path to the file.
+        algorithm (str): The hashlib algorithm. Default is "sha256".
+    Returns:
+        str: The qualified checksum of the file (see qualify_checksum).
+    """
+    with open(file_path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            return qualify_checksum(hashlib.file_digest(f, algorithm).hexdigest(), algorithm)
+        _hash = hashlib.new(algorithm)
+        _buffer = bytearray(_BUFFER_SIZE)
+        _view = memoryview(_buffer)
+        while True:
+            _read = f.readinto(_buffer)
+            if not _read:
+                break
+            _hash.update(_view[:_read])
+        return qualify_checksum(_hash.hexdigest(), algorithm)
+
+
+def qualify_checksum(digest: str, algorithm: str) -> str:
+    """
+    Prefixes the hex digest with its algorithm, except for SHA-256, so checksums of different algorithms never
+    compare equal while the SHA-256 checksums of existing indexes and manifests stay valid.
+    Args:
+        digest (str): The hex digest.
+        algorithm (str): The hashlib algorithm of the digest.
+    Returns:
+        str: The qualified checksum, e.g. "1f2e..." or "blake2b:9a8b...".
+    """
+    return digest if algorithm == DEFAULT_CHECKSUM_ALGORITHM else f"{algorithm}:{digest}"
+
+
+def split_checksum(checksum: str) -> Tuple[str, str]:
+    """
+    Splits a qualified checksum into its algorithm and hex digest.
+    Args:
+        checksum (str): The qualified checksum.
+    Returns:
+        Tuple[str, str]: The algorithm and the hex digest.
+    """
+    algorithm, separator, digest = checksum.partition(":")
+    return (algorithm, digest) if separator else (DEFAULT_CHECKSUM_ALGORITHM, checksum)
+
+
+def checksum_metadata(checksum: str) -> Dict[str, str]:
+    """
+    Returns the chunk metadata of a qualified checksum: the hex digest as 'checksum' next to its 'checksum_algorithm'.
+    """
+    algorithm, digest = split_checksum(checksum)
+    return {"checksum": digest, "checksum_algorithm": algorithm}
+
+
+def checksum_from_metadata(metadata: Dict[str, str]) -> str:
+    """
+    Returns the qualified checksum of the chunk metadata; chunks without 'checksum_algorithm' were hashed with SHA-256.
+    """
+    return qualify_checksum(metadata.get("checksum"), metadata.get("checksum_algorithm", DEFAULT_CHECKSUM_ALGORITHM))
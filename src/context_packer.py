@@ -0,0 +1,164 @@
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+
+
+class ContextPacker:
+    """
+    The post-retrieval stage of the chat: turns the candidates of the retriever into the context of the prompt.
+    1. Duplicates are removed: chunks whose text is contained in a better ranked chunk (of any file).
+    2. Adjacent chunks of the same file are merged: the splitter repeats the end of a chunk at the start of
+       the next one ('text_splitter_chunk_overlap'), so neighbours are joined and the overlap is sent only once.
+    3. The chunks are reranked with the maximal marginal relevance (MMR). The relevance is the rank the retriever
+       gave the chunk, so the keyword matches of the hybrid retrieval keep their place, and the redundancy is the
+       cosine similarity of the stored embeddings, so no further call to the embedding model is made.
+    4. The chunks are packed in that order until 'k' chunks are taken or the token budget is used up.
+    The number of tokens is estimated from the number of characters, the prompt length is what drives the latency
+    of the generation on the CPU, so the estimate only has to be stable, not exact.
+    Attributes:
+        token_budget (int): The maximum estimated number of tokens of the context.
+        fetch_k (int): The number of candidates the retriever should return for the packer.
+        lambda_mult (float): The MMR trade-off, 1 ranks by the relevance only, 0 by the diversity only.
+        chars_per_token (float): The average number of characters per token of the estimate.
+        min_overlap (int): The minimal number of characters two chunks have to share to be merged.
+    Args:
+        token_budget (int): The maximum estimated number of tokens of the context. Default is 2048.
+        fetch_k (int): The number of candidates the retriever should return. Default is 20.
+        lambda_mult (float): The MMR trade-off. Default is 0.5.
+        chars_per_token (float): The average number of characters per token. Default is 4.0.
+        min_overlap (int): The minimal overlap of merged chunks in characters. Default is 20.
+    Methods:
+        estimate_tokens(text: str) -> int: Estimates the number of tokens of the text.
+        pack(documents: List[Document], k: int, embeddings: Dict[str, Sequence[float]]) -> List[Document]: Selects the context.
+    """
+    def __init__(self,
+                 token_budget: int = 2048,
+                 fetch_k: int = 20,
+                 lambda_mult: float = 0.5,
+                 chars_per_token: float = 4.0,
+                 min_overlap: int = 20) -> None:
+        self.token_budget = token_budget
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
+        self.chars_per_token = chars_per_token
+        self.min_overlap = min_overlap
+
+    def estimate_tokens(self, text: str) -> int:
+        return math.ceil(len(text) / self.chars_per_token)
+
+    @staticmethod
+    def _normalized(vector: Optional[Sequence[float]]) -> Optional[np.ndarray]:
+        if vector is None:
+            return None
+        _vector = np.asarray(vector, dtype=np.float32)
+        _norm = float(np.linalg.norm(_vector))
+        return _vector / _norm if _norm > 0 else None
+
+    def _overlap(self, first: str, second: str) -> int:
+        """
+        Returns the length of the longest end of 'first' which is the start of 'second', 0 if it is shorter than 'min_overlap'.
+        """
+        if len(first) < self.min_overlap or len(second) < self.min_overlap:
+            return 0
+        _probe = second[:self.min_overlap]
+        # the shared part cannot be longer than 'second', the first match is the longest one
+        _position = first.find(_probe, max(0, len(first) - len(second)))
+        while _position != -1:
+            if second.startswith(first[_position:]):
+                return len(first) - _position
+            _position = first.find(_probe, _position + 1)
+        return 0
+
+    @staticmethod
+    def _deduplicate(candidates: List[Tuple[Document, Optional[np.ndarray]]]) -> List[Tuple[Document, Optional[np.ndarray]]]:
+        _kept: List[Tuple[Document, Optional[np.ndarray]]] = []
+        for document, vector in candidates:
+            _text = document.page_content.strip()
+            if any(_text in kept.page_content for kept, _ in _kept):
+                continue
+            _kept.append((document, vector))
+        return _kept
+
+    def _merge_adjacent(self, candidates: List[Tuple[Document, Optional[np.ndarray]]]) -> List[Tuple[Document, Optional[np.ndarray]]]:
+        _merged = list(candidates)
+        _changed = True
+        while _changed:
+            _changed = False
+            for first_index, (first, first_vector) in enumerate(_merged):
+                for second_index, (second, second_vector) in enumerate(_merged):
+                    if first_index == second_index or first.metadata.get("source") != second.metadata.get("source"):
+                        continue
+                    _length = self._overlap(first.page_content, second.page_content)
+                    if _length == 0:
+                        continue
+                    # the joined chunk takes the better rank of both, its direction is the mean of both directions
+                    _vector = None
+                    if first_vector is not None and second_vector is not None:
+                        _vector = self._normalized(first_vector + second_vector)
+                    _joined = Document(
+                        id=(first if first_index < second_index else second).id,
+                        page_content=first.page_content + second.page_content[_length:],
+                        metadata=dict((first if first_index < second_index else second).metadata))
+                    _merged[min(first_index, second_index)] = (_joined, _vector)
+                    del _merged[max(first_index, second_index)]
+                    _changed = True
+                    break
+                if _changed:
+                    break
+        return _merged
+
+    def _rerank(self, candidates: List[Tuple[Document, Optional[np.ndarray]]]) -> List[Document]:
+        # the relevance falls linearly with the rank of the retriever, from 1 for the best candidate
+        _count = len(candidates)
+        _relevance = [1.0 - index / _count for index in range(_count)]
+        _remaining = list(range(_count))
+        _selected: List[int] = []
+        while _remaining:
+            def _score(index: int) -> float:
+                _vector = candidates[index][1]
+                _redundancy = max(
+                    (float(np.dot(_vector, candidates[selected][1])) for selected in _selected
+                     if _vector is not None and candidates[selected][1] is not None),
+                    default=0.0)
+                return self.lambda_mult * _relevance[index] - (1 - self.lambda_mult) * _redundancy
+            _best = max(_remaining, key=_score)
+            _selected.append(_best)
+            _remaining.remove(_best)
+        return [candidates[index][0] for index in _selected]
+
+    def pack(self, documents: List[Document], k: int = 4, embeddings: Dict[str, Sequence[float]] = None) -> List[Document]:
+        """
+        Selects the context of the prompt from the candidates of the retriever.
+        Args:
+            documents (List[Document]): The candidates, the best first.
+            k (int): The maximum number of chunks in the context. Default is 4.
+            embeddings (Dict[str, Sequence[float]]): The stored embeddings of the candidates by their ID, candidates without
+                an embedding are never considered redundant. Default is None.
+        Returns:
+            List[Document]: The chunks of the context, in the order of the MMR ranking.
+        """
+        _embeddings = embeddings or {}
+        _candidates = [(document, self._normalized(_embeddings.get(document.id))) for document in documents]
+        # merged neighbours may contain another candidate, so the duplicates are removed again
+        _ranked = self._rerank(self._deduplicate(self._merge_adjacent(self._deduplicate(_candidates))))
+
+        _packed: List[Document] = []
+        _used = 0
+        for document in _ranked:
+            if len(_packed) >= k:
+                break
+            _tokens = self.estimate_tokens(document.page_content)
+            if _used + _tokens > self.token_budget:
+                # a smaller chunk further down may still fit
+                continue
+            _packed.append(document)
+            _used += _tokens
+        if not _packed and _ranked:
+            # the best chunk alone is over the budget, its beginning is better than no context at all
+            _best = _ranked[0]
+            _packed.append(Document(
+                id=_best.id,
+                page_content=_best.page_content[:int(self.token_budget * self.chars_per_token)],
+                metadata=dict(_best.metadata)))
+        return _packed
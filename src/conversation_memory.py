@@ -0,0 +1,97 @@
+import math
+from typing import TYPE_CHECKING, List, NamedTuple
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+
+class ConversationTurn(NamedTuple):
+    """
+    A question of the conversation and its answer.
+    Attributes:
+        question (str): The question of the user.
+        answer (str): The answer of the model.
+    """
+    question: str
+    answer: str
+
+
+class ConversationMemory:
+    """
+    The history of one conversation, sent to the model before the context and the question of the next turn.
+    Only the questions and the answers are kept, the context of a turn is retrieved again for the next one.
+    The history is bounded by an estimated token budget: once it is exceeded, the oldest turns are dropped
+    until the history fits into 'trim_to' of the budget. Dropping more than necessary keeps the start of the
+    history unchanged for the following turns, so the prompt of a turn starts with the prompt of the previous
+    turn and Ollama evaluates only the new part instead of the whole prompt; dropping one turn per turn would
+    change the prompt right after the system prompt every time. A single turn longer than the budget is cut
+    to the budget.
+    The number of tokens is estimated from the number of characters, like the ContextPacker does.
+    The chat messages are built by messages() only, so a client of the chat server keeps its history without langchain.
+    Attributes:
+        token_budget (int): The maximum estimated number of tokens of the history.
+        trim_to (float): The share of the budget the history is cut down to once it exceeds the budget.
+        chars_per_token (float): The average number of characters per token of the estimate.
+        turns (List[ConversationTurn]): The turns of the history, the oldest first.
+        dropped (int): The number of turns dropped from the history so far.
+    Args:
+        token_budget (int): The maximum estimated number of tokens of the history. Default is 1024.
+        trim_to (float): The share of the budget the history is cut down to. Default is 0.5.
+        chars_per_token (float): The average number of characters per token. Default is 4.0.
+    Methods:
+        estimate_tokens() -> int: Estimates the number of tokens of the history.
+        messages() -> List[BaseMessage]: Returns the history as chat messages.
+        pairs() -> List[List[str]]: Returns the history as [question, answer] pairs, the format of the chat server.
+        add(question: str, answer: str) -> None: Appends a turn and trims the history to the budget.
+        clear() -> None: Removes all turns.
+    """
+    def __init__(self, token_budget: int = 1024, trim_to: float = 0.5, chars_per_token: float = 4.0) -> None:
+        self.token_budget = token_budget
+        self.trim_to = trim_to
+        self.chars_per_token = chars_per_token
+        self.turns: List[ConversationTurn] = []
+        self.dropped = 0
+
+    def __len__(self) -> int:
+        return len(self.turns)
+
+    def _turn_tokens(self, turn: ConversationTurn) -> int:
+        return math.ceil((len(turn.question) + len(turn.answer)) / self.chars_per_token)
+
+    def estimate_tokens(self) -> int:
+        return sum(self._turn_tokens(turn) for turn in self.turns)
+
+    def messages(self) -> List["BaseMessage"]:
+        from langchain_core.messages import AIMessage, HumanMessage
+        _messages: List["BaseMessage"] = []
+        for turn in self.turns:
+            _messages.append(HumanMessage(turn.question))
+            _messages.append(AIMessage(turn.answer))
+        return _messages
+
+    def pairs(self) -> List[List[str]]:
+        return [[turn.question, turn.answer] for turn in self.turns]
+
+    def add(self, question: str, answer: str) -> None:
+        """
+        Appends a turn to the history. If the history exceeds the budget, the oldest turns are dropped
+        until it fits into 'trim_to' of the budget, and a last turn longer than the budget is cut.
+        Args:
+            question (str): The question of the user.
+            answer (str): The answer of the model.
+        """
+        self.turns.append(ConversationTurn(question, answer))
+        _tokens = self.estimate_tokens()
+        if _tokens <= self.token_budget:
+            return
+        _target = self.token_budget * self.trim_to
+        while len(self.turns) > 1 and _tokens > _target:
+            _tokens -= self._turn_tokens(self.turns.pop(0))
+            self.dropped += 1
+        if _tokens > self.token_budget:
+            # the end of a long answer is dropped, the question is kept as it is
+            _chars = max(0, int(self.token_budget * self.chars_per_token) - len(question))
+            self.turns[-1] = ConversationTurn(question, answer[:_chars])
+
+    def clear(self) -> None:
+        self.turns = []
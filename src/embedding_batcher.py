@@ -0,0 +1,142 @@
+import queue
+import threading
+from typing import Callable, List, Optional, Tuple
+from langchain_core.documents import Document
+from src.embeding_manager import EmbeddingManager, PreparedContent
+
+
+_STOP = object()
+
+
+class EmbeddingBatcher:
+    """
+    Drains prepared file contents from a bounded queue into fixed-size embedding batches on a background thread.
+    Chunks of many files are collected together, so every add_documents call to the vectorstore
+    (and every embedding request to Ollama) carries a full batch while the files are read and split concurrently.
+    Attributes:
+        embedding (EmbeddingManager): An instance of EmbeddingManager used to write to the vectorstore.
+        batch_size (int): The number of chunks embedded and added to the vectorstore per call.
+        on_file_stored (Callable[[PreparedContent], None]): An optional callback called once all chunks of a file are stored.
+        verbose (bool): A flag to indicate if verbose output should be printed.
+        _queue (queue.Queue): The bounded queue of prepared files waiting for the embedding.
+        _thread (threading.Thread): The background thread which embeds and stores the chunks.
+        _error (BaseException): The error raised on the background thread, if any.
+    Args:
+        embedding (EmbeddingManager): An instance of EmbeddingManager used to write to the vectorstore.
+        batch_size (int): The number of chunks embedded per call. Default is 64.
+        max_inflight (int): The maximum number of prepared files waiting in the queue. Default is 128.
+        on_file_stored (Callable[[PreparedContent], None]): An optional callback called once all chunks of a file are stored.
+        verbose (bool): A flag to indicate if verbose output should be printed. Default is False.
+    Raises:
+        ValueError: If 'batch_size' or 'max_inflight' is less than 1.
+    Methods:
+        put(prepared: PreparedContent) -> None: Queues a prepared file, blocking while the queue is full.
+        close() -> None: Flushes the remaining chunks and stops the background thread.
+    """
+    def __init__(self,
+                 embedding: EmbeddingManager,
+                 batch_size: int = 64,
+                 max_inflight: int = 128,
+                 on_file_stored: Callable[[PreparedContent], None] = None,
+                 verbose: bool = False) -> None:
+        if batch_size < 1 or max_inflight < 1:
+            raise ValueError(f"The batch size ({batch_size}) and the maximum of prepared files ({max_inflight}) have to be at least 1")
+        self.embedding = embedding
+        self.batch_size = batch_size
+        self.on_file_stored = on_file_stored
+        self.verbose = verbose
+        self._queue = queue.Queue(maxsize=max_inflight)
+        self._error = None
+        self._thread = threading.Thread(target=self._run, name="embedding-batcher", daemon=True)
+        self._thread.start()
+
+    def __enter__(self) -> "EmbeddingBatcher":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._stop()
+
+    def put(self, prepared: PreparedContent) -> None:
+        """
+        Queues a prepared file for the embedding. Blocks while the queue is full.
+        Args:
+            prepared (PreparedContent): The prepared content of a file.
+        Returns:
+            None
+        Raises:
+            BaseException: The error raised on the background thread, if it failed.
+        """
+        while True:
+            self._raise_if_failed()
+            try:
+                self._queue.put(prepared, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def close(self) -> None:
+        """
+        Flushes the remaining chunks, waits for the background thread to finish and re-raises its error, if any.
+        Returns:
+            None
+        """
+        self._stop()
+        self._raise_if_failed()
+
+    def _stop(self) -> None:
+        if not self._thread.is_alive():
+            return
+        while self._thread.is_alive():
+            try:
+                self._queue.put(_STOP, timeout=0.5)
+                break
+            except queue.Full:
+                continue
+        self._thread.join()
+
+    def _raise_if_failed(self) -> None:
+        if self._error is not None:
+            raise self._error
+
+    def _run(self) -> None:
+        # the last buffered chunk of every file carries the file and the IDs of its unchanged chunks
+        _buffer: List[Tuple[Document, str, Optional[Tuple[PreparedContent, List[str]]]]] = []
+        try:
+            while True:
+                prepared = self._queue.get()
+                if prepared is _STOP:
+                    break
+                _splits, _ids, _kept_ids = self.embedding.update_stored_chunks(prepared)
+                if len(_splits) == 0:
+                    self._file_stored(prepared, _kept_ids)
+                    continue
+                print(f"----> Adding to vectorstore content of the file {prepared.file_path}") if self.verbose else None
+                _buffer.extend((split, split_id, None) for split, split_id in zip(_splits[:-1], _ids[:-1]))
+                _buffer.append((_splits[-1], _ids[-1], (prepared, _kept_ids)))
+                while len(_buffer) >= self.batch_size:
+                    self._flush(_buffer[:self.batch_size])
+                    del _buffer[:self.batch_size]
+            if _buffer:
+                self._flush(_buffer)
+        except BaseException as error:
+            self._error = error
+            # unblock the producer, which checks the error on every put
+            while True:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+    def _flush(self, batch: List[Tuple[Document, str, Optional[Tuple[PreparedContent, List[str]]]]]) -> None:
+        self.embedding.add_documents([split for split, _, _ in batch], [split_id for _, split_id, _ in batch])
+        for _, _, stored_file in batch:
+            if stored_file is not None:
+                self._file_stored(*stored_file)
+
+    def _file_stored(self, prepared: PreparedContent, kept_ids: List[str]) -> None:
+        self.embedding.update_chunks_checksum(prepared, kept_ids)
+        if self.on_file_stored is not None:
+            self.on_file_stored(prepared)
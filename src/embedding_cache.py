@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from array import array
+from typing import Dict, List, Optional
+
+
+class EmbeddingCache:
+    """
+    A persistent content-addressed SQLite cache of chunk embeddings, keyed by the embedding model
+    and the SHA-256 hash of the chunk text. The least recently used entries are evicted
+    once the size of the stored vectors exceeds the limit.
+    Attributes:
+        path (str): The path to the SQLite database file.
+        max_bytes (int): The maximum size of the stored vectors in bytes.
+        hits (int): The number of embeddings served from the cache.
+        misses (int): The number of embeddings which were not in the cache.
+        _connection (sqlite3.Connection): The connection to the database.
+        _total_bytes (int): The current size of the stored vectors in bytes.
+        _lock (threading.Lock): The lock guarding the connection and the counters.
+    Args:
+        path (str): The path to the SQLite database file. Parent directories are created if missing.
+        max_bytes (int): The maximum size of the stored vectors in bytes. Default is 1 GiB.
+    Methods:
+        default_path(chroma_db_path: str) -> str: Builds the cache path next to the Chroma database.
+        text_hash(text: str) -> str: Returns the hash the cache uses for the text.
+        get_many(model: str, texts: List[str]) -> List[Optional[List[float]]]: Returns the cached embeddings of the texts.
+        put_many(model: str, texts: List[str], embeddings: List[List[float]]) -> None: Stores embeddings of the texts.
+        hit_ratio() -> float: Returns the share of lookups served from the cache.
+        close() -> None: Closes the database.
+    """
+    def __init__(self, path: str, max_bytes: int = 1024 * 1024 * 1024) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        _directory = os.path.dirname(path)
+        if _directory:
+            os.makedirs(_directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            "model TEXT NOT NULL, "
+            "text_hash TEXT NOT NULL, "
+            "vector BLOB NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "last_access REAL NOT NULL, "
+            "PRIMARY KEY (model, text_hash))")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS embeddings_last_access ON embeddings (last_access)")
+        self._connection.commit()
+        self._total_bytes = self._connection.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    @staticmethod
+    def default_path(chroma_db_path: str) -> str:
+        return os.path.join(chroma_db_path, "embedding_cache.sqlite3")
+
+    @staticmethod
+    def text_hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def __enter__(self) -> "EmbeddingCache":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def get_many(self, model: str, texts: List[str]) -> List[Optional[List[float]]]:
+        """
+        Returns the cached embeddings of the texts and marks them as recently used.
+        Args:
+            model (str): The name of the embedding model.
+            texts (List[str]): The texts to look up.
+        Returns:
+            List[Optional[List[float]]]: The embeddings in the order of the texts, None for the texts which are not cached.
+        """
+        _hashes = [self.text_hash(text) for text in texts]
+        _found: Dict[str, List[float]] = {}
+        with self._lock:
+            # stay below the SQLite limit of host parameters per statement
+            for start in range(0, len(_hashes), 500):
+                _page = list(set(_hashes[start:start + 500]))
+                _rows = self._connection.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(_page))})",
+                    [model, *_page])
+                for text_hash, vector in _rows:
+                    _found[text_hash] = array("f", vector).tolist()
+            if _found:
+                with self._connection:
+                    self._connection.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE model = ? AND text_hash = ?",
+                        [(time.time(), model, text_hash) for text_hash in _found])
+            result = [_found.get(text_hash) for text_hash in _hashes]
+            _hits = sum(1 for vector in result if vector is not None)
+            self.hits += _hits
+            self.misses += len(result) - _hits
+        return result
+
+    def put_many(self, model: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        """
+        Stores the embeddings of the texts and evicts the least recently used entries if the cache is full.
+        Args:
+            model (str): The name of the embedding model.
+            texts (List[str]): The embedded texts.
+            embeddings (List[List[float]]): The embeddings of the texts.
+        Returns:
+            None
+        """
+        _now = time.time()
+        _rows = {}
+        for text, embedding in zip(texts, embeddings):
+            _vector = array("f", embedding).tobytes()
+            _text_hash = self.text_hash(text)
+            _rows[_text_hash] = (model, _text_hash, _vector, len(_vector), _now)
+        _rows = list(_rows.values())
+        with self._lock, self._connection:
+            for row in _rows:
+                _replaced = self._connection.execute(
+                    "SELECT size FROM embeddings WHERE model = ? AND text_hash = ?", row[:2]).fetchone()
+                self._total_bytes -= _replaced[0] if _replaced else 0
+                self._total_bytes += row[3]
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_access) VALUES (?, ?, ?, ?, ?)",
+                _rows)
+            self._evict()
+
+    def _evict(self) -> None:
+        while self._total_bytes > self.max_bytes:
+            _oldest = self._connection.execute(
+                "SELECT model, text_hash, size FROM embeddings ORDER BY last_access LIMIT 1000").fetchall()
+            if not _oldest:
+                self._total_bytes = 0
+                return
+            _evicted = []
+            for model, text_hash, size in _oldest:
+                _evicted.append((model, text_hash))
+                self._total_bytes -= size
+                if self._total_bytes <= self.max_bytes:
+                    break
+            self._connection.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", _evicted)
+
+    def hit_ratio(self) -> float:
+        _total = self.hits + self.misses
+        return self.hits / _total if _total > 0 else 0.0
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
@@ -1,27 +1,80 @@
-from typing import List
-from langchain_ollama import OllamaEmbeddings
-from langchain_chroma import Chroma
-from langchain_text_splitters import RecursiveCharacterTextSplitter
+import hashlib
+import threading
+import uuid
+from typing import TYPE_CHECKING, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 from langchain_core.documents import Document
-from langchain_community.document_loaders import TextLoader
+from src.checksum import checksum_from_metadata, checksum_metadata, split_checksum
+from src.embedding_cache import EmbeddingCache
+from src.index_version import IndexVersion
+from src.keyword_index import KeywordIndex
+from src.ollama_clients import OllamaClients
+from src.run_stats import RunStats
+from src.stream_loader import StreamingTextLoader
 
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+
+# the checksum of the chunks of a file which is being streamed, replaced by the real checksum once the whole file is stored
+_PENDING_CHECKSUM_PREFIX = "pending:"
+
+
+def _stored_checksum(metadata: Dict[str, str]) -> str:
+    # the pending checksum of an interrupted stream is kept as it is, so it is recognized whatever the algorithm
+    if metadata.get("checksum", "").startswith(_PENDING_CHECKSUM_PREFIX):
+        return metadata["checksum"]
+    return checksum_from_metadata(metadata)
+
+
+class PreparedContent(NamedTuple):
+    """
+    The content of a file which is loaded and split, but not yet added to the vectorstore.
+    Attributes:
+        file_path (str): The path to the file.
+        checksum (str): The checksum of the file.
+        update_existing (bool): Flag indicating whether the stored chunks of the file have to be reconciled with the splits.
+        splits (List[Document]): The split documents of the file.
+        ids (List[str]): The deterministic IDs of the splits (see chunk_ids).
+    """
+    file_path: str
+    checksum: str
+    update_existing: bool
+    splits: List[Document]
+    ids: List[str]
 
 class EmbeddingManager:
     """
     Manages the embedding and vector storage of documents using Ollama and Chroma.
+    Chroma and the embeddings model are created on the first use of the vector store, so a run which finds
+    no changed file neither imports nor opens them.
     Attributes:
         _debug (bool): Flag to enable debug mode.
-        _oembed (OllamaEmbeddings): Instance of OllamaEmbeddings for embedding operations.
-        _vectorstore (Chroma): Instance of Chroma for vector storage operations.
+        _oembed (OllamaEmbeddings): Instance of OllamaEmbeddings for embedding operations, created by the shared OllamaClients (a new one
+            of 'ollama_base_url' when none is given) and wrapped into CachedEmbeddings when a cache is given. None before the first use.
+        _vectorstore (Chroma): Instance of Chroma for vector storage operations, None before the first use.
         _text_splitter_chunk_size (int): Size of chunks for text splitting.
         _text_splitter_chunk_overlap (int): Overlap size for text splitting.
+        index_version (IndexVersion): The version marker of the collection, marked as changed on every change of the stored chunks
+            and bumped once per run by the FilesProcessor.
+        stats (RunStats): The counters and stage timers of the run (lookup, load, split, embed, store, delete).
+        keyword_index (KeywordIndex): The optional BM25 index of the chunk texts, updated together with the vector store.
     Methods:
         vectorstore: Property to access the vector store.
+        count_stored_chunks() -> int: Counts the chunks of the collection without creating it.
         find_documents_in_vectorstore(document_path: str) -> List[Document]: Finds documents in the vector store by their path.
+        get_stored_checksums(page_size: int) -> Dict[str, str]: Retrieves a map of stored file paths to their checksums from the vector store.
         get_list_of_stored_files() -> List[str]: Retrieves a list of stored file paths from the vector store.
         _delete_documents_by_path(document_path: str) -> None: Deletes documents from the vector store by their path.
-        _should_files_be_deleted(documents: List[Document], checksum: str, reload: bool) -> bool: Determines if files should be deleted based on checksum and reload flag.
-        load_content_from_path(file_path: str, checksum: str, reload: bool) -> List[str]: Loads content from a file path, processes it, and adds it to the vector store.
+        _delete_documents_by_paths(document_paths: Iterable[str], batch_size: int) -> int: Deletes documents of many paths in batches.
+        _should_files_be_deleted(stored_checksums: Set[str], checksum: str, reload: bool) -> bool: Determines if files should be deleted based on checksum and reload flag.
+        prepare_content_from_path(file_path: str, checksum: str, reload: bool, stored_checksums: Dict[str, str]) -> Optional[PreparedContent]: Loads and splits a file without touching the vector store.
+        chunk_ids(file_path: str, splits: List[Document]) -> List[str]: Builds deterministic IDs of the splits from the path and the chunk hash.
+        stream_content_from_path(file_path: str, checksum: str, reload: bool, stored_checksums: Dict[str, str], batch_size: int, window_size: int) -> Optional[int]: Streams a large file into the vector store in bounded batches.
+        update_stored_chunks(prepared: PreparedContent) -> Tuple[List[Document], List[str], List[str]]: Deletes removed chunks of a changed file and returns the chunks to add.
+        update_chunks_checksum(prepared: PreparedContent, kept_ids: List[str]) -> None: Sets the new checksum on the unchanged chunks of a file.
+        add_documents(documents: List[Document], ids: List[str]) -> List[str]: Embeds documents and adds them to the vector store in one bulk call.
+        sync_keyword_index(page_size: int) -> int: Fills an empty keyword index from the chunks in the vector store.
+        load_content_from_path(file_path: str, checksum: str, reload: bool, stored_checksums: Dict[str, str]) -> List[str]: Loads content from a file path, processes it, and adds it to the vector store.
     """
     def __init__(self, 
                 ollama_base_url: str = "http://localhost:11434",
@@ -30,47 +83,118 @@ class EmbeddingManager:
                 chroma_db_path: str = "./chroma_db",
                 text_splitter_chunk_size: int = 1000,
                 text_splitter_chunk_overlap: int = 200,
-                debug: bool = False) -> None:
+                debug: bool = False,
+                embedding_cache: EmbeddingCache = None,
+                stats: RunStats = None,
+                keyword_index: KeywordIndex = None,
+                index_version: IndexVersion = None,
+                clients: OllamaClients = None) -> None:
         self._debug = debug
-        self._oembed = OllamaEmbeddings(base_url=ollama_base_url, model=ollama_model)
-        self._vectorstore = Chroma( chroma_db_name, self._oembed, chroma_db_path) 
+        self.stats = stats if stats is not None else RunStats()
+        self._clients = clients if clients is not None else OllamaClients(ollama_base_url)
+        self._ollama_model = ollama_model
+        self._embedding_cache = embedding_cache
+        self._chroma_db_name = chroma_db_name
+        self._chroma_db_path = chroma_db_path
+        self._oembed = None
+        self._vectorstore = None
+        self._open_lock = threading.Lock()
+        # the shards of a sharded collection share the version marker of the whole collection
+        self.index_version = index_version if index_version is not None else IndexVersion(IndexVersion.default_path(chroma_db_path, chroma_db_name))
         self._text_splitter_chunk_size = text_splitter_chunk_size
         self._text_splitter_chunk_overlap = text_splitter_chunk_overlap
+        self.keyword_index = keyword_index
     
+    def _open(self) -> None:
+        with self._open_lock:
+            if self._vectorstore is not None:
+                return
+            from langchain_chroma import Chroma
+            from src.cached_embeddings import CachedEmbeddings
+            _oembed = self._clients.embeddings(self._ollama_model)
+            if self._embedding_cache is not None:
+                _oembed = CachedEmbeddings(_oembed, self._embedding_cache, self._ollama_model)
+            self._oembed = _oembed
+            self._vectorstore = Chroma(self._chroma_db_name, self._oembed, self._chroma_db_path)
+
     @property
-    def vectorstore(self):
+    def vectorstore(self) -> "Chroma":
+        if self._vectorstore is None:
+            self._open()
         return self._vectorstore
     
+    def count_stored_chunks(self) -> int:
+        """
+        Counts the chunks stored in the collection. Unlike the vectorstore property it does not create
+        a missing collection, so it can check whether a collection exists without leaving an empty one behind.
+        Returns:
+            int: The number of chunks, 0 if the collection does not exist.
+        """
+        if self._vectorstore is not None:
+            return self._vectorstore._collection.count()
+        import chromadb
+        # the same client settings as langchain_chroma, so the client is shared with the collections opened later
+        _client = chromadb.PersistentClient(path=self._chroma_db_path)
+        # list_collections returns the names since chromadb 0.6 and the collections before
+        if self._chroma_db_name not in {getattr(collection, "name", collection) for collection in _client.list_collections()}:
+            return 0
+        return _client.get_collection(self._chroma_db_name).count()
+
     def find_documents_in_vectorstore(self, document_path: str) -> List[Document]:
         """
         Finds documents in the vector store that match the given document path.
+        The lookup is done by metadata only, so no embedding is calculated for it.
         Args:
             document_path (str): The path of the document to search for in the vector store.
         Returns:
-            List[Document]: A list of documents that match the filter criteria.
+            List[Document]: A list of all documents that match the filter criteria.
         """
         # Filter the vector store by metadata
-        filter_criteria = {"source": document_path }  # Adjust key to match your metadata key
-        results = self.vectorstore.search(
-            query="dummy",  # Replace with any dummy query text (not used in filtering)
-            search_type="similarity",
-            filter=filter_criteria
-        )
-        
-        return results
+        with self.stats.stage("lookup"):
+            results = self.vectorstore._collection.get(
+                where={"source": document_path},
+                include=["metadatas", "documents"])
+
+        return [
+            Document(page_content=content, metadata=metadata)
+            for content, metadata in zip(results["documents"], results["metadatas"])
+        ]
+
+    def get_stored_checksums(self, page_size: int = 5000) -> Dict[str, str]:
+        """
+        Retrieves a map of stored file sources to their checksums from the vector store.
+
+        This method pages through the metadata of the vector store's collection, so neither
+        embeddings nor document contents are loaded.
+
+        Args:
+            page_size (int): The number of records to fetch per request. Default is 5000.
+
+        Returns:
+            Dict[str, str]: A map of file sources to their checksums, a pending checksum for a file whose streaming was interrupted.
+        """
+        _checksums = {}
+        _offset = 0
+        while True:
+            with self.stats.stage("lookup"):
+                _page = self.vectorstore._collection.get(include=["metadatas"], limit=page_size, offset=_offset)
+            _metadatas = _page["metadatas"]
+            for metadata in _metadatas:
+                # a file with any pending chunk is reported as pending, so it is stored again
+                if not _checksums.get(metadata["source"], "").startswith(_PENDING_CHECKSUM_PREFIX):
+                    _checksums[metadata["source"]] = _stored_checksum(metadata)
+            if len(_metadatas) < page_size:
+                return _checksums
+            _offset += page_size
     
     def get_list_of_stored_files(self) -> List[str]:
         """
         Retrieves a list of stored file sources from the vector store.
 
-        This method accesses the vector store's collection, extracts the metadata
-        of all documents, and returns a list of unique file sources.
-
         Returns:
             List[str]: A list of unique file sources stored in the vector store.
         """
-        _all_documents = self.vectorstore._collection.get()
-        return list(set([metadata["source"] for metadata in _all_documents['metadatas']]))
+        return list(self.get_stored_checksums().keys())
     
     def _delete_documents_by_path(self, document_path: str) -> None:
         """
@@ -82,67 +206,358 @@ class EmbeddingManager:
         Returns:
             None
         """
-        print(f"Deleting documents by path {document_path}") if self._debug else None
-        self.vectorstore._collection.delete(where={"source": document_path})
+        self._delete_documents_by_paths([document_path])
+
+    def _delete_documents_by_paths(self, document_paths: Iterable[str], batch_size: int = 500) -> int:
+        """
+        Deletes the documents of many paths from the vector store, one '$in' filter per batch of paths
+        instead of one request per path. The index version is bumped once at the end.
+
+        Args:
+            document_paths (Iterable[str]): The paths of the documents to be deleted.
+            batch_size (int): The number of paths deleted per request. Default is 500.
+
+        Returns:
+            int: The number of paths whose documents were deleted.
+        """
+        _paths = sorted(set(document_paths))
+        for _start in range(0, len(_paths), batch_size):
+            _batch = _paths[_start:_start + batch_size]
+            for document_path in _batch:
+                print(f"Deleting documents by path {document_path}") if self._debug else None
+            _where = {"source": _batch[0]} if len(_batch) == 1 else {"source": {"$in": _batch}}
+            with self.stats.stage("delete"):
+                self.vectorstore._collection.delete(where=_where)
+                self.keyword_index.delete_sources(_batch) if self.keyword_index is not None else None
+        self.stats.increment("files_deleted", len(_paths))
+        if _paths:
+            self.index_version.mark_changed()
+        return len(_paths)
     
-    def _should_files_be_deleted(self, documents: List[Document], checksum: str, reload: bool) -> bool:
+    def _should_files_be_deleted(self, stored_checksums: Set[str], checksum: str, reload: bool) -> bool:
         """
-        Determines whether files should be deleted based on the provided documents, checksum, and reload flag.
+        Determines whether files should be deleted based on the stored checksums, checksum, and reload flag.
+        The chunks of a file whose streaming was interrupted carry a pending checksum, they are replaced even without reload.
         Args:
-            documents (List[Document]): A list of Document objects to check.
-            checksum (str): The checksum value to compare against the documents' metadata.
+            stored_checksums (Set[str]): The checksums of the file stored in the vector store.
+            checksum (str): The checksum value to compare against the stored checksums.
             reload (bool): A flag indicating whether to force a reload.
         Returns:
             bool: True if files should be deleted, False otherwise.
         """
-        if len(documents) == 0:
+        if len(stored_checksums) == 0:
             return False
+
+        if any(stored_checksum.startswith(_PENDING_CHECKSUM_PREFIX) for stored_checksum in stored_checksums):
+            return True
         
         if reload == True:
-            return True if any([doc.metadata["checksum"] != checksum for doc in documents]) else False
+            return True if any([stored_checksum != checksum for stored_checksum in stored_checksums]) else False
                 
         return False
 
-    def load_content_from_path(self, file_path: str, checksum: str, reload: bool) -> List[str]:
+    def prepare_content_from_path(self, file_path: str, checksum: str, reload: bool, stored_checksums: Dict[str, str] = None) -> Optional[PreparedContent]:
         """
-        Loads content from the specified file path, processes it, and adds it to the vectorstore if necessary.
+        Decides whether the file has to be (re)loaded into the vectorstore, then loads and splits its content.
+        It does not modify the vectorstore and is safe to call from several threads.
         Args:
             file_path (str): The path to the file to be loaded.
             checksum (str): The checksum of the file to verify its integrity.
             reload (bool): Flag indicating whether to reload the file even if it exists in the vectorstore.
+            stored_checksums (Dict[str, str]): An optional map of stored file sources to their checksums 
+                (see get_stored_checksums). When it is not provided, the vectorstore is queried for the file.
         Returns:
-            List[str]: A list of document IDs added to the vectorstore, or an empty list if no documents were added.
+            Optional[PreparedContent]: The splits to add to the vectorstore, or None if nothing has to be changed.
         """
+        if stored_checksums is None:
+            _stored_checksums = set([_stored_checksum(doc.metadata) for doc in self.find_documents_in_vectorstore(file_path)])
+        else:
+            _stored_checksums = set([stored_checksums[file_path]]) if file_path in stored_checksums else set()
+        update_existing = self._should_files_be_deleted(_stored_checksums, checksum, reload)
         
-        _documents = self.find_documents_in_vectorstore(file_path)
-        reload_after_delete = False
-        if self._should_files_be_deleted(_documents, checksum, reload):
-            self._delete_documents_by_path(file_path)
-            reload_after_delete = True
-        
-        
-        if not reload_after_delete and len(_documents) > 0:
+        if not update_existing and len(_stored_checksums) > 0:
             print(f"Skipping. Document already in vectorstore. {file_path}") if self._debug else None
-            return []
+            return None
 
+        from langchain_community.document_loaders import TextLoader
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
         loader = TextLoader(file_path, encoding='utf-8', autodetect_encoding=True)
-        docs = loader.load()
+        with self.stats.stage("load"):
+            docs = loader.load()
         if not docs or len(docs) == 0:
             print(f"Skipping. Empty file. {file_path}") if self._debug else None
-            return []
+            return PreparedContent(file_path, checksum, update_existing, [], [])
         
         # enrich documents with metadata
         for doc in docs:
-            doc.metadata = {"source": file_path, "checksum": checksum}
+            doc.metadata = self._chunk_metadata(file_path, checksum)
         
         _text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=self._text_splitter_chunk_size,
             chunk_overlap=self._text_splitter_chunk_overlap)
 
-        splits = _text_splitter.split_documents(docs)
+        with self.stats.stage("split"):
+            splits = _text_splitter.split_documents(docs)
+            _ids = self.chunk_ids(file_path, splits) if splits else []
         if splits is None or len(splits) == 0:
             print(f"Skipping. No splits to add. {file_path}") if self._debug else None
-            return []
+            return PreparedContent(file_path, checksum, update_existing, [], [])
         
-        print(f"----> Adding to vectorstore content of the file {file_path}") if self._debug else None
-        return self._vectorstore.add_documents(splits)
+        return PreparedContent(file_path, checksum, update_existing, splits, _ids)
+
+    @staticmethod
+    def _chunk_metadata(file_path: str, checksum: str) -> Dict[str, str]:
+        # the checksum is stored as the hex digest next to its 'checksum_algorithm' (see src.checksum)
+        return {"source": file_path, **checksum_metadata(checksum)}
+
+    @staticmethod
+    def _chunk_id(file_path: str, chunk_hash: str, occurrence: int) -> str:
+        return hashlib.sha256(f"{file_path}\0{chunk_hash}\0{occurrence}".encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def chunk_ids(file_path: str, splits: List[Document]) -> List[str]:
+        """
+        Builds deterministic IDs of the splits from the file path and the hash of the chunk text,
+        so an unchanged chunk keeps its ID (and its vector) when the file is updated.
+        Args:
+            file_path (str): The path to the file.
+            splits (List[Document]): The split documents of the file.
+        Returns:
+            List[str]: The IDs of the splits in the same order.
+        """
+        _ids = []
+        _occurrences: Dict[str, int] = {}
+        for split in splits:
+            _chunk_hash = hashlib.sha256(split.page_content.encode("utf-8")).hexdigest()
+            # identical chunks within one file are told apart by their occurrence
+            _occurrence = _occurrences.get(_chunk_hash, 0)
+            _occurrences[_chunk_hash] = _occurrence + 1
+            _ids.append(EmbeddingManager._chunk_id(file_path, _chunk_hash, _occurrence))
+        return _ids
+
+    def stream_content_from_path(self,
+                                 file_path: str,
+                                 checksum: str,
+                                 reload: bool,
+                                 stored_checksums: Dict[str, str] = None,
+                                 batch_size: int = 64,
+                                 window_size: int = 1024 * 1024) -> Optional[int]:
+        """
+        Loads a large file into the vector store without holding the whole file or all of its splits in memory.
+        The file is read and split in windows (see StreamingTextLoader) and its chunks are embedded and stored
+        in batches of 'batch_size'. The chunks get the same deterministic IDs as in chunk_ids, so unchanged chunks
+        of an updated file are not embedded again.
+        While the file is being stored its chunks carry a pending checksum; the chunks of the previous content
+        are deleted and the real checksum is set only after the last batch, so an interrupted run never leaves
+        a file which looks complete.
+        Args:
+            file_path (str): The path to the file to be loaded.
+            checksum (str): The checksum of the file.
+            reload (bool): Flag indicating whether to reload the file even if it exists in the vectorstore.
+            stored_checksums (Dict[str, str]): An optional map of stored file sources to their checksums
+                (see get_stored_checksums). When it is not provided, the vectorstore is queried for the file.
+            batch_size (int): The number of chunks embedded and stored at once. Default is 64.
+            window_size (int): The number of characters read at once. Default is 1 MiB.
+        Returns:
+            Optional[int]: The number of chunks of the file, or None if the file did not have to be loaded.
+        """
+        if stored_checksums is None:
+            _stored_checksums = set([_stored_checksum(doc.metadata) for doc in self.find_documents_in_vectorstore(file_path)])
+        else:
+            _stored_checksums = set([stored_checksums[file_path]]) if file_path in stored_checksums else set()
+        if not self._should_files_be_deleted(_stored_checksums, checksum, reload) and len(_stored_checksums) > 0:
+            print(f"Skipping. Document already in vectorstore. {file_path}") if self._debug else None
+            return None
+
+        print(f"----> Streaming to vectorstore content of the file {file_path}") if self._debug else None
+        _pending_checksum = f"{_PENDING_CHECKSUM_PREFIX}{split_checksum(checksum)[1]}"
+        _pending_metadata = dict(self._chunk_metadata(file_path, checksum), checksum=_pending_checksum)
+        _loader = StreamingTextLoader(file_path, self._text_splitter_chunk_size, self._text_splitter_chunk_overlap, window_size)
+        # only the occurrences of the chunk hashes grow with the file, 8 bytes of every hash are enough to count them
+        _occurrences: Dict[int, int] = {}
+        _chunks = 0
+        _batch: List[Tuple[str, str]] = []
+
+        def _store(batch: List[Tuple[str, str]]) -> None:
+            _ids = [chunk_id for _, chunk_id in batch]
+            with self.stats.stage("lookup"):
+                _stored_ids = set(self.vectorstore._collection.get(ids=_ids, include=[])["ids"])
+            _new = [(text, chunk_id) for text, chunk_id in batch if chunk_id not in _stored_ids]
+            if _new:
+                self.add_documents(
+                    [Document(page_content=text, metadata=dict(_pending_metadata)) for text, _ in _new],
+                    [chunk_id for _, chunk_id in _new])
+            if _stored_ids:
+                with self.stats.stage("store"):
+                    self.vectorstore._collection.update(
+                        ids=list(_stored_ids),
+                        metadatas=[_pending_metadata for _ in _stored_ids])
+
+        _splits = _loader.lazy_split()
+        while True:
+            # reading and splitting is timed apart from the embedding and storing of the batches
+            with self.stats.stage("load"):
+                text = next(_splits, None)
+            if text is None:
+                break
+            _chunk_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            _key = int(_chunk_hash[:16], 16)
+            _occurrence = _occurrences.get(_key, 0)
+            _occurrences[_key] = _occurrence + 1
+            _batch.append((text, self._chunk_id(file_path, _chunk_hash, _occurrence)))
+            _chunks += 1
+            if len(_batch) >= batch_size:
+                _store(_batch)
+                _batch = []
+        if _batch:
+            _store(_batch)
+
+        # the deleted and updated chunks do not match the filters anymore, so the first page is always the next one
+        while True:
+            with self.stats.stage("delete"):
+                _removed_ids = self.vectorstore._collection.get(
+                    where={"$and": [{"source": file_path}, {"checksum": {"$ne": _pending_checksum}}]}, include=[], limit=5000)["ids"]
+                if not _removed_ids:
+                    break
+                self.vectorstore._collection.delete(ids=_removed_ids)
+                self.keyword_index.delete_ids(_removed_ids) if self.keyword_index is not None else None
+            self.stats.increment("chunks_deleted", len(_removed_ids))
+        while True:
+            with self.stats.stage("store"):
+                _pending_ids = self.vectorstore._collection.get(
+                    where={"$and": [{"source": file_path}, {"checksum": _pending_checksum}]}, include=[], limit=5000)["ids"]
+                if not _pending_ids:
+                    break
+                self.vectorstore._collection.update(
+                    ids=_pending_ids,
+                    metadatas=[self._chunk_metadata(file_path, checksum) for _ in _pending_ids])
+        self.index_version.mark_changed()
+        return _chunks
+
+    def update_stored_chunks(self, prepared: PreparedContent) -> Tuple[List[Document], List[str], List[str]]:
+        """
+        Reconciles the stored chunks of a changed file with its new splits by deleting the removed chunks.
+        Unchanged chunks keep their vectors and IDs, they only have to get the new checksum with
+        update_chunks_checksum once the new chunks are stored.
+        Args:
+            prepared (PreparedContent): The prepared content of the file.
+        Returns:
+            Tuple[List[Document], List[str], List[str]]: The splits which are not stored yet, their IDs and the IDs of the unchanged chunks.
+        """
+        if not prepared.update_existing:
+            return prepared.splits, prepared.ids, []
+
+        with self.stats.stage("lookup"):
+            _stored_ids = set(self.vectorstore._collection.get(where={"source": prepared.file_path}, include=[])["ids"])
+        _new_ids = set(prepared.ids)
+        _removed_ids = [stored_id for stored_id in _stored_ids if stored_id not in _new_ids]
+        _kept_ids = [stored_id for stored_id in _stored_ids if stored_id in _new_ids]
+        if _removed_ids:
+            print(f"Deleting {len(_removed_ids)} chunks of {prepared.file_path}") if self._debug else None
+            with self.stats.stage("delete"):
+                self.vectorstore._collection.delete(ids=_removed_ids)
+                self.keyword_index.delete_ids(_removed_ids) if self.keyword_index is not None else None
+            self.stats.increment("chunks_deleted", len(_removed_ids))
+            self.index_version.mark_changed()
+
+        _added = [(split, split_id) for split, split_id in zip(prepared.splits, prepared.ids) if split_id not in _stored_ids]
+        return [split for split, _ in _added], [split_id for _, split_id in _added], _kept_ids
+
+    def update_chunks_checksum(self, prepared: PreparedContent, kept_ids: List[str]) -> None:
+        """
+        Sets the new checksum of the file in the metadata of its unchanged chunks without re-embedding them.
+        It has to be called after the new chunks are stored, so an interrupted update is retried on the next run.
+        Args:
+            prepared (PreparedContent): The prepared content of the file.
+            kept_ids (List[str]): The IDs of the unchanged chunks returned by update_stored_chunks.
+        Returns:
+            None
+        """
+        if not kept_ids:
+            return
+        with self.stats.stage("store"):
+            self.vectorstore._collection.update(
+                ids=kept_ids,
+                metadatas=[self._chunk_metadata(prepared.file_path, prepared.checksum) for _ in kept_ids])
+
+    def add_documents(self, documents: List[Document], ids: List[str] = None) -> List[str]:
+        """
+        Embeds the documents and adds them to the vectorstore in a single bulk call.
+        The embedding and the write to the vectorstore are timed as separate stages.
+        Args:
+            documents (List[Document]): The documents to add.
+            ids (List[str]): The optional IDs of the documents.
+        Returns:
+            List[str]: A list of document IDs added to the vectorstore.
+        """
+        _ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in documents]
+        _texts = [document.page_content for document in documents]
+        _vectorstore = self.vectorstore
+        with self.stats.stage("embed"):
+            _embeddings = self._oembed.embed_documents(_texts)
+        with self.stats.stage("store"):
+            # the same upsert as Chroma.add_documents does, after the embeddings are calculated
+            _vectorstore._collection.upsert(
+                ids=_ids,
+                embeddings=_embeddings,
+                metadatas=[document.metadata for document in documents],
+                documents=_texts)
+            if self.keyword_index is not None:
+                self.keyword_index.upsert(_ids, [document.metadata.get("source", "") for document in documents], _texts)
+        self.stats.increment("chunks_embedded", len(documents))
+        self.index_version.mark_changed()
+        return _ids
+
+    def sync_keyword_index(self, page_size: int = 5000) -> int:
+        """
+        Fills the keyword index from the chunks stored in the vector store, so the keyword index of
+        a collection which was built without it does not need a full reload. An index which already
+        has chunks is kept as it is, it is updated together with the vector store.
+        Args:
+            page_size (int): The number of chunks read from the vector store at once. Default is 5000.
+        Returns:
+            int: The number of chunks added to the keyword index.
+        """
+        if self.keyword_index is None or self.keyword_index.count() > 0:
+            return 0
+        return self._fill_keyword_index(page_size)
+
+    def _fill_keyword_index(self, page_size: int = 5000) -> int:
+        _added = 0
+        while True:
+            with self.stats.stage("lookup"):
+                results = self.vectorstore._collection.get(include=["metadatas", "documents"], limit=page_size, offset=_added)
+            if not results["ids"]:
+                break
+            with self.stats.stage("store"):
+                self.keyword_index.upsert(
+                    results["ids"],
+                    [metadata.get("source", "") for metadata in results["metadatas"]],
+                    results["documents"])
+            _added += len(results["ids"])
+        print(f"Keyword index filled with {_added} chunks") if self._debug and _added else None
+        return _added
+
+    def load_content_from_path(self, file_path: str, checksum: str, reload: bool, stored_checksums: Dict[str, str] = None) -> List[str]:
+        """
+        Loads content from the specified file path, processes it, and adds it to the vectorstore if necessary.
+        Args:
+            file_path (str): The path to the file to be loaded.
+            checksum (str): The checksum of the file to verify its integrity.
+            reload (bool): Flag indicating whether to reload the file even if it exists in the vectorstore.
+            stored_checksums (Dict[str, str]): An optional map of stored file sources to their checksums 
+                (see get_stored_checksums). When it is not provided, the vectorstore is queried for the file.
+        Returns:
+            List[str]: A list of document IDs added to the vectorstore, or an empty list if no documents were added.
+        """
+        prepared = self.prepare_content_from_path(file_path, checksum, reload, stored_checksums)
+        if prepared is None:
+            return []
+
+        _splits, _ids, _kept_ids = self.update_stored_chunks(prepared)
+        _added_ids = []
+        if len(_splits) > 0:
+            print(f"----> Adding to vectorstore content of the file {file_path}") if self._debug else None
+            _added_ids = self.add_documents(_splits, _ids)
+        self.update_chunks_checksum(prepared, _kept_ids)
+        return _added_ids
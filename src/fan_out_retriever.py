@@ -0,0 +1,47 @@
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.vectorstores import VectorStore
+from pydantic import ConfigDict, PrivateAttr
+
+
+class FanOutRetriever(BaseRetriever):
+    """
+    Retrieves the documents of several collections (e.g. the shards of a sharded collection) at once.
+    The query is embedded only once, the collections are searched concurrently in a thread pool and
+    the results are merged by their distance, which is comparable because all collections use the same
+    embedding model, so the result is the same as the top 'k' of a single collection holding all the chunks.
+    Attributes:
+        vectorstores (List[VectorStore]): The Chroma collections to search.
+        embeddings (Embeddings): The embeddings model of the collections.
+        k (int): The number of documents to return.
+        filter (Dict[str, Any]): The metadata filter of every collection, None for all documents.
+        max_workers (int): The maximum number of collections searched at the same time.
+        _executor (ThreadPoolExecutor): The thread pool of the searches, shared by all queries.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    # typed by the base class, so importing the retriever does not import chromadb
+    vectorstores: List[VectorStore]
+    embeddings: Embeddings
+    k: int = 4
+    filter: Optional[Dict[str, Any]] = None
+    max_workers: int = 8
+    _executor: ThreadPoolExecutor = PrivateAttr(default=None)
+
+    def model_post_init(self, context: Any) -> None:
+        self._executor = ThreadPoolExecutor(
+            max_workers=max(1, min(self.max_workers, len(self.vectorstores))),
+            thread_name_prefix="fan-out")
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        _embedding = self.embeddings.embed_query(query)
+        _results = self._executor.map(
+            lambda vectorstore: vectorstore.similarity_search_by_vector_with_relevance_scores(_embedding, self.k, filter=self.filter),
+            self.vectorstores)
+        # the score is the distance, the closest document first
+        _scored = sorted((pair for result in _results for pair in result), key=lambda pair: pair[1])
+        return [document for document, _ in _scored[:self.k]]
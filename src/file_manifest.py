@@ -0,0 +1,150 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+
+class ManifestEntry(NamedTuple):
+    """
+    A single row of the file manifest.
+    Attributes:
+        size (int): The size of the file in bytes at the moment it was indexed.
+        mtime_ns (int): The modification time of the file in nanoseconds.
+        inode (int): The inode number of the file.
+        checksum (str): The checksum of the file content stored in the vectorstore.
+    """
+    size: int
+    mtime_ns: int
+    inode: int
+    checksum: str
+
+    def matches(self, stat_result: os.stat_result) -> bool:
+        """
+        Checks whether the stat data of a file is the same as the one recorded in the manifest.
+        Args:
+            stat_result (os.stat_result): The result of os.stat() for the file.
+        Returns:
+            bool: True if size, mtime and inode are unchanged, False otherwise.
+        """
+        return (self.size == stat_result.st_size
+                and self.mtime_ns == stat_result.st_mtime_ns
+                and self.inode == stat_result.st_ino)
+
+
+class FileManifest:
+    """
+    A persistent SQLite index of the files which were already processed, keyed by the file path.
+    It allows to settle unchanged files by a single stat() call and a lookup, without hashing them
+    or querying the vectorstore. Updates are guarded by a lock, so the manifest can be shared between threads.
+    Attributes:
+        path (str): The path to the SQLite database file.
+        _connection (sqlite3.Connection): The connection to the database.
+        _entries (Dict[str, ManifestEntry]): The in-memory copy of the manifest.
+        _pending_updates (Dict[str, ManifestEntry]): Entries which are not yet written to the database.
+        _pending_deletes (set): Paths which are not yet removed from the database.
+        _lock (threading.Lock): The lock guarding pending changes and the connection.
+    Args:
+        path (str): The path to the SQLite database file. Parent directories are created if missing.
+        commit_every (int): The number of pending updates after which they are written to the database. Default is 1000.
+    Methods:
+        default_path(chroma_db_path: str, chroma_db_name: str) -> str: Builds the manifest path next to the Chroma database.
+        get(file_path: str) -> Optional[ManifestEntry]: Returns the manifest entry for the file.
+        put(file_path: str, stat_result: os.stat_result, checksum: str) -> None: Records the file in the manifest.
+        remove(file_path: str) -> None: Removes the file from the manifest.
+        paths() -> List[str]: Returns all paths recorded in the manifest.
+        commit() -> None: Writes pending changes to the database.
+        close() -> None: Commits pending changes and closes the database.
+    """
+    def __init__(self, path: str, commit_every: int = 1000) -> None:
+        self.path = path
+        self._commit_every = commit_every
+        _directory = os.path.dirname(path)
+        if _directory:
+            os.makedirs(_directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "path TEXT PRIMARY KEY, "
+            "size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, "
+            "inode INTEGER NOT NULL, "
+            "checksum TEXT NOT NULL)")
+        self._connection.commit()
+        self._entries: Dict[str, ManifestEntry] = {
+            row[0]: ManifestEntry(*row[1:])
+            for row in self._connection.execute("SELECT path, size, mtime_ns, inode, checksum FROM files")
+        }
+        self._pending_updates: Dict[str, ManifestEntry] = {}
+        self._pending_deletes = set()
+
+    @staticmethod
+    def default_path(chroma_db_path: str, chroma_db_name: str) -> str:
+        return os.path.join(chroma_db_path, f"{chroma_db_name}.manifest.sqlite3")
+
+    def __enter__(self) -> "FileManifest":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, file_path: str) -> Optional[ManifestEntry]:
+        return self._entries.get(file_path)
+
+    def put(self, file_path: str, stat_result: os.stat_result, checksum: str) -> None:
+        """
+        Records the file with its stat data and checksum in the manifest.
+        Args:
+            file_path (str): The path of the file.
+            stat_result (os.stat_result): The result of os.stat() for the file.
+            checksum (str): The checksum of the file content.
+        Returns:
+            None
+        """
+        entry = ManifestEntry(stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino, checksum)
+        with self._lock:
+            self._entries[file_path] = entry
+            self._pending_updates[file_path] = entry
+            self._pending_deletes.discard(file_path)
+            if len(self._pending_updates) >= self._commit_every:
+                self._commit()
+
+    def remove(self, file_path: str) -> None:
+        with self._lock:
+            if self._entries.pop(file_path, None) is None:
+                return
+            self._pending_updates.pop(file_path, None)
+            self._pending_deletes.add(file_path)
+
+    def paths(self) -> List[str]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def commit(self) -> None:
+        """
+        Writes pending updates and deletions to the database in a single transaction.
+        Returns:
+            None
+        """
+        with self._lock:
+            self._commit()
+
+    def _commit(self) -> None:
+        if not self._pending_updates and not self._pending_deletes:
+            return
+        with self._connection:
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, inode, checksum) VALUES (?, ?, ?, ?, ?)",
+                [(path, *entry) for path, entry in self._pending_updates.items()])
+            self._connection.executemany(
+                "DELETE FROM files WHERE path = ?",
+                [(path,) for path in self._pending_deletes])
+        self._pending_updates.clear()
+        self._pending_deletes.clear()
+
+    def close(self) -> None:
+        self.commit()
+        self._connection.close()
@@ -1,7 +1,13 @@
-import hashlib
 import os
-from typing import Iterable, List, Tuple
-from src.embeding_manager import EmbeddingManager
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+from src.embeding_manager import EmbeddingManager, PreparedContent
+from src.checksum import DEFAULT_CHECKSUM_ALGORITHM, calculate_checksum, checksum_from_metadata, split_checksum
+from src.embedding_batcher import EmbeddingBatcher
+from src.file_manifest import FileManifest
+from src.path_filter import PathFilter
+from src.run_stats import RunStats
 
 
 class FilesProcessor:
@@ -14,13 +20,31 @@ class FilesProcessor:
         exclude_subfolders (List[str]): A list of subfolders to exclude from processing.
         reload (bool): A flag to indicate if files should be reloaded. Default is False.
         verbose (bool): A flag to indicate if verbose output should be printed. Default is False.
+        manifest (FileManifest): An optional manifest of already processed files. Default is None.
+        verify_checksums (bool): A flag to force rehashing of all files, ignoring the manifest. Default is False.
+        workers (int): The number of threads hashing, loading and splitting files. Default is 4.
+        embed_batch_size (int): The number of chunks embedded and added to the vectorstore per call. Default is 64.
+        max_inflight (int): The maximum number of prepared files waiting for the embedding. Default is 128.
+        include_patterns (List[str]): Gitignore-style patterns a file has to match, e.g. 'docs/**/*.md'. Default is None.
+        exclude_patterns (List[str]): Gitignore-style patterns of files and folders to skip, e.g. 'build/'. Default is None.
+        stats (RunStats): The counters and stage timers of the run (scan, hash), usually shared with the EmbeddingManager. Default is a new RunStats.
+        stream_threshold (int): The size in bytes from which files are streamed into the embedding in bounded batches. Default is 16 MiB.
+        checksum_algorithm (str): The hashlib algorithm of the file checksums, e.g. 'blake2b'. Default is 'sha256'.
+    Raises:
+        ValueError: If 'workers', 'embed_batch_size' or 'max_inflight' is less than 1.
     Methods:
         _calculate_checksum(file_path: str) -> str:
-            Calculates the SHA-256 checksum of a file.
-        enumerate_files(directory: str) -> Iterable[Tuple[str, str]]:
-            Recursively enumerates files in the directory, yielding file paths and their checksums.
+            Calculates the checksum of a file with the configured algorithm.
+        _enumerate_files(directory: str) -> Iterable[Tuple[str, os.stat_result]]:
+            Walks the directory with os.scandir, yielding the included file paths and their stat data.
+        _prepare_file(file_path: str, stat_result: os.stat_result, stored_checksums: Dict[str, str]) -> Optional[PreparedContent]:
+            Hashes, loads and splits a single file unless the manifest proves it is unchanged.
+        _is_unchanged(files: List[Tuple[str, os.stat_result]]) -> bool:
+            Checks with the stat data only whether the manifest proves that no file was added, changed or deleted.
         process_files():
             Processes files in the directory, loads their content into the embedding manager, and deletes files from the embedding manager that are no longer in the directory.
+        process_paths(paths: Iterable[str]):
+            Processes only the given changed paths, loading existing files and deleting removed ones.
     """
     def __init__(self, 
                  embedding: EmbeddingManager, 
@@ -28,54 +52,291 @@ class FilesProcessor:
                  extensions: List[str], 
                  exclude_subfolders: List[str],
                  reload: bool = False,
-                 verbose: bool = False) -> None:
+                 verbose: bool = False,
+                 manifest: FileManifest = None,
+                 verify_checksums: bool = False,
+                 workers: int = 4,
+                 embed_batch_size: int = 64,
+                 max_inflight: int = 128,
+                 include_patterns: List[str] = None,
+                 exclude_patterns: List[str] = None,
+                 stats: RunStats = None,
+                 stream_threshold: int = 16 * 1024 * 1024,
+                 checksum_algorithm: str = DEFAULT_CHECKSUM_ALGORITHM) -> None:
+        if workers < 1 or embed_batch_size < 1 or max_inflight < 1:
+            raise ValueError(f"The number of workers ({workers}), the embedding batch size ({embed_batch_size}) "
+                             f"and the maximum of prepared files ({max_inflight}) have to be at least 1")
         self.embedding = embedding
         self.directory = directory
         self.extensions = extensions
         self.exclude_subfolders = exclude_subfolders
         self.reload = reload
         self.verbose = verbose
+        self.manifest = manifest
+        self.verify_checksums = verify_checksums
+        self.workers = workers
+        self.embed_batch_size = embed_batch_size
+        self.max_inflight = max_inflight
+        self.include_patterns = include_patterns
+        self.exclude_patterns = exclude_patterns
+        self._extensions = tuple(extensions)
+        self._excluded_names = set(exclude_subfolders)
+        self._path_filter = PathFilter(include_patterns, exclude_patterns)
+        self.stats = stats if stats is not None else RunStats()
+        self.stream_threshold = stream_threshold
+        self.checksum_algorithm = checksum_algorithm
     
     def _calculate_checksum(self, file_path: str) -> str:
         """
-        Calculate the SHA-256 checksum of a file.
+        Calculate the checksum of a file with the configured 'checksum_algorithm'.
 
         Args:
             file_path (str): The path to the file for which the checksum is to be calculated.
 
         Returns:
-            str: The SHA-256 checksum of the file as a hexadecimal string.
+            str: The checksum of the file as a hexadecimal string, prefixed with the algorithm unless it is SHA-256.
         """
-        sha256_hash = hashlib.sha256()
-        with open(file_path, "rb") as f:
-            for byte_block in iter(lambda: f.read(4096), b""):
-                sha256_hash.update(byte_block)
-        return sha256_hash.hexdigest()
-        
+        return calculate_checksum(file_path, self.checksum_algorithm)
 
-    def _enumerate_files(self, directory: str) -> Iterable[Tuple[str, str]]:
+    def _enumerate_files(self, directory: str) -> Iterable[Tuple[str, os.stat_result]]:
         """
-        Enumerates files in a given directory and its subdirectories, yielding file paths and their checksums.
+        Enumerates files in a given directory and its subdirectories, yielding file paths and their stat data.
+        The tree is walked iteratively with os.scandir, so the file type comes from the directory entry
+        and only the included files are stat-ed.
 
         Args:
             directory (str): The directory to enumerate files from.
 
         Yields:
-            Tuple[str, str]: A tuple containing the full file path and its checksum.
+            Tuple[str, os.stat_result]: A tuple containing the full file path and its stat data.
 
         Notes:
             - Files in subdirectories listed in `self.exclude_subfolders` are skipped.
             - Only files with extensions listed in `self.extensions` are processed.
+            - Files and folders are filtered by `self.include_patterns` and `self.exclude_patterns` relative to `self.directory`.
         """
-        for filename in os.listdir(directory):
-            if filename in self.exclude_subfolders:
+        _relative_directory = self._relative_path(directory)
+        _stack = [(directory, "" if _relative_directory == "." else _relative_directory)]
+        while _stack:
+            _directory, _relative_directory = _stack.pop()
+            try:
+                _entries = os.scandir(_directory)
+            except (FileNotFoundError, NotADirectoryError, PermissionError):
                 continue
-            full_path = os.path.join(directory, filename)
-            # if filename ends with one of the extensions
-            if any([filename.endswith(ext) for ext in self.extensions]):
-                yield [full_path, self._calculate_checksum(full_path)]
-            elif os.path.isdir(full_path):
-                yield from self._enumerate_files(full_path)
+            with _entries:
+                for entry in _entries:
+                    if entry.name in self._excluded_names:
+                        continue
+                    _relative_path = f"{_relative_directory}/{entry.name}" if _relative_directory else entry.name
+                    if entry.is_dir():
+                        if not self._path_filter.excludes_folder(_relative_path):
+                            _stack.append((entry.path, _relative_path))
+                    elif entry.name.endswith(self._extensions) and self._path_filter.includes_file(_relative_path):
+                        yield entry.path, entry.stat()
+
+    def _relative_path(self, path: str) -> str:
+        # the patterns are matched with '/' as the separator on every platform
+        return os.path.relpath(path, self.directory).replace(os.sep, "/")
+
+    def _prepare_file(self, file_path: str, stat_result: os.stat_result, stored_checksums: Dict[str, str]) -> Optional[PreparedContent]:
+        """
+        Hashes, loads and splits a single file unless the manifest proves that it was not changed.
+        It is called concurrently from the worker threads.
+
+        Args:
+            file_path (str): The path of the file to process.
+            stat_result (os.stat_result): The stat data of the file.
+            stored_checksums (Dict[str, str]): The map of file sources to checksums stored in the embedding.
+
+        Returns:
+            Optional[PreparedContent]: The content to store in the embedding, or None if the file is settled.
+
+        Notes:
+            - Files with the same size, mtime and inode as recorded in the manifest are skipped without hashing.
+            - Files of at least 'stream_threshold' bytes are streamed into the embedding and return None.
+            - Files with changed stat data but the same checksum only get their manifest entry refreshed.
+            - A file skipped because the vectorstore keeps its previous content (no 'reload') gets no manifest entry,
+              so a later run still sees it as changed.
+            - Manifest entries of another checksum algorithm are ignored, so the files are rehashed.
+            - In the 'verify_checksums' mode every file is rehashed and checked against the vectorstore.
+        """
+        self.stats.increment("files_scanned")
+        entry = self.manifest.get(file_path) if self.manifest is not None else None
+        # an entry hashed with another algorithm cannot prove the file unchanged, so the file is rehashed
+        _same_algorithm = entry is not None and split_checksum(entry.checksum)[0] == self.checksum_algorithm
+        if _same_algorithm and not self.verify_checksums and entry.matches(stat_result):
+            print(f"Skipping. File is not changed since the last run. {file_path}") if self.verbose else None
+            self.stats.increment("files_skipped")
+            return None
+
+        with self.stats.stage("hash"):
+            checksum = self._calculate_checksum(file_path)
+        self.stats.increment("bytes_hashed", stat_result.st_size)
+        if entry is not None and not self.verify_checksums and entry.checksum == checksum:
+            print(f"Skipping. File content is not changed since the last run. {file_path}") if self.verbose else None
+            self.stats.increment("files_skipped")
+            self.manifest.put(file_path, stat_result, checksum)
+            return None
+
+        if stat_result.st_size >= self.stream_threshold:
+            # large files are streamed into the vectorstore right on the worker thread, so they never sit in the queue as a whole
+            _chunks = self.embedding.stream_content_from_path(file_path, checksum, self.reload, stored_checksums, self.embed_batch_size)
+            if _chunks is not None:
+                self.stats.increment("bytes_loaded", stat_result.st_size)
+                self.stats.increment("files_added")
+                self.manifest.put(file_path, stat_result, checksum) if self.manifest is not None else None
+                return None
+            prepared = None
+        else:
+            prepared = self.embedding.prepare_content_from_path(file_path, checksum, self.reload, stored_checksums)
+        if prepared is None:
+            self.stats.increment("files_skipped")
+        else:
+            self.stats.increment("bytes_loaded", stat_result.st_size)
+        # without reload the vectorstore keeps the previous content of a changed file, it must not be recorded as stored
+        if prepared is None and self.manifest is not None and self._is_stored(file_path, checksum, stored_checksums):
+            self.manifest.put(file_path, stat_result, checksum)
+        return prepared
+
+    def _is_stored(self, file_path: str, checksum: str, stored_checksums: Optional[Dict[str, str]]) -> bool:
+        """
+        Checks whether the embedding holds the file with the given checksum, i.e. it was skipped because it is
+        up to date and not because the previous content is kept without 'reload'.
+
+        Args:
+            file_path (str): The path of the file.
+            checksum (str): The checksum of the file.
+            stored_checksums (Optional[Dict[str, str]]): The map of file sources to checksums stored in the embedding,
+                None to look the file up in the embedding.
+
+        Returns:
+            bool: True if all stored chunks of the file have the checksum.
+        """
+        if stored_checksums is not None:
+            return stored_checksums.get(file_path) == checksum
+        _stored = {checksum_from_metadata(document.metadata) for document in self.embedding.find_documents_in_vectorstore(file_path)}
+        return _stored == {checksum}
+
+    def _is_unchanged(self, files: List[Tuple[str, os.stat_result]]) -> bool:
+        """
+        Checks whether the manifest proves that no file was added, changed or deleted since the last run:
+        every file has an entry of the same checksum algorithm with the same stat data and the manifest has no other entries.
+        Only the stat data is compared, so the check neither hashes a file nor touches the vector store.
+
+        Args:
+            files (List[Tuple[str, os.stat_result]]): The paths and stat data of the files in the directory.
+
+        Returns:
+            bool: True if nothing has to be processed.
+        """
+        if self.manifest is None or self.verify_checksums or len(self.manifest) != len(files):
+            return False
+        for file_path, stat_result in files:
+            entry = self.manifest.get(file_path)
+            if entry is None or split_checksum(entry.checksum)[0] != self.checksum_algorithm or not entry.matches(stat_result):
+                return False
+        return True
+
+    def _queue_prepared(self, batcher: EmbeddingBatcher, prepared: Optional[PreparedContent]) -> None:
+        if prepared is not None:
+            batcher.put(prepared)
+
+    def _load_files(self, files: List[Tuple[str, os.stat_result]], stored_checksums: Optional[Dict[str, str]]) -> None:
+        """
+        Runs the files through the ingestion pipeline: they are hashed, loaded and split on the worker threads,
+        their chunks are embedded and stored in batches on a background thread.
+
+        Args:
+            files (List[Tuple[str, os.stat_result]]): The paths and stat data of the files to load.
+            stored_checksums (Optional[Dict[str, str]]): The map of file sources to checksums stored in the embedding,
+                None to look every file up in the embedding.
+
+        Returns:
+            None
+        """
+        _stats = dict(files)
+
+        def _on_file_stored(prepared: PreparedContent) -> None:
+            self.stats.increment("files_added")
+            if self.manifest is not None:
+                self.manifest.put(prepared.file_path, _stats[prepared.file_path], prepared.checksum)
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor, \
+                EmbeddingBatcher(self.embedding, self.embed_batch_size, self.max_inflight, _on_file_stored, self.verbose) as batcher:
+            # keep a bounded number of files in flight, so memory does not grow with the size of the tree
+            _pending = deque()
+            for file_for_processing in files:
+                _pending.append(executor.submit(self._prepare_file, file_for_processing[0], file_for_processing[1], stored_checksums))
+                if len(_pending) >= self.max_inflight:
+                    self._queue_prepared(batcher, _pending.popleft().result())
+            while _pending:
+                self._queue_prepared(batcher, _pending.popleft().result())
+
+    def _is_included(self, file_path: str) -> bool:
+        """
+        Checks whether the file would be enumerated by '_enumerate_files', i.e. it has one of the extensions
+        and none of its parent folders within the directory is excluded.
+
+        Args:
+            file_path (str): The path of the file.
+
+        Returns:
+            bool: True if the file has to be processed, False otherwise.
+        """
+        _relative_path = self._relative_path(file_path)
+        _relative_parts = _relative_path.split("/")
+        if _relative_parts[0] == os.pardir or any(part in self._excluded_names for part in _relative_parts):
+            return False
+        if not _relative_parts[-1].endswith(self._extensions) or not self._path_filter.includes_file(_relative_path):
+            return False
+        return not any(self._path_filter.excludes_folder("/".join(_relative_parts[:depth])) for depth in range(1, len(_relative_parts)))
+
+    def _commit(self) -> None:
+        # the stored chunks only mark the version as changed, it is bumped once per run, also after an error
+        self.manifest.commit() if self.manifest is not None else None
+        self.embedding.index_version.commit()
+
+    def process_paths(self, paths: Iterable[str]) -> None:
+        """
+        Processes only the given paths, e.g. the ones reported by a file system watcher. Existing files are loaded
+        into the embedding, the embedding documents of deleted files (or files under deleted folders) are removed.
+
+        Args:
+            paths (Iterable[str]): The changed file or folder paths within the directory.
+
+        Returns:
+            None
+        """
+        try:
+            _files_to_process = {}
+            _deleted_paths = []
+            with self.stats.stage("scan"):
+                for path in paths:
+                    if os.path.isdir(path):
+                        _files_to_process.update((file[0], file[1]) for file in self._enumerate_files(path) if self._is_included(file[0]))
+                    elif os.path.isfile(path):
+                        if self._is_included(path):
+                            _files_to_process[path] = os.stat(path)
+                    else:
+                        _deleted_paths.append(path)
+
+            if _files_to_process:
+                print(f"Processing {len(_files_to_process)} changed files") if self.verbose else None
+                self._load_files(list(_files_to_process.items()), None)
+
+            if _deleted_paths:
+                _stored_files = self.manifest.paths() if self.manifest is not None else self.embedding.get_list_of_stored_files()
+                _deleted_files = set(_deleted_paths)
+                _deleted_folders = tuple(path.rstrip(os.sep) + os.sep for path in _deleted_paths)
+                _stale_files = [
+                    file for file in _stored_files
+                    if (file in _deleted_files or file.startswith(_deleted_folders)) and not os.path.exists(file)
+                ]
+                self.embedding._delete_documents_by_paths(_stale_files)
+                for file in _stale_files:
+                    self.manifest.remove(file) if self.manifest is not None else None
+        finally:
+            self._commit()
 
     def process_files(self):
         """
@@ -85,12 +346,15 @@ class FilesProcessor:
         Steps:
         1. Prints a message indicating the start of file processing if verbose mode is enabled.
         2. Enumerates all files in the specified directory.
-        3. Loads the content of each file into the embedding.
-        4. Prints the number of processed files if verbose mode is enabled.
-        5. Retrieves the list of files currently stored in the embedding.
-        6. Compares the stored files with the files in the directory.
-        7. Deletes files from the embedding that are no longer present in the directory.
-        8. Prints a message for each file deleted from the embedding if verbose mode is enabled.
+        3. Returns if the manifest proves that no file changed, so an idle run does not open the vector store.
+        4. Retrieves the checksums of the files currently stored in the embedding in one metadata-only pass.
+        5. Hashes, loads and splits changed files on the worker threads, embeds their chunks in batches
+           on a background thread and records every stored file in the manifest.
+        6. Prints the number of processed files if verbose mode is enabled.
+        7. Compares the stored files with the files in the directory as sets.
+        8. Deletes files from the embedding that are no longer present in the directory, in batches of paths.
+        9. Prints a message for each file deleted from the embedding if verbose mode is enabled.
+        10. Commits the manifest and bumps the index version once if the collection changed, also after an error.
         Attributes:
             directory (str): The directory containing the files to be processed.
             reload (bool): A flag indicating whether to reload the files.
@@ -98,18 +362,26 @@ class FilesProcessor:
             embedding (Embedding): An instance of the Embedding class used to load and manage file content.
         """
         print(f"Files will be processed in the reload mode: {self.reload}") if self.verbose else None
-        _files_to_process = [file for file in self._enumerate_files(self.directory)]
-        for file_for_processing in _files_to_process:
-            self.embedding.load_content_from_path(file_for_processing[0], file_for_processing[1], self.reload)
-        
-        print(f"Files processed: {len(_files_to_process)}") if self.verbose else None
-        # delete files from embedding that are not in the directory
-        _files = self.embedding.get_list_of_stored_files()
-        _files_to_compare_to = [file[0] for file in _files_to_process]
+        try:
+            with self.stats.stage("scan"):
+                _files_to_process = [file for file in self._enumerate_files(self.directory)]
+                _unchanged = self._is_unchanged(_files_to_process)
+            if _unchanged:
+                self.stats.increment("files_scanned", len(_files_to_process))
+                self.stats.increment("files_skipped", len(_files_to_process))
+                print(f"No file changed since the last run: {len(_files_to_process)} files") if self.verbose else None
+                return
+            _stored_checksums = self.embedding.get_stored_checksums()
+            self._load_files(_files_to_process, _stored_checksums)
         
-        for file in _files:
-            if file not in _files_to_compare_to:
-                self.embedding._delete_documents_by_path(file)
-        
-        
-        
\ No newline at end of file
+            print(f"Files processed: {len(_files_to_process)}") if self.verbose else None
+            # delete files from embedding that are not in the directory
+            _processed_files = {file[0] for file in _files_to_process}
+            _deleted = self.embedding._delete_documents_by_paths(_stored_checksums.keys() - _processed_files)
+            print(f"Files deleted: {_deleted}") if self.verbose and _deleted else None
+
+            if self.manifest is not None:
+                for file in set(self.manifest.paths()) - _processed_files:
+                    self.manifest.remove(file)
+        finally:
+            self._commit()
@@ -0,0 +1,147 @@
+import os
+import queue
+import time
+from typing import Callable, Dict, Set, Tuple
+from src.files_processor import FilesProcessor
+
+try:
+    from watchdog.events import FileSystemEvent, FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    Observer = None
+    FileSystemEventHandler = object
+
+
+class _ChangedPathsHandler(FileSystemEventHandler):
+    """
+    Puts the paths of every file system event into a queue.
+    """
+    def __init__(self, changed_paths: queue.Queue) -> None:
+        super().__init__()
+        self._changed_paths = changed_paths
+
+    def on_any_event(self, event: "FileSystemEvent") -> None:
+        if event.event_type in ("opened", "closed_no_write"):
+            return
+        # a folder is modified whenever a file in it changes, the file has its own event
+        if event.is_directory and event.event_type == "modified":
+            return
+        self._changed_paths.put(os.fsdecode(event.src_path))
+        if getattr(event, "dest_path", None):
+            self._changed_paths.put(os.fsdecode(event.dest_path))
+
+
+class FilesWatcher:
+    """
+    Keeps the embedding in sync with the directory of a FilesProcessor. After an initial full pass it reacts
+    to file system events (inotify and friends through the optional 'watchdog' package, or polling of the
+    stat data if it is not installed), debounces bursts of events and re-processes only the affected paths.
+    Attributes:
+        files_processor (FilesProcessor): The processor of the watched directory.
+        debounce (float): The quiet period in seconds after the last event before the changes are processed.
+        poll_interval (float): The interval between the scans of the directory in the polling mode.
+        polling (bool): A flag indicating whether the directory is polled instead of watched for events.
+        verbose (bool): A flag to indicate if verbose output should be printed.
+        on_processed (Callable[[], None]): Called after the initial pass and after every batch of changes, e.g. to export the run statistics.
+        _changed_paths (queue.Queue): The paths reported by the file system events.
+    Args:
+        files_processor (FilesProcessor): The processor of the watched directory.
+        debounce (float): The quiet period after the last event in seconds. Default is 2.0.
+        poll_interval (float): The interval between the scans of the directory in seconds. Default is 5.0.
+        polling (bool): A flag to force the polling mode. Default is False, i.e. polling only without 'watchdog'.
+        verbose (bool): A flag to indicate if verbose output should be printed. Default is False.
+        on_processed (Callable[[], None]): Called after every processing. Default is None.
+    Methods:
+        run() -> None: Processes the whole directory once and then watches it until interrupted.
+    """
+    def __init__(self,
+                 files_processor: FilesProcessor,
+                 debounce: float = 2.0,
+                 poll_interval: float = 5.0,
+                 polling: bool = False,
+                 verbose: bool = False,
+                 on_processed: Callable[[], None] = None) -> None:
+        self.files_processor = files_processor
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.polling = polling or Observer is None
+        self.verbose = verbose
+        self.on_processed = on_processed
+        self._changed_paths = queue.Queue()
+
+    def run(self) -> None:
+        """
+        Processes the whole directory once and then re-processes the changed paths until interrupted.
+        Returns:
+            None
+        """
+        if self.polling:
+            _snapshot = self._snapshot()
+            self._process_files()
+            print(f"Polling {self.files_processor.directory} every {self.poll_interval}s for changes") if self.verbose else None
+            while True:
+                time.sleep(self.poll_interval)
+                _snapshot = self._poll(_snapshot)
+                self._process_changes()
+        else:
+            observer = Observer()
+            observer.schedule(_ChangedPathsHandler(self._changed_paths), self.files_processor.directory, recursive=True)
+            # the observer is started first, so no change made during the initial pass is lost
+            observer.start()
+            try:
+                self._process_files()
+                print(f"Watching {self.files_processor.directory} for changes") if self.verbose else None
+                while True:
+                    self._process_changes()
+            finally:
+                observer.stop()
+                observer.join()
+
+    def _process_changes(self) -> None:
+        """
+        Waits for the first changed path, collects further paths until no event arrives for 'debounce' seconds
+        and re-processes them together.
+        Returns:
+            None
+        """
+        try:
+            _paths = {self._changed_paths.get(timeout=1.0)}
+        except queue.Empty:
+            return
+        while True:
+            try:
+                _paths.add(self._changed_paths.get(timeout=self.debounce))
+            except queue.Empty:
+                break
+        _paths = self._relevant_paths(_paths)
+        if not _paths:
+            return
+        print(f"Detected changes in {len(_paths)} paths") if self.verbose else None
+        self.files_processor.process_paths(sorted(_paths))
+        self.on_processed() if self.on_processed is not None else None
+
+    def _process_files(self) -> None:
+        self.files_processor.process_files()
+        self.on_processed() if self.on_processed is not None else None
+
+    def _relevant_paths(self, paths: Set[str]) -> Set[str]:
+        # events of excluded folders or files with other extensions do not trigger any work
+        return {
+            path for path in paths
+            if os.path.isdir(path) or not os.path.exists(path) or self.files_processor._is_included(path)
+        }
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int, int]]:
+        return {
+            file_path: (stat_result.st_size, stat_result.st_mtime_ns, stat_result.st_ino)
+            for file_path, stat_result in self.files_processor._enumerate_files(self.files_processor.directory)
+        }
+
+    def _poll(self, previous: Dict[str, Tuple[int, int, int]]) -> Dict[str, Tuple[int, int, int]]:
+        current = self._snapshot()
+        for file_path in previous.keys() - current.keys():
+            self._changed_paths.put(file_path)
+        for file_path, stat_data in current.items():
+            if previous.get(file_path) != stat_data:
+                self._changed_paths.put(file_path)
+        return current
@@ -0,0 +1,77 @@
+import hashlib
+from typing import Dict, List, Sequence
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+from src.keyword_index import KeywordIndex
+
+
+def document_key(document: Document) -> str:
+    """
+    Returns the identity of a retrieved chunk: its ID in the vector store, or the hash of its source and text
+    for documents without an ID.
+    """
+    if document.id:
+        return document.id
+    _source = str(document.metadata.get("source", ""))
+    return hashlib.sha256(f"{_source}\0{document.page_content}".encode("utf-8")).hexdigest()
+
+
+def reciprocal_rank_fusion(result_lists: Sequence[List[Document]], weights: Sequence[float], rrf_k: int = 60) -> List[Document]:
+    """
+    Fuses ranked lists of documents with the weighted reciprocal rank fusion: a document scores
+    weight / (rrf_k + rank) in every list it appears in (rank starting at 1) and the lists are merged by the summed score.
+    Only the ranks are used, so the incomparable scores of BM25 and of the vector distance need no normalization.
+    A document found by several lists is returned once, as the first list which found it returned it.
+    Args:
+        result_lists (Sequence[List[Document]]): The ranked lists, the best document first.
+        weights (Sequence[float]): The weight of every list.
+        rrf_k (int): The rank constant, higher values flatten the difference between the top ranks. Default is 60.
+    Returns:
+        List[Document]: The fused documents, the best first.
+    """
+    _scores: Dict[str, float] = {}
+    _documents: Dict[str, Document] = {}
+    for documents, weight in zip(result_lists, weights):
+        for rank, document in enumerate(documents, start=1):
+            _key = document_key(document)
+            _scores[_key] = _scores.get(_key, 0.0) + weight / (rrf_k + rank)
+            _documents.setdefault(_key, document)
+    return [_documents[key] for key in sorted(_scores, key=_scores.get, reverse=True)]
+
+
+class HybridRetriever(BaseRetriever):
+    """
+    Retrieves the documents of both the vector store and the BM25 keyword index and fuses the two rankings
+    with the reciprocal rank fusion. The vector search finds paraphrases, the keyword search finds the exact
+    identifiers, error codes and names the embeddings blur.
+    Attributes:
+        vector_retriever (BaseRetriever): The retriever of the vector store, it should return 'fetch_k' documents.
+        keyword_index (KeywordIndex): The keyword index of the chunks.
+        k (int): The number of fused documents to return.
+        fetch_k (int): The number of documents taken from the keyword index.
+        rrf_k (int): The rank constant of the fusion.
+        vector_weight (float): The weight of the vector ranking.
+        keyword_weight (float): The weight of the keyword ranking.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    vector_retriever: BaseRetriever
+    keyword_index: KeywordIndex
+    k: int = 4
+    fetch_k: int = 20
+    rrf_k: int = 60
+    vector_weight: float = 1.0
+    keyword_weight: float = 1.0
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        _vector_documents = self.vector_retriever.invoke(query, config={"callbacks": run_manager.get_child()})
+        _keyword_documents = [
+            Document(id=hit.chunk_id, page_content=hit.text, metadata={"source": hit.source})
+            for hit in self.keyword_index.search(query, self.fetch_k)
+        ]
+        return reciprocal_rank_fusion(
+            [_vector_documents, _keyword_documents],
+            [self.vector_weight, self.keyword_weight],
+            self.rrf_k)[:self.k]
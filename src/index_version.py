@@ -0,0 +1,69 @@
+import os
+import threading
+import uuid
+from typing import Optional
+
+
+class IndexVersion:
+    """
+    A marker file next to the Chroma database which changes every time the collection is modified.
+    The writes of the embedding processor only mark the version as changed and the processor bumps it once
+    at the end of its run, so a large re-index neither rewrites the file for every batch nor invalidates
+    the answer cache of the chat many times. Readers compare it to detect that their cached results are outdated.
+    Attributes:
+        path (str): The path to the marker file.
+        _changed (bool): Flag indicating whether the collection was modified since the last bump.
+        _lock (threading.Lock): The lock guarding the flag.
+    Args:
+        path (str): The path to the marker file. Parent directories are created on the first bump.
+    Methods:
+        default_path(chroma_db_path: str, chroma_db_name: str) -> str: Builds the marker path next to the Chroma database.
+        read() -> str: Returns the current version, an empty string if the collection was never modified.
+        bump() -> str: Sets and returns a new version.
+        mark_changed() -> None: Records that the collection was modified, without writing the marker.
+        commit() -> Optional[str]: Bumps the version if the collection was modified since the last bump.
+    """
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._changed = False
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def default_path(chroma_db_path: str, chroma_db_name: str) -> str:
+        return os.path.join(chroma_db_path, f"{chroma_db_name}.version")
+
+    def read(self) -> str:
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return f.read().strip()
+        except FileNotFoundError:
+            return ""
+
+    def bump(self) -> str:
+        with self._lock:
+            self._changed = False
+        version = uuid.uuid4().hex
+        _directory = os.path.dirname(self.path)
+        if _directory:
+            os.makedirs(_directory, exist_ok=True)
+        # replace the file atomically, so readers never see a partially written version
+        _temporary_path = f"{self.path}.{version}.tmp"
+        with open(_temporary_path, "w", encoding="utf-8") as f:
+            f.write(version)
+        os.replace(_temporary_path, self.path)
+        return version
+
+    def mark_changed(self) -> None:
+        with self._lock:
+            self._changed = True
+
+    def commit(self) -> Optional[str]:
+        """
+        Bumps the version if the collection was modified since the last bump.
+        Returns:
+            Optional[str]: The new version, None if the collection was not modified.
+        """
+        with self._lock:
+            if not self._changed:
+                return None
+        return self.bump()
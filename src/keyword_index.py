@@ -0,0 +1,205 @@
+import os
+import sqlite3
+import threading
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+
+class KeywordHit(NamedTuple):
+    """
+    A chunk found by the KeywordIndex.
+    Attributes:
+        chunk_id (str): The ID of the chunk in the vector store.
+        source (str): The path of the file the chunk belongs to.
+        text (str): The text of the chunk.
+        score (float): The BM25 score of the chunk, higher is better.
+    """
+    chunk_id: str
+    source: str
+    text: str
+    score: float
+
+
+class KeywordIndex:
+    """
+    A persistent BM25 keyword index of the chunk texts, kept next to the Chroma database and updated
+    by the EmbeddingManager in the same calls which add and delete chunks in the vector store.
+    The inverted index is an SQLite FTS5 table, so adding and deleting chunks is incremental and a search
+    reads only the posting lists of the query terms; the chunk IDs and sources live in a plain table
+    with an index on the source, so the chunks of deleted files are pruned without scanning the index.
+    Terms which occur in more than 'max_document_frequency' of the chunks (e.g. "the", "is") are dropped
+    from the query: their BM25 weight is close to zero, but they would make the search score most of the chunks.
+    A query of such terms only finds nothing, it is left to the vector search. Terms which occur in at most
+    'min_document_limit' chunks are always kept, so a small index still finds its rare identifiers.
+    The database runs in the WAL mode, so the chat reads it while the embedding processor writes it.
+    Attributes:
+        path (str): The path to the SQLite database file.
+        max_document_frequency (float): The maximum share of the chunks a query term may occur in.
+        min_document_limit (int): The number of chunks a query term may always occur in, whatever the size of the index.
+        _connection (sqlite3.Connection): The connection to the database.
+        _lock (threading.Lock): The lock guarding the connection.
+        _cached_count (Tuple[int, int]): The 'data_version' of the database and the number of chunks at that version.
+    Args:
+        path (str): The path to the SQLite database file. Parent directories are created if missing.
+        max_document_frequency (float): The maximum share of the chunks a query term may occur in. Default is 0.05.
+        min_document_limit (int): The number of chunks a query term may always occur in. Default is 10.
+    Methods:
+        default_path(chroma_db_path: str, chroma_db_name: str) -> str: Builds the index path next to the Chroma database.
+        query_terms(query: str) -> List[str]: Splits the query into FTS5 phrases.
+        upsert(ids: List[str], sources: List[str], texts: List[str]) -> None: Adds or replaces chunks.
+        delete_ids(ids: Iterable[str]) -> None: Deletes chunks by their ID.
+        delete_sources(sources: Iterable[str]) -> None: Deletes all chunks of the files.
+        search(query: str, limit: int) -> List[KeywordHit]: Returns the best matching chunks.
+        count() -> int: Returns the number of indexed chunks.
+        backup(path: str) -> None: Writes a consistent copy of the index.
+        close() -> None: Closes the database.
+    """
+    # stay below the SQLite limit of host parameters per statement
+    _BATCH_SIZE = 500
+
+    def __init__(self, path: str, max_document_frequency: float = 0.05, min_document_limit: int = 10) -> None:
+        self.path = path
+        self.max_document_frequency = max_document_frequency
+        self.min_document_limit = min_document_limit
+        _directory = os.path.dirname(path)
+        if _directory:
+            os.makedirs(_directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "rowid INTEGER PRIMARY KEY, "
+            "chunk_id TEXT NOT NULL UNIQUE, "
+            "source TEXT NOT NULL)")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source)")
+        self._connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS chunks_text USING fts5(text, tokenize='unicode61 remove_diacritics 2')")
+        self._connection.commit()
+        self._cached_count: Optional[Tuple[int, int]] = None
+
+    @staticmethod
+    def default_path(chroma_db_path: str, chroma_db_name: str) -> str:
+        return os.path.join(chroma_db_path, f"{chroma_db_name}.keywords.sqlite3")
+
+    def __enter__(self) -> "KeywordIndex":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    @staticmethod
+    def query_terms(query: str) -> List[str]:
+        """
+        Splits the query at whitespace into FTS5 phrases. Every word is quoted, so identifiers like
+        'ERR_CONN_RESET' or 'os.scandir()' match as a phrase of their parts and no word is read as an FTS5 operator.
+        Args:
+            query (str): The query of the user.
+        Returns:
+            List[str]: The unique quoted phrases of the query.
+        """
+        _terms = []
+        for word in query.split():
+            if not any(character.isalnum() for character in word):
+                continue
+            _term = '"' + word.replace('"', '""') + '"'
+            if _term not in _terms:
+                _terms.append(_term)
+        return _terms
+
+    def upsert(self, ids: List[str], sources: List[str], texts: List[str]) -> None:
+        """
+        Adds the chunks to the index, replacing the chunks with the same IDs.
+        Args:
+            ids (List[str]): The IDs of the chunks in the vector store.
+            sources (List[str]): The paths of the files the chunks belong to.
+            texts (List[str]): The texts of the chunks.
+        Returns:
+            None
+        """
+        with self._lock, self._connection:
+            self._cached_count = None
+            for chunk_id, source, text in zip(ids, sources, texts):
+                _row = self._connection.execute("SELECT rowid FROM chunks WHERE chunk_id = ?", (chunk_id,)).fetchone()
+                if _row is None:
+                    _rowid = self._connection.execute(
+                        "INSERT INTO chunks (chunk_id, source) VALUES (?, ?)", (chunk_id, source)).lastrowid
+                else:
+                    _rowid = _row[0]
+                    self._connection.execute("UPDATE chunks SET source = ? WHERE rowid = ?", (source, _rowid))
+                    self._connection.execute("DELETE FROM chunks_text WHERE rowid = ?", (_rowid,))
+                self._connection.execute("INSERT INTO chunks_text (rowid, text) VALUES (?, ?)", (_rowid, text))
+
+    def _delete_where(self, column: str, values: Iterable[str]) -> None:
+        _values = list(dict.fromkeys(values))
+        with self._lock, self._connection:
+            self._cached_count = None
+            for start in range(0, len(_values), self._BATCH_SIZE):
+                _batch = _values[start:start + self._BATCH_SIZE]
+                _filter = f"{column} IN ({','.join('?' * len(_batch))})"
+                self._connection.execute(
+                    f"DELETE FROM chunks_text WHERE rowid IN (SELECT rowid FROM chunks WHERE {_filter})", _batch)
+                self._connection.execute(f"DELETE FROM chunks WHERE {_filter}", _batch)
+
+    def delete_ids(self, ids: Iterable[str]) -> None:
+        self._delete_where("chunk_id", ids)
+
+    def delete_sources(self, sources: Iterable[str]) -> None:
+        self._delete_where("source", sources)
+
+    def _count(self) -> int:
+        # the count is cached until this connection writes or 'data_version' shows a commit of another connection
+        _data_version = self._connection.execute("PRAGMA data_version").fetchone()[0]
+        if self._cached_count is None or self._cached_count[0] != _data_version:
+            self._cached_count = (_data_version, self._connection.execute("SELECT COUNT(*) FROM chunks").fetchone()[0])
+        return self._cached_count[1]
+
+    def _selective_terms(self, terms: List[str]) -> List[str]:
+        # the matches are counted only up to the limit, so a common term costs no more than a selective one
+        # below 'min_document_limit' / 'max_document_frequency' chunks the share would drop every term
+        _limit = max(self.min_document_limit, int(self._count() * self.max_document_frequency))
+        return [
+            term for term in terms
+            if self._connection.execute(
+                "SELECT COUNT(*) FROM (SELECT rowid FROM chunks_text WHERE chunks_text MATCH ? LIMIT ?)",
+                (term, _limit + 1)).fetchone()[0] <= _limit
+        ]
+
+    def search(self, query: str, limit: int = 20) -> List[KeywordHit]:
+        """
+        Returns the chunks which best match the query, ranked by BM25. Any of the query terms may match.
+        Args:
+            query (str): The query of the user.
+            limit (int): The maximum number of chunks to return. Default is 20.
+        Returns:
+            List[KeywordHit]: The matching chunks, the best first.
+        """
+        _terms = self.query_terms(query)
+        if not _terms:
+            return []
+        with self._lock:
+            _selective_terms = self._selective_terms(_terms)
+            if not _selective_terms:
+                return []
+            _rows = self._connection.execute(
+                "SELECT chunks.chunk_id, chunks.source, hits.text, hits.rank FROM ("
+                "SELECT rowid, text, rank FROM chunks_text WHERE chunks_text MATCH ? ORDER BY rank LIMIT ?"
+                ") AS hits JOIN chunks ON chunks.rowid = hits.rowid ORDER BY hits.rank",
+                (" OR ".join(_selective_terms), limit)).fetchall()
+        # FTS5 ranks by the negated BM25 score, the best match has the lowest rank
+        return [KeywordHit(chunk_id, source, text, -rank) for chunk_id, source, text, rank in _rows]
+
+    def count(self) -> int:
+        with self._lock:
+            return self._count()
+
+    def backup(self, path: str) -> None:
+        _target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._connection.backup(_target)
+        finally:
+            _target.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._connection.close()
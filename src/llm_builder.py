@@ -0,0 +1,71 @@
+import os
+from typing import TYPE_CHECKING, Union
+from src.LLM import OllamaLLM
+from src.answer_cache import AnswerCache
+from src.context_packer import ContextPacker
+from src.conversation_memory import ConversationMemory
+from src.keyword_index import KeywordIndex
+from src.ollama_clients import OllamaClients
+from src.sharded_embedding_manager import ShardedEmbeddingManager
+from src.vector_snapshot import VectorSnapshot
+
+if TYPE_CHECKING:
+    from src.arguments.chat import ChatRunArguments
+    from src.arguments.serve import ServeRunArguments
+
+
+def build_llm(run_args: Union["ChatRunArguments", "ServeRunArguments"], memory: ConversationMemory = None) -> OllamaLLM:
+    """
+    Builds the language model of chat.py and serve.py from the arguments they share (see add_llm_arguments()):
+    the answer cache, the vector snapshot, the keyword index of the hybrid retrieval and the collections to search.
+    The hybrid retrieval falls back to the vector search, with a message, when the keyword index was not built.
+    Args:
+        run_args (Union[ChatRunArguments, ServeRunArguments]): The parsed arguments of chat.py or serve.py.
+        memory (ConversationMemory): The conversation history of an interactive chat. Default is None.
+    Returns:
+        OllamaLLM: The language model with its retriever.
+    Raises:
+        FileNotFoundError: If the vector snapshot does not exist.
+        ValueError: If the vector snapshot has an unsupported format.
+    """
+    answer_cache = None
+    if run_args.answer_cache_size > 0:
+        answer_cache = AnswerCache(
+            max_entries=run_args.answer_cache_size,
+            ttl=run_args.answer_cache_ttl,
+            semantic_distance=run_args.semantic_cache_distance)
+
+    snapshot = VectorSnapshot(run_args.snapshot) if run_args.snapshot else None
+
+    keyword_index = None
+    if run_args.retrieval == "hybrid":
+        # a snapshot carries a copy of the keyword index
+        keyword_index_path = snapshot.keyword_index_path() if snapshot is not None else \
+            KeywordIndex.default_path(run_args.chroma_db_path, run_args.chroma_db_name)
+        if keyword_index_path is not None and os.path.exists(keyword_index_path):
+            keyword_index = KeywordIndex(keyword_index_path)
+        else:
+            print("Keyword index not found, run the embedding processor to build it. Using the vector search only.")
+
+    # a sharded collection is searched in all of its shards
+    collections = run_args.collections or \
+        ShardedEmbeddingManager.read_collections(run_args.chroma_db_path, run_args.chroma_db_name)
+
+    return OllamaLLM(
+        ollama_base_url=run_args.ollama_base_url,
+        chroma_db_name=run_args.chroma_db_name,
+        chroma_db_path=run_args.chroma_db_path,
+        system_prompt=run_args.system_prompt,
+        answer_cache=answer_cache,
+        keyword_index=keyword_index,
+        fusion_kwargs={
+            "rrf_k": run_args.rrf_k,
+            "vector_weight": run_args.vector_weight,
+            "keyword_weight": run_args.keyword_weight},
+        search_kwargs={"k": run_args.k},
+        context_packer=ContextPacker(token_budget=run_args.context_budget) if run_args.context_budget > 0 else None,
+        collections=collections,
+        clients=OllamaClients(run_args.ollama_base_url, run_args.keep_alive),
+        snapshot=snapshot,
+        memory=memory
+    )
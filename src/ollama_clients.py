@@ -0,0 +1,154 @@
+import re
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, NamedTuple, Optional, Union
+
+if TYPE_CHECKING:
+    from langchain_ollama import OllamaEmbeddings
+    from langchain_ollama import OllamaLLM as _OllamaLLM
+    from ollama import Client
+
+
+_DURATION_UNITS = {"": 1, "s": 1, "m": 60, "h": 3600}
+
+
+def parse_keep_alive(value: Union[int, float, str, None]) -> Optional[int]:
+    """
+    Converts a keep alive duration to seconds. Ollama keeps a model loaded for the given time after
+    its last request, 0 unloads it right after the request and a negative value keeps it loaded forever.
+    Args:
+        value (Union[int, float, str, None]): The duration, a number of seconds or a string like "30s", "5m", "1h" or "-1".
+    Returns:
+        Optional[int]: The duration in seconds, None for the default of the Ollama server (5 minutes).
+    Raises:
+        ValueError: If the string is not a duration.
+    """
+    if value is None or isinstance(value, (int, float)):
+        return None if value is None else int(value)
+    _match = re.fullmatch(r"\s*(-?\d+(?:\.\d+)?)\s*([smh]?)\s*", value)
+    if _match is None:
+        raise ValueError(f"Invalid keep alive duration '{value}', use e.g. 300, 30s, 5m, 1h or -1")
+    return int(float(_match.group(1)) * _DURATION_UNITS[_match.group(2)])
+
+
+class WarmUpReport(NamedTuple):
+    """
+    The latency of the first and of a repeated request to a model, measured by OllamaClients.warm_up_*().
+    Attributes:
+        model (str): The name of the model.
+        cold (float): The latency of the first request in seconds, it includes loading the model if it was not loaded.
+        warm (float): The latency of the repeated request in seconds, with the model loaded.
+    """
+    model: str
+    cold: float
+    warm: float
+
+    def __str__(self) -> str:
+        return f"{self.model}: cold {self.cold:.3f}s, warm {self.warm:.3f}s"
+
+
+class OllamaClients:
+    """
+    The shared client layer of the Ollama API. It creates one embeddings and one chat model per model name, so
+    all users of a model (e.g. the EmbeddingManagers of all shards) send their requests through its clients and
+    reuse the keep-alive HTTP connections of one pool instead of opening their own. The connection limit and the
+    timeout are passed to the sync and the async client of every model through its public 'client_kwargs'.
+    Every request asks Ollama to keep the model loaded for 'keep_alive', so the model is not loaded from the
+    disk again after an idle period, and warm_up_*() loads a model before the first real request.
+    The Ollama packages are imported and the clients are created on the first model or request, so a run which
+    does not talk to Ollama (e.g. an embedding run with no changed file) does not pay for them.
+    Attributes:
+        base_url (str): The base URL of the Ollama API.
+        keep_alive (int): How long Ollama keeps a model loaded after a request in seconds, None for the server default.
+        max_connections (int): The maximum number of open connections to Ollama.
+        timeout (float): The timeout of a request in seconds, None waits forever.
+        _client (Client): The client of the warm-up requests, None before the first one.
+        _embeddings (Dict[str, OllamaEmbeddings]): The embeddings models by their name.
+        _llms (Dict[str, _OllamaLLM]): The chat models by their name.
+        _lock (threading.Lock): The lock guarding the models.
+    Args:
+        base_url (str): The base URL of the Ollama API. Default is "http://localhost:11434".
+        keep_alive (Union[int, str]): How long Ollama keeps a model loaded, see parse_keep_alive(). Default is None.
+        max_connections (int): The maximum number of open connections to Ollama. Default is 16.
+        timeout (float): The timeout of a request in seconds, None waits forever. Default is None.
+    Methods:
+        embeddings(model: str) -> OllamaEmbeddings: Returns the embeddings model of the given name.
+        llm(model: str) -> _OllamaLLM: Returns the chat model of the given name.
+        client() -> Client: Returns the client of the warm-up requests.
+        warm_up_embeddings(model: str) -> WarmUpReport: Loads the embeddings model and measures the cold and warm latency.
+        warm_up_llm(model: str) -> WarmUpReport: Loads the chat model and measures the cold and warm latency.
+        close() -> None: Closes the connections of the warm-up client.
+    """
+    def __init__(self,
+                 base_url: str = "http://localhost:11434",
+                 keep_alive: Union[int, str] = None,
+                 max_connections: int = 16,
+                 timeout: float = None) -> None:
+        self.base_url = base_url
+        self.keep_alive = parse_keep_alive(keep_alive)
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self._client: Optional["Client"] = None
+        self._embeddings: Dict[str, "OllamaEmbeddings"] = {}
+        self._llms: Dict[str, "_OllamaLLM"] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "OllamaClients":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _client_kwargs(self) -> Dict[str, Any]:
+        import httpx
+        return {
+            "timeout": self.timeout,
+            "limits": httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections)}
+
+    def embeddings(self, model: str) -> "OllamaEmbeddings":
+        with self._lock:
+            _embeddings = self._embeddings.get(model)
+            if _embeddings is None:
+                from langchain_ollama import OllamaEmbeddings
+                _embeddings = OllamaEmbeddings(base_url=self.base_url, model=model, keep_alive=self.keep_alive,
+                                               client_kwargs=self._client_kwargs())
+                self._embeddings[model] = _embeddings
+            return _embeddings
+
+    def llm(self, model: str) -> "_OllamaLLM":
+        with self._lock:
+            _llm = self._llms.get(model)
+            if _llm is None:
+                from langchain_ollama import OllamaLLM as _OllamaLLM
+                _llm = _OllamaLLM(base_url=self.base_url, model=model, keep_alive=self.keep_alive,
+                                  client_kwargs=self._client_kwargs())
+                self._llms[model] = _llm
+            return _llm
+
+    def client(self) -> "Client":
+        with self._lock:
+            if self._client is None:
+                from ollama import Client
+                self._client = Client(host=self.base_url, **self._client_kwargs())
+            return self._client
+
+    @staticmethod
+    def _measure(request) -> float:
+        _started = time.perf_counter()
+        request()
+        return time.perf_counter() - _started
+
+    def warm_up_embeddings(self, model: str) -> WarmUpReport:
+        _client = self.client()
+        _request = lambda: _client.embed(model, "warm-up", keep_alive=self.keep_alive)
+        return WarmUpReport(model, self._measure(_request), self._measure(_request))
+
+    def warm_up_llm(self, model: str) -> WarmUpReport:
+        # a request with an empty prompt only loads the model, nothing is generated
+        _client = self.client()
+        _request = lambda: _client.generate(model, "", keep_alive=self.keep_alive)
+        return WarmUpReport(model, self._measure(_request), self._measure(_request))
+
+    def close(self) -> None:
+        if self._client is not None:
+            self._client.close()
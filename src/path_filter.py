@@ -0,0 +1,94 @@
+import re
+from typing import List, Optional, Tuple
+
+
+class PathFilter:
+    """
+    Include and exclude patterns in the gitignore style, compiled once into regular expressions.
+    The paths are matched relative to the processed directory with '/' as the separator:
+        - 'name' or '*.log' (without a slash) matches at any depth,
+        - 'docs/*.md' or '/build' (with a slash) matches relative to the directory,
+        - '**' matches any number of folders, '*' and '?' do not cross a '/', '[abc]' and '[!abc]' match a character,
+        - a trailing '/' matches folders only, e.g. 'node_modules/'.
+    Negated patterns ('!pattern') are not supported.
+    Attributes:
+        include (List[str]): The patterns a file has to match, all files are included if empty.
+        exclude (List[str]): The patterns of files and folders to skip; skipped folders are not walked into.
+    Args:
+        include (List[str]): The include patterns. Default is None.
+        exclude (List[str]): The exclude patterns. Default is None.
+    Methods:
+        excludes_folder(relative_path: str) -> bool: Checks whether the folder is excluded.
+        includes_file(relative_path: str) -> bool: Checks whether the file is included and not excluded.
+    """
+    def __init__(self, include: List[str] = None, exclude: List[str] = None) -> None:
+        self.include = list(include or [])
+        self.exclude = list(exclude or [])
+        _include = [self._translate(pattern) for pattern in self.include]
+        _exclude = [self._translate(pattern) for pattern in self.exclude]
+        self._include = self._compile([regex for regex, _ in _include])
+        self._exclude_folders = self._compile([regex for regex, _ in _exclude])
+        self._exclude_files = self._compile([regex for regex, folders_only in _exclude if not folders_only])
+
+    def __bool__(self) -> bool:
+        return bool(self.include or self.exclude)
+
+    def excludes_folder(self, relative_path: str) -> bool:
+        return self._exclude_folders is not None and self._exclude_folders.match(relative_path) is not None
+
+    def includes_file(self, relative_path: str) -> bool:
+        if self._exclude_files is not None and self._exclude_files.match(relative_path) is not None:
+            return False
+        return self._include is None or self._include.match(relative_path) is not None
+
+    @staticmethod
+    def _compile(regexes: List[str]) -> Optional["re.Pattern"]:
+        # a single alternation is matched much faster than a loop over the patterns
+        return re.compile("|".join(f"(?:{regex})" for regex in regexes)) if regexes else None
+
+    @staticmethod
+    def _translate(pattern: str) -> Tuple[str, bool]:
+        """
+        Translates a gitignore-style pattern into a regular expression.
+
+        Args:
+            pattern (str): The pattern to translate.
+
+        Returns:
+            Tuple[str, bool]: The regular expression and a flag indicating whether the pattern matches folders only.
+        """
+        folders_only = pattern.endswith("/")
+        pattern = pattern.rstrip("/")
+        anchored = "/" in pattern
+        pattern = pattern.lstrip("/")
+
+        regex = []
+        index = 0
+        while index < len(pattern):
+            char = pattern[index]
+            if pattern.startswith("**/", index):
+                regex.append("(?:.*/)?")
+                index += 3
+                continue
+            if pattern.startswith("**", index):
+                regex.append(".*")
+                index += 2
+                continue
+            if char == "*":
+                regex.append("[^/]*")
+            elif char == "?":
+                regex.append("[^/]")
+            elif char == "[":
+                _end = pattern.find("]", index + 2)
+                if _end == -1:
+                    regex.append(re.escape(char))
+                else:
+                    _class = pattern[index + 1:_end]
+                    _class = "^" + _class[1:] if _class.startswith("!") else _class
+                    regex.append("[" + _class.replace("\\", "\\\\") + "]")
+                    index = _end
+            else:
+                regex.append(re.escape(char))
+            index += 1
+
+        return ("" if anchored else "(?:.*/)?") + "".join(regex) + r"\Z", folders_only
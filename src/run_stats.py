@@ -0,0 +1,163 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, List
+
+
+class RunStats:
+    """
+    Counters and per-stage timers of an embedding run, shared by the FilesProcessor, the EmbeddingManager
+    and their worker threads. The time of a stage is summed over all threads, so the stages of parallel
+    workers can add up to more than the wall time of the run.
+    With 'profile' enabled, every stage also runs under a per-thread cProfile profiler; the profiles
+    of all threads are merged by write_profile(). Since Python 3.12 a cProfile profiler covers all threads,
+    so a single profiler runs from the creation of RunStats to write_profile() instead.
+    Attributes:
+        profile (bool): A flag indicating whether the stages are profiled with cProfile.
+        started (float): The perf_counter() value the run started at.
+        _counters (Dict[str, int]): The counters by their name.
+        _stage_seconds (Dict[str, float]): The time spent per stage.
+        _stage_calls (Dict[str, int]): The number of times a stage was entered.
+        _lock (threading.Lock): The lock guarding the counters and timers.
+        _local (threading.local): The profiler and the nesting depth of the stages of the current thread.
+        _profilers (List[cProfile.Profile]): The profilers of all threads.
+    Args:
+        profile (bool): A flag to profile the stages with cProfile. Default is False.
+    Methods:
+        stage(name: str) -> ContextManager: Times the enclosed block as the given stage.
+        increment(name: str, amount: int) -> None: Increments a counter.
+        to_dict() -> Dict: Returns the wall time, the stages and the counters.
+        summary_table() -> str: Formats the stages and the counters as a table.
+        write_json(path: str) -> None: Writes to_dict() as JSON.
+        write_prometheus(path: str) -> None: Writes the metrics in the Prometheus textfile format.
+        write_profile(path: str) -> None: Writes the merged cProfile statistics.
+    """
+    # the order of the stages in the reports, other stages follow in the order they were first seen
+    STAGES = ["scan", "lookup", "hash", "load", "split", "embed", "store", "delete"]
+    COUNTERS = ["files_scanned", "files_skipped", "files_added", "files_deleted", "chunks_embedded", "chunks_deleted",
+                "bytes_hashed", "bytes_loaded"]
+
+    def __init__(self, profile: bool = False) -> None:
+        self.profile = profile
+        self.started = time.perf_counter()
+        self._counters: Dict[str, int] = {name: 0 for name in self.COUNTERS}
+        self._stage_seconds: Dict[str, float] = {}
+        self._stage_calls: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._profilers: List[cProfile.Profile] = []
+        self._global_profiler = None
+        if profile and sys.version_info >= (3, 12):
+            self._global_profiler = cProfile.Profile()
+            self._profilers.append(self._global_profiler)
+            self._global_profiler.enable()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        _profiler = self._enter_profiler() if self.profile and self._global_profiler is None else None
+        _started = time.perf_counter()
+        try:
+            yield
+        finally:
+            _elapsed = time.perf_counter() - _started
+            if _profiler is not None:
+                self._exit_profiler(_profiler)
+            with self._lock:
+                self._stage_seconds[name] = self._stage_seconds.get(name, 0.0) + _elapsed
+                self._stage_calls[name] = self._stage_calls.get(name, 0) + 1
+
+    def increment(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def _enter_profiler(self) -> cProfile.Profile:
+        # a thread has a single profiler, which is enabled by the outermost stage only
+        _profiler = getattr(self._local, "profiler", None)
+        if _profiler is None:
+            _profiler = self._local.profiler = cProfile.Profile()
+            self._local.depth = 0
+            with self._lock:
+                self._profilers.append(_profiler)
+        if self._local.depth == 0:
+            _profiler.enable()
+        self._local.depth += 1
+        return _profiler
+
+    def _exit_profiler(self, profiler: cProfile.Profile) -> None:
+        self._local.depth -= 1
+        if self._local.depth == 0:
+            profiler.disable()
+
+    def _ordered_stages(self) -> List[str]:
+        return [name for name in self.STAGES if name in self._stage_seconds] + \
+            [name for name in self._stage_seconds if name not in self.STAGES]
+
+    def to_dict(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "wall_seconds": time.perf_counter() - self.started,
+                "stages": {
+                    name: {"seconds": self._stage_seconds[name], "calls": self._stage_calls[name]}
+                    for name in self._ordered_stages()
+                },
+                "counters": dict(self._counters),
+            }
+
+    def summary_table(self) -> str:
+        _report = self.to_dict()
+        _total = sum(stage["seconds"] for stage in _report["stages"].values()) or 1.0
+        _lines = [f"{'Stage':<10}{'Calls':>10}{'Seconds':>12}{'Share':>8}"]
+        for name, stage in _report["stages"].items():
+            _lines.append(f"{name:<10}{stage['calls']:>10}{stage['seconds']:>12.3f}{stage['seconds'] / _total:>8.1%}")
+        _lines.append(f"Wall time: {_report['wall_seconds']:.3f}s (the stages of parallel workers add up)")
+        _lines.append("")
+        _lines.append(f"{'Counter':<18}{'Value':>14}")
+        for name, value in _report["counters"].items():
+            _lines.append(f"{name:<18}{value:>14}")
+        return "\n".join(_lines)
+
+    @staticmethod
+    def _write_atomically(path: str, content: str) -> None:
+        # collectors (e.g. the textfile collector of node_exporter) must never read a partially written file
+        _temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(_temporary_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(_temporary_path, path)
+
+    def write_json(self, path: str) -> None:
+        self._write_atomically(path, json.dumps(self.to_dict(), indent=2))
+
+    def write_prometheus(self, path: str, prefix: str = "embedding_processor") -> None:
+        _report = self.to_dict()
+        _lines = [
+            f"# HELP {prefix}_run_seconds Wall time of the last run.",
+            f"# TYPE {prefix}_run_seconds gauge",
+            f"{prefix}_run_seconds {_report['wall_seconds']:.6f}",
+            f"# HELP {prefix}_last_run_timestamp_seconds Unix time the last run finished at.",
+            f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+            f"{prefix}_last_run_timestamp_seconds {time.time():.3f}",
+            f"# HELP {prefix}_stage_seconds Time spent per stage, summed over all threads.",
+            f"# TYPE {prefix}_stage_seconds gauge",
+        ]
+        _lines.extend(f'{prefix}_stage_seconds{{stage="{name}"}} {stage["seconds"]:.6f}' for name, stage in _report["stages"].items())
+        _lines.append(f"# HELP {prefix}_stage_calls Number of times a stage was run.")
+        _lines.append(f"# TYPE {prefix}_stage_calls gauge")
+        _lines.extend(f'{prefix}_stage_calls{{stage="{name}"}} {stage["calls"]}' for name, stage in _report["stages"].items())
+        for name, value in _report["counters"].items():
+            _lines.append(f"# TYPE {prefix}_{name} gauge")
+            _lines.append(f"{prefix}_{name} {value}")
+        self._write_atomically(path, "\n".join(_lines) + "\n")
+
+    def write_profile(self, path: str) -> None:
+        if self._global_profiler is not None:
+            self._global_profiler.disable()
+        with self._lock:
+            _profilers = list(self._profilers)
+        if not _profilers:
+            return
+        pstats.Stats(*_profilers).dump_stats(path)
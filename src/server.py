@@ -0,0 +1,275 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+from langchain_core.documents import Document
+from src.LLM import OllamaLLM
+from src.conversation_memory import ConversationMemory
+
+
+_REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 413: "Content Too Large", 500: "Internal Server Error"}
+_STREAM_END = object()
+# a prompt with its history is a few KiB, the limit keeps a single request from filling the memory
+_MAX_BODY_SIZE = 1024 * 1024
+
+
+class _HttpError(Exception):
+    def __init__(self, status: int, message: str) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+class ChatServer:
+    """
+    An asyncio HTTP server which shares one OllamaLLM (and so one Chroma instance) between all requests.
+    The blocking calls to Ollama run on a thread pool, the number of concurrent calls is bounded
+    by 'max_concurrency' so Ollama is not overloaded; the other requests wait for a free slot.
+    Endpoints:
+        GET /health: The status of the server and the number of requests in flight.
+        POST /retrieve {"prompt": str}: The documents relevant to the prompt.
+        POST /chat {"prompt": str, "stream": bool, "history": [[question, answer], ...]}: The answer to the prompt.
+            With "stream" (the default) the answer is sent as newline-delimited JSON: {"sources": [...]}, then {"token": str}
+            per token and {"done": true, "timings": {...}} at the end. The optional "history" holds the previous turns of the
+            conversation, the oldest first; the server keeps no session, the client sends its history with every prompt.
+        A request body larger than 1 MiB is rejected with 413.
+    Attributes:
+        llm (OllamaLLM): The shared language model with its vector store.
+        host (str): The host to listen on.
+        port (int): The port to listen on, 0 picks a free port.
+        max_concurrency (int): The maximum number of concurrent calls to Ollama.
+        history_budget (int): The maximum estimated number of tokens of the history of a prompt, 0 ignores the history.
+        verbose (bool): A flag to indicate if verbose output should be printed.
+        _executor (ThreadPoolExecutor): The thread pool running the blocking calls.
+        _slots (asyncio.Semaphore): The semaphore bounding the concurrent calls to Ollama.
+        _in_flight (int): The number of requests being processed.
+        _server (asyncio.AbstractServer): The running server, None before start().
+    Args:
+        llm (OllamaLLM): The shared language model with its vector store.
+        host (str): The host to listen on. Default is "127.0.0.1".
+        port (int): The port to listen on. Default is 8000.
+        max_concurrency (int): The maximum number of concurrent calls to Ollama. Default is 2.
+        history_budget (int): The maximum estimated number of tokens of the history of a prompt. Default is 1024.
+        verbose (bool): A flag to indicate if verbose output should be printed. Default is False.
+    Methods:
+        start() -> None: Starts listening.
+        serve_forever() -> None: Starts listening and serves until cancelled.
+        close() -> None: Stops listening and shuts the thread pool down.
+    """
+    def __init__(self,
+                 llm: OllamaLLM,
+                 host: str = "127.0.0.1",
+                 port: int = 8000,
+                 max_concurrency: int = 2,
+                 history_budget: int = 1024,
+                 verbose: bool = False) -> None:
+        self.llm = llm
+        self.host = host
+        self.port = port
+        self.max_concurrency = max_concurrency
+        self.history_budget = history_budget
+        self.verbose = verbose
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix="chat-server")
+        self._slots = None
+        self._in_flight = 0
+        self._server = None
+
+    async def start(self) -> None:
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+        self._executor.shutdown(wait=False)
+
+    async def _call(self, function: Callable, *args) -> Any:
+        async with self._slots:
+            return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._in_flight += 1
+        try:
+            method, path, body = await self._read_request(reader)
+            print(f"{method} {path}") if self.verbose else None
+            if path == "/health":
+                self._require_method(method, "GET")
+                await self._send_json(writer, 200, {
+                    "status": "ok",
+                    "in_flight": self._in_flight,
+                    "max_concurrency": self.max_concurrency,
+                })
+            elif path == "/retrieve":
+                self._require_method(method, "POST")
+                prompt, _, _ = self._parse_prompt(body)
+                documents = await self._call(self.llm.retrieve, prompt)
+                await self._send_json(writer, 200, {"sources": self._serialize_documents(documents)})
+            elif path == "/chat":
+                self._require_method(method, "POST")
+                prompt, stream, history = self._parse_prompt(body)
+                memory = self._memory(history)
+                if stream:
+                    await self._stream_chat(writer, prompt, memory)
+                else:
+                    answer, documents, timings = await self._call(self._talk, prompt, memory)
+                    await self._send_json(writer, 200, {
+                        "answer": answer,
+                        "sources": self._serialize_documents(documents),
+                        "timings": timings,
+                    })
+            else:
+                raise _HttpError(404, f"Unknown path {path}")
+        except _HttpError as error:
+            await self._send_json(writer, error.status, {"error": str(error)})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except Exception as error:
+            print(f"Request failed: {error!r}") if self.verbose else None
+            await self._send_json(writer, 500, {"error": str(error)})
+        finally:
+            self._in_flight -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def _read_request(self, reader: asyncio.StreamReader) -> Tuple[str, str, bytes]:
+        _request_line = (await reader.readline()).decode("latin-1").split()
+        if len(_request_line) != 3:
+            raise _HttpError(400, "Malformed request line")
+        method, target, _ = _request_line
+        headers: Dict[str, str] = {}
+        while True:
+            _line = await reader.readline()
+            if _line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = _line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        try:
+            _length = int(headers.get("content-length", "0"))
+        except ValueError:
+            raise _HttpError(400, "Invalid Content-Length")
+        if _length < 0:
+            raise _HttpError(400, "Invalid Content-Length")
+        if _length > _MAX_BODY_SIZE:
+            raise _HttpError(413, f"The body is larger than {_MAX_BODY_SIZE} bytes")
+        body = await reader.readexactly(_length)
+        return method.upper(), urlsplit(target).path, body
+
+    @staticmethod
+    def _require_method(method: str, expected: str) -> None:
+        if method != expected:
+            raise _HttpError(405, f"Use {expected}")
+
+    @staticmethod
+    def _parse_prompt(body: bytes) -> Tuple[str, bool, List[Tuple[str, str]]]:
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError:
+            raise _HttpError(400, "The body must be a JSON object")
+        if not isinstance(request, dict) or not isinstance(request.get("prompt"), str):
+            raise _HttpError(400, "The body must contain a 'prompt' string")
+        history = request.get("history") or []
+        if not isinstance(history, list) or not all(
+                isinstance(turn, list) and len(turn) == 2 and all(isinstance(text, str) for text in turn) for turn in history):
+            raise _HttpError(400, "The 'history' must be a list of [question, answer] strings")
+        return request["prompt"], bool(request.get("stream", True)), [(question, answer) for question, answer in history]
+
+    def _memory(self, history: List[Tuple[str, str]]) -> Optional[ConversationMemory]:
+        # a client trimming with the same budget sends a history which is not trimmed again
+        if not history or self.history_budget <= 0:
+            return None
+        memory = ConversationMemory(token_budget=self.history_budget)
+        for question, answer in history:
+            memory.add(question, answer)
+        return memory
+
+    @staticmethod
+    def _serialize_documents(documents: List[Document]) -> List[Dict[str, Any]]:
+        return [{"source": document.metadata.get("source"), "content": document.page_content} for document in documents]
+
+    def _talk(self, prompt: str, memory: Optional[ConversationMemory]) -> Tuple[str, List[Document], Dict[str, Any]]:
+        stream = self.llm.stream_talk(prompt, memory)
+        answer = "".join(stream)
+        # the timings are not set if the generation was aborted
+        return answer, stream.sources, stream.timings._asdict() if stream.timings is not None else None
+
+    async def _stream_chat(self, writer: asyncio.StreamWriter, prompt: str, memory: Optional[ConversationMemory]) -> None:
+        loop = asyncio.get_running_loop()
+        tokens: asyncio.Queue = asyncio.Queue()
+        cancelled = threading.Event()
+
+        def _produce() -> None:
+            # runs on the thread pool and hands the tokens over to the event loop
+            try:
+                stream = self.llm.stream_talk(prompt, memory)
+                loop.call_soon_threadsafe(tokens.put_nowait, {"sources": self._serialize_documents(stream.sources)})
+                for token in stream:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(tokens.put_nowait, {"token": token})
+                loop.call_soon_threadsafe(tokens.put_nowait, {
+                    "done": True,
+                    "timings": stream.timings._asdict() if stream.timings is not None else None,
+                })
+            except Exception as error:
+                loop.call_soon_threadsafe(tokens.put_nowait, {"error": str(error)})
+            finally:
+                loop.call_soon_threadsafe(tokens.put_nowait, _STREAM_END)
+
+        async with self._slots:
+            _producer = loop.run_in_executor(self._executor, _produce)
+            try:
+                writer.write(self._status_line(200) + (
+                    b"Content-Type: application/x-ndjson\r\n"
+                    b"Transfer-Encoding: chunked\r\n"
+                    b"Cache-Control: no-cache\r\n"
+                    b"Connection: close\r\n\r\n"))
+                try:
+                    while True:
+                        message = await tokens.get()
+                        if message is _STREAM_END:
+                            break
+                        self._write_chunk(writer, message)
+                        await writer.drain()
+                except ConnectionError:
+                    raise
+                except Exception as error:
+                    # the status line is already sent, the error can only end the stream
+                    print(f"Request failed: {error!r}") if self.verbose else None
+                    self._write_chunk(writer, {"error": str(error)})
+                writer.write(b"0\r\n\r\n")
+                await writer.drain()
+            finally:
+                cancelled.set()
+                await _producer
+
+    @staticmethod
+    def _write_chunk(writer: asyncio.StreamWriter, message: Dict[str, Any]) -> None:
+        _line = json.dumps(message).encode("utf-8") + b"\n"
+        writer.write(f"{len(_line):x}\r\n".encode("ascii") + _line + b"\r\n")
+
+    @staticmethod
+    def _status_line(status: int) -> bytes:
+        return f"HTTP/1.1 {status} {_REASONS.get(status, '')}\r\n".encode("latin-1")
+
+    async def _send_json(self, writer: asyncio.StreamWriter, status: int, payload: Optional[Dict[str, Any]]) -> None:
+        _body = json.dumps(payload).encode("utf-8")
+        try:
+            writer.write(self._status_line(status) + (
+                f"Content-Type: application/json\r\n"
+                f"Content-Length: {len(_body)}\r\n"
+                f"Connection: close\r\n\r\n").encode("latin-1") + _body)
+            await writer.drain()
+        except ConnectionError:
+            pass
@@ -0,0 +1,272 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from typing import Callable, Dict, Iterable, List, Optional
+from langchain_core.documents import Document
+from src.embeding_manager import EmbeddingManager, PreparedContent
+from src.file_manifest import FileManifest
+from src.index_version import IndexVersion
+from src.keyword_index import KeywordIndex
+
+
+class ShardedEmbeddingManager:
+    """
+    Spreads the files of a directory over several Chroma collections (shards) and routes every call of the
+    FilesProcessor to the EmbeddingManager of the shard of the file, so it can be used in place of a single
+    EmbeddingManager. The shards are kept small, so their HNSW indexes are rebuilt and their metadata is
+    scanned quickly, and every shard can be dropped (and so re-indexed by the next run) on its own.
+    Files are assigned by the top-level directory they are in ('directory', the files directly in the
+    directory share one shard) or by the hash of their relative path ('hash', into 'shard_count' shards).
+    The collection names of the shards and the sharding settings are stored in the registry
+    '<chroma_db_name>.shards.json', which the chat reads to query all shards. The shards share the keyword index,
+    the file manifest and the version marker of '<chroma_db_name>'.
+    Attributes:
+        directory (str): The analyzed directory, the shards are assigned by the paths relative to it.
+        shard_by (str): The sharding mode, 'directory' or 'hash'.
+        shard_count (int): The number of shards of the 'hash' mode.
+        chroma_db_name (str): The name of the whole collection, the prefix of the shard names.
+        chroma_db_path (str): The path to the Chroma database.
+        keyword_index (KeywordIndex): The keyword index shared by the shards.
+        index_version (IndexVersion): The version marker shared by the shards.
+        _embedding_factory (Callable[[str], EmbeddingManager]): Creates the EmbeddingManager of a shard from its collection name.
+        _shards (Dict[str, EmbeddingManager]): The EmbeddingManagers of the shards by their collection name.
+        _lock (threading.Lock): The lock guarding the creation of the shards and the registry. A shard is created and
+            registered when the first chunks of its files are added, the reads and the deletes skip unknown shards.
+    Args:
+        directory (str): The analyzed directory.
+        shard_by (str): The sharding mode, 'directory' or 'hash'.
+        shard_count (int): The number of shards of the 'hash' mode.
+        chroma_db_name (str): The name of the whole collection.
+        chroma_db_path (str): The path to the Chroma database.
+        embedding_factory (Callable[[str], EmbeddingManager]): Creates the EmbeddingManager of a shard, it should pass
+            the shared keyword index and version marker.
+        keyword_index (KeywordIndex): The keyword index shared by the shards. Default is None.
+        index_version (IndexVersion): The version marker shared by the shards. Default is the marker of 'chroma_db_name'.
+    Methods:
+        registry_path(chroma_db_path: str, chroma_db_name: str) -> str: Builds the path of the shard registry.
+        read_collections(chroma_db_path: str, chroma_db_name: str) -> Optional[List[str]]: Returns the shard collections of a sharded collection.
+        shard_of(file_path: str) -> str: Returns the collection name of the shard of the file.
+        shard_names() -> List[str]: Returns the collection names of all shards.
+        vectorstores: Property to access the vector stores of all shards.
+        drop_shard(name: str, manifest: FileManifest) -> int: Deletes a shard, its chunks in the keyword index and its files in the manifest.
+        The methods of EmbeddingManager used by the FilesProcessor, routed to the shard of the file.
+    """
+    def __init__(self,
+                 directory: str,
+                 shard_by: str,
+                 shard_count: int,
+                 chroma_db_name: str,
+                 chroma_db_path: str,
+                 embedding_factory: Callable[[str], EmbeddingManager],
+                 keyword_index: KeywordIndex = None,
+                 index_version: IndexVersion = None) -> None:
+        if shard_by not in ("directory", "hash"):
+            raise ValueError(f"Unknown sharding mode '{shard_by}'")
+        if shard_by == "hash" and shard_count < 1:
+            raise ValueError(f"The 'hash' sharding needs at least 1 shard, got {shard_count}")
+        self.directory = directory
+        self.shard_by = shard_by
+        self.shard_count = shard_count
+        self.chroma_db_name = chroma_db_name
+        self.chroma_db_path = chroma_db_path
+        self.keyword_index = keyword_index
+        self.index_version = index_version if index_version is not None else IndexVersion(IndexVersion.default_path(chroma_db_path, chroma_db_name))
+        self._embedding_factory = embedding_factory
+        self._lock = threading.Lock()
+
+        _registry = self._read_registry(chroma_db_path, chroma_db_name)
+        if _registry is not None and _registry["collections"] and (
+                _registry["shard_by"] != shard_by or (shard_by == "hash" and _registry["shard_count"] != shard_count)):
+            _describe = lambda mode, count: f"'{mode}' ({count} shards)" if mode == "hash" else f"'{mode}'"
+            raise ValueError(
+                f"The collection '{chroma_db_name}' is sharded by {_describe(_registry['shard_by'], _registry['shard_count'])}, "
+                f"drop its shards (--drop-shards) before sharding it by {_describe(shard_by, shard_count)}")
+        # the manifest is shared, so the files of an unsharded collection would be skipped and never reach the shards
+        if not (_registry and _registry["collections"]) and embedding_factory(chroma_db_name).count_stored_chunks() > 0:
+            raise ValueError(f"The collection '{chroma_db_name}' is not sharded, delete it before sharding it")
+        self._shards: Dict[str, EmbeddingManager] = {
+            name: embedding_factory(name) for name in (_registry["collections"] if _registry is not None else [])
+        }
+
+    @staticmethod
+    def registry_path(chroma_db_path: str, chroma_db_name: str) -> str:
+        return os.path.join(chroma_db_path, f"{chroma_db_name}.shards.json")
+
+    @staticmethod
+    def _read_registry(chroma_db_path: str, chroma_db_name: str) -> Optional[Dict]:
+        try:
+            with open(ShardedEmbeddingManager.registry_path(chroma_db_path, chroma_db_name), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def read_collections(chroma_db_path: str, chroma_db_name: str) -> Optional[List[str]]:
+        """
+        Returns the collection names of the shards of a sharded collection.
+        Args:
+            chroma_db_path (str): The path to the Chroma database.
+            chroma_db_name (str): The name of the whole collection.
+        Returns:
+            Optional[List[str]]: The collection names of the shards, None if the collection is not sharded.
+        """
+        _registry = ShardedEmbeddingManager._read_registry(chroma_db_path, chroma_db_name)
+        return list(_registry["collections"]) if _registry is not None else None
+
+    def _write_registry(self) -> None:
+        _path = self.registry_path(self.chroma_db_path, self.chroma_db_name)
+        os.makedirs(os.path.dirname(_path) or ".", exist_ok=True)
+        _temporary_path = f"{_path}.{os.getpid()}.tmp"
+        with open(_temporary_path, "w", encoding="utf-8") as f:
+            json.dump({"shard_by": self.shard_by, "shard_count": self.shard_count, "collections": sorted(self._shards)}, f, indent=2)
+        os.replace(_temporary_path, _path)
+
+    def _collection_name(self, key: str) -> str:
+        # Chroma allows [a-zA-Z0-9._-] only, a hash keeps the names of directories with other characters apart
+        _name = re.sub(r"[^A-Za-z0-9_-]", "-", key)[:48]
+        if _name != key:
+            _name = f"{_name}-{hashlib.sha256(key.encode('utf-8')).hexdigest()[:8]}"
+        return f"{self.chroma_db_name}_{_name}"
+
+    def shard_of(self, file_path: str) -> str:
+        """
+        Returns the collection name of the shard of the file.
+        Args:
+            file_path (str): The path of the file.
+        Returns:
+            str: The collection name of the shard.
+        """
+        _relative_path = os.path.relpath(file_path, self.directory).replace(os.sep, "/")
+        if self.shard_by == "directory":
+            _top, _separator, _ = _relative_path.partition("/")
+            return self._collection_name(_top if _separator else ".")
+        _hash = int(hashlib.sha256(_relative_path.encode("utf-8")).hexdigest()[:8], 16)
+        return self._collection_name(f"h{_hash % self.shard_count:03d}")
+
+    def shard_names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._shards)
+
+    @property
+    def vectorstores(self):
+        return [shard.vectorstore for shard in self._existing_shards()]
+
+    def _find_shard(self, file_path: str) -> Optional[EmbeddingManager]:
+        # the reads and the deletes do not create a shard, a file of an unknown shard has no chunks
+        _name = self.shard_of(file_path)
+        with self._lock:
+            return self._shards.get(_name)
+
+    def _find_or_create_shard(self, file_path: str) -> EmbeddingManager:
+        _name = self.shard_of(file_path)
+        with self._lock:
+            _shard = self._shards.get(_name)
+            if _shard is None:
+                _shard = self._shards[_name] = self._embedding_factory(_name)
+                self._write_registry()
+        return _shard
+
+    def _existing_shards(self) -> List[EmbeddingManager]:
+        with self._lock:
+            return list(self._shards.values())
+
+    def get_stored_checksums(self, page_size: int = 5000) -> Dict[str, str]:
+        _checksums: Dict[str, str] = {}
+        for shard in self._existing_shards():
+            _checksums.update(shard.get_stored_checksums(page_size))
+        return _checksums
+
+    def get_list_of_stored_files(self) -> List[str]:
+        return list(self.get_stored_checksums().keys())
+
+    def find_documents_in_vectorstore(self, document_path: str) -> List[Document]:
+        _shard = self._find_shard(document_path)
+        return _shard.find_documents_in_vectorstore(document_path) if _shard is not None else []
+
+    def _delete_documents_by_path(self, document_path: str) -> None:
+        self._delete_documents_by_paths([document_path])
+
+    def _delete_documents_by_paths(self, document_paths: Iterable[str], batch_size: int = 500) -> int:
+        _paths_by_shard: Dict[str, List[str]] = {}
+        for document_path in document_paths:
+            _paths_by_shard.setdefault(self.shard_of(document_path), []).append(document_path)
+        _shards = [(self._find_shard(paths[0]), paths) for paths in _paths_by_shard.values()]
+        return sum(shard._delete_documents_by_paths(paths, batch_size) for shard, paths in _shards if shard is not None)
+
+    def prepare_content_from_path(self, file_path: str, checksum: str, reload: bool, stored_checksums: Dict[str, str] = None) -> Optional[PreparedContent]:
+        _shard = self._find_shard(file_path)
+        if _shard is None:
+            # nothing is stored for the file, the shard is created when its chunks are added
+            return self._embedding_factory(self.shard_of(file_path)).prepare_content_from_path(file_path, checksum, reload, {})
+        return _shard.prepare_content_from_path(file_path, checksum, reload, stored_checksums)
+
+    def stream_content_from_path(self, file_path: str, checksum: str, reload: bool, stored_checksums: Dict[str, str] = None,
+                                 batch_size: int = 64, window_size: int = 1024 * 1024) -> Optional[int]:
+        return self._find_or_create_shard(file_path).stream_content_from_path(file_path, checksum, reload, stored_checksums, batch_size, window_size)
+
+    def update_stored_chunks(self, prepared: PreparedContent):
+        _shard = self._find_shard(prepared.file_path)
+        return _shard.update_stored_chunks(prepared) if _shard is not None else (prepared.splits, prepared.ids, [])
+
+    def update_chunks_checksum(self, prepared: PreparedContent, kept_ids: List[str]) -> None:
+        _shard = self._find_shard(prepared.file_path)
+        _shard.update_chunks_checksum(prepared, kept_ids) if _shard is not None else None
+
+    def add_documents(self, documents: List[Document], ids: List[str] = None) -> List[str]:
+        """
+        Adds the documents to the shards of their sources, one bulk call per shard.
+        Args:
+            documents (List[Document]): The documents to add, every document needs the 'source' metadata.
+            ids (List[str]): The optional IDs of the documents.
+        Returns:
+            List[str]: The IDs of the documents, in the order of the documents.
+        """
+        _ids = list(ids) if ids is not None else [None] * len(documents)
+        _indexes_by_shard: Dict[str, List[int]] = {}
+        for index, document in enumerate(documents):
+            _indexes_by_shard.setdefault(self.shard_of(document.metadata["source"]), []).append(index)
+        for indexes in _indexes_by_shard.values():
+            _added = self._find_or_create_shard(documents[indexes[0]].metadata["source"]).add_documents(
+                [documents[index] for index in indexes],
+                [_ids[index] for index in indexes] if ids is not None else None)
+            for index, added_id in zip(indexes, _added):
+                _ids[index] = added_id
+        return _ids
+
+    def load_content_from_path(self, file_path: str, checksum: str, reload: bool, stored_checksums: Dict[str, str] = None) -> List[str]:
+        return self._find_or_create_shard(file_path).load_content_from_path(file_path, checksum, reload, stored_checksums)
+
+    def sync_keyword_index(self, page_size: int = 5000) -> int:
+        # the shards share the keyword index, so it is filled from all of them or from none
+        if self.keyword_index is None or self.keyword_index.count() > 0:
+            return 0
+        return sum(shard._fill_keyword_index(page_size) for shard in self._existing_shards())
+
+    def drop_shard(self, name: str, manifest: FileManifest = None) -> int:
+        """
+        Deletes the collection of a shard with its chunks in the keyword index and its files in the manifest,
+        so the next run indexes the files of the shard again.
+        Args:
+            name (str): The collection name of the shard.
+            manifest (FileManifest): The file manifest of the collection. Default is None.
+        Returns:
+            int: The number of files of the shard.
+        """
+        with self._lock:
+            _shard = self._shards.pop(name, None)
+            if _shard is None:
+                raise ValueError(f"The collection '{self.chroma_db_name}' has no shard '{name}', its shards are: {', '.join(sorted(self._shards))}")
+            self._write_registry()
+        _paths = set(_shard.get_list_of_stored_files())
+        if manifest is not None:
+            _paths.update(path for path in manifest.paths() if self.shard_of(path) == name)
+            for path in _paths:
+                manifest.remove(path)
+            manifest.commit()
+        if self.keyword_index is not None:
+            self.keyword_index.delete_sources(_paths)
+        _shard.vectorstore.delete_collection()
+        self.index_version.bump()
+        return len(_paths)
@@ -0,0 +1,26 @@
+from typing import List
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.retrievers import BaseRetriever
+from pydantic import ConfigDict
+from src.vector_snapshot import VectorSnapshot
+
+
+class SnapshotRetriever(BaseRetriever):
+    """
+    Retrieves the documents closest to the query from a VectorSnapshot, the read-only replacement of the
+    Chroma collection for chat replicas. The distance is the squared L2 distance, like in the Chroma collections.
+    Attributes:
+        snapshot (VectorSnapshot): The snapshot to search.
+        embeddings (Embeddings): The embeddings model the snapshot was built with.
+        k (int): The number of documents to return.
+    """
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    snapshot: VectorSnapshot
+    embeddings: Embeddings
+    k: int = 4
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return [self.snapshot.document(row) for row, _ in self.snapshot.search(self.embeddings.embed_query(query), self.k)]
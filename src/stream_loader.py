@@ -0,0 +1,79 @@
+import codecs
+from typing import Iterator, List
+
+
+class StreamingTextLoader:
+    """
+    Reads a text file in windows and splits it lazily, so the memory needed for a file does not depend on its size.
+    Every window is appended to the text left over from the previous one and split with the same
+    RecursiveCharacterTextSplitter as small files are. All chunks but the last one are yielded; the last
+    chunk may be cut by the window boundary, so the text from its start is carried over to the next window.
+    The carried chunk already overlaps with the chunk before it, so the overlap is kept across the windows.
+    Attributes:
+        file_path (str): The path to the file.
+        chunk_size (int): The maximum size of a chunk in characters.
+        chunk_overlap (int): The overlap of neighbouring chunks in characters.
+        window_size (int): The number of characters read at once, at least 16 chunks.
+    Args:
+        file_path (str): The path to the file.
+        chunk_size (int): The maximum size of a chunk in characters. Default is 1000.
+        chunk_overlap (int): The overlap of neighbouring chunks in characters. Default is 200.
+        window_size (int): The number of characters read at once. Default is 1 MiB.
+    Methods:
+        detect_encoding() -> str: Detects the encoding from the beginning of the file.
+        lazy_split() -> Iterator[str]: Yields the chunks of the file one by one.
+    """
+    _SAMPLE_SIZE = 1024 * 1024
+
+    def __init__(self, file_path: str, chunk_size: int = 1000, chunk_overlap: int = 200, window_size: int = 1024 * 1024) -> None:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+        self.file_path = file_path
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.window_size = max(window_size, chunk_size * 16)
+        self._splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+    def detect_encoding(self) -> str:
+        """
+        Detects the encoding like TextLoader(autodetect_encoding=True) does, but from a sample of the file:
+        UTF-8 if the sample decodes, otherwise the best guess of the optional 'chardet' package (latin-1 without it).
+        Returns:
+            str: The name of the encoding.
+        """
+        with open(self.file_path, "rb") as f:
+            _sample = f.read(self._SAMPLE_SIZE)
+        try:
+            # the sample may end in the middle of a character, so it is decoded incrementally
+            codecs.getincrementaldecoder("utf-8")().decode(_sample, final=False)
+            return "utf-8"
+        except UnicodeDecodeError:
+            pass
+        try:
+            import chardet
+        except ImportError:
+            # every byte is a valid latin-1 character, so nothing is lost without a better guess
+            return "latin-1"
+        return chardet.detect(_sample).get("encoding") or "latin-1"
+
+    def lazy_split(self) -> Iterator[str]:
+        """
+        Yields the chunks of the file one by one. Characters which cannot be decoded are replaced,
+        so a single bad byte deep in a large file does not fail the whole file.
+        Yields:
+            str: The next chunk of the file.
+        """
+        _carry = ""
+        with open(self.file_path, "r", encoding=self.detect_encoding(), errors="replace") as f:
+            while True:
+                _window = f.read(self.window_size)
+                if not _window:
+                    break
+                _text = _carry + _window
+                _chunks: List[str] = self._splitter.split_text(_text)
+                if len(_chunks) < 2:
+                    _carry = _text
+                    continue
+                yield from _chunks[:-1]
+                _carry = _text[_text.rfind(_chunks[-1]):]
+        if _carry:
+            yield from self._splitter.split_text(_carry)
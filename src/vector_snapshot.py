@@ -0,0 +1,280 @@
+import json
+import os
+import shutil
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.documents import Document
+from src.keyword_index import KeywordIndex
+
+if TYPE_CHECKING:
+    from langchain_chroma import Chroma
+
+
+SNAPSHOT_DTYPES = ["float32", "int8"]
+_FORMAT_VERSION = 1
+
+
+class VectorSnapshot:
+    """
+    A read-only snapshot of a collection for the chat: the vectors, the IDs, the sources and the texts of the chunks
+    in flat NumPy files which are memory mapped, so opening a snapshot reads nothing but its manifest and processes
+    serving the same snapshot share its pages through the OS cache.
+        vectors.npy       (N, D) float32, or int8 with a float32 scale per row in scales.npy
+        norms.npy         (N,) float32 squared norms of the original vectors
+        ids.npy           (N,) fixed-width bytes of the chunk IDs, sorted_ids.npy and sorted_rows.npy look them up
+        sources.npy       (N,) int32 index into sources.json
+        texts.bin         the UTF-8 texts of the chunks, text_offsets.npy (N + 1,) int64 delimits them
+        keywords.sqlite3  a copy of the keyword index, if the collection has one
+        manifest.json     the format, the dtype, the shape and the index version of the exported collection
+    The search is an exact brute-force search: the squared L2 distance (the distance of the Chroma collections)
+    is computed with one matrix-vector product per block of rows and the best 'k' rows of every block are merged.
+    The int8 snapshot stores every row scaled to [-127, 127], a quarter of the size of float32, at the cost of a
+    slightly less precise distance; the squared norms are kept exact.
+    Attributes:
+        path (str): The path to the snapshot directory.
+        manifest (dict): The content of manifest.json.
+        block_bytes (int): The size of the block of vectors multiplied at once.
+        _vectors (np.memmap): The vectors.
+        _scales (np.memmap): The scales of the int8 rows, None for float32.
+        _norms (np.memmap): The squared norms of the rows.
+        _ids (np.memmap): The chunk IDs.
+        _sorted_ids (np.memmap): The chunk IDs in sorted order.
+        _sorted_rows (np.memmap): The rows of the sorted chunk IDs.
+        _source_index (np.memmap): The index of the source of every row.
+        _sources (List[str]): The sources.
+        _text_offsets (np.memmap): The offsets of the texts.
+        _texts (np.memmap): The UTF-8 texts.
+    Args:
+        path (str): The path to the snapshot directory.
+        block_bytes (int): The size of the block of vectors multiplied at once. Default is 16 MiB.
+    Methods:
+        export(vectorstores: Sequence[Chroma], path: str, dtype: str, index_version: str, keyword_index: KeywordIndex, page_size: int) -> bool: Writes a snapshot.
+        read_manifest(path: str) -> Optional[dict]: Returns the manifest of a snapshot, None if there is none.
+        is_current(path: str, dtype: str, index_version: str) -> bool: Checks whether the snapshot is of the index version and dtype.
+        count() -> int: Returns the number of chunks.
+        search(query: Sequence[float], k: int) -> List[Tuple[int, float]]: Returns the rows closest to the query.
+        document(row: int) -> Document: Returns the chunk of a row.
+        vectors_by_ids(ids: Sequence[str]) -> Dict[str, np.ndarray]: Returns the vectors of chunks by their ID.
+        keyword_index_path() -> Optional[str]: Returns the path of the keyword index copy.
+    """
+    def __init__(self, path: str, block_bytes: int = 16 * 1024 * 1024) -> None:
+        self.path = path
+        self.block_bytes = block_bytes
+        self.manifest = self.read_manifest(path)
+        if self.manifest is None:
+            raise FileNotFoundError(f"No vector snapshot in '{path}', export one with the embedding processor (--export-snapshot)")
+        if self.manifest["format_version"] != _FORMAT_VERSION:
+            raise ValueError(f"The vector snapshot in '{path}' has the format {self.manifest['format_version']}, expected {_FORMAT_VERSION}")
+        _load = lambda name: np.load(os.path.join(path, name), mmap_mode="r")
+        self._vectors = _load("vectors.npy")
+        self._scales = _load("scales.npy") if self.manifest["dtype"] == "int8" else None
+        self._norms = _load("norms.npy")
+        self._ids = _load("ids.npy")
+        self._sorted_ids = _load("sorted_ids.npy")
+        self._sorted_rows = _load("sorted_rows.npy")
+        self._source_index = _load("sources.npy")
+        with open(os.path.join(path, "sources.json"), "r", encoding="utf-8") as f:
+            self._sources: List[str] = json.load(f)
+        self._text_offsets = _load("text_offsets.npy")
+        # np.memmap cannot map an empty file
+        self._texts = np.memmap(os.path.join(path, "texts.bin"), dtype=np.uint8, mode="r") \
+            if self._text_offsets[-1] > 0 else np.zeros(0, dtype=np.uint8)
+
+    @staticmethod
+    def read_manifest(path: str) -> Optional[dict]:
+        try:
+            with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def is_current(path: str, dtype: str, index_version: str) -> bool:
+        _existing = VectorSnapshot.read_manifest(path)
+        return bool(index_version) and _existing is not None and _existing.get("format_version") == _FORMAT_VERSION \
+            and _existing.get("index_version") == index_version and _existing.get("dtype") == dtype
+
+    @staticmethod
+    def export(vectorstores: Sequence["Chroma"],
+               path: str,
+               dtype: str = "float32",
+               index_version: str = "",
+               keyword_index: KeywordIndex = None,
+               page_size: int = 5000) -> bool:
+        """
+        Writes a snapshot of the collections (e.g. all shards of a sharded collection) into one directory.
+        The snapshot is written next to the target and replaces it at once, so readers never see a partial snapshot
+        and processes which have the old snapshot open keep reading it. Nothing is written if the target is a snapshot
+        of the same index version and dtype.
+        Args:
+            vectorstores (Sequence[Chroma]): The collections to export.
+            path (str): The path to the snapshot directory.
+            dtype (str): The type of the stored vectors, 'float32' or 'int8'. Default is 'float32'.
+            index_version (str): The version of the collection, used to skip exports of an unchanged collection. Default is "".
+            keyword_index (KeywordIndex): The keyword index to copy into the snapshot. Default is None.
+            page_size (int): The number of chunks read from a collection at once. Default is 5000.
+        Returns:
+            bool: True if a snapshot was written, False if the existing one is up to date.
+        """
+        if dtype not in SNAPSHOT_DTYPES:
+            raise ValueError(f"Unknown snapshot dtype '{dtype}', use one of {', '.join(SNAPSHOT_DTYPES)}")
+        if VectorSnapshot.is_current(path, dtype, index_version):
+            return False
+
+        _temporary_path = f"{path.rstrip(os.sep)}.{os.getpid()}.tmp"
+        shutil.rmtree(_temporary_path, ignore_errors=True)
+        os.makedirs(_temporary_path)
+        _count = sum(vectorstore._collection.count() for vectorstore in vectorstores)
+
+        _vectors = None
+        _scales = np.zeros(_count, dtype=np.float32)
+        _norms = np.zeros(_count, dtype=np.float32)
+        _source_index = np.zeros(_count, dtype=np.int32)
+        _text_offsets = np.zeros(_count + 1, dtype=np.int64)
+        _ids: List[str] = []
+        _sources: Dict[str, int] = {}
+        _row = 0
+        with open(os.path.join(_temporary_path, "texts.bin"), "wb") as texts:
+            for vectorstore in vectorstores:
+                _offset = 0
+                while _row < _count:
+                    _page = vectorstore._collection.get(
+                        include=["embeddings", "documents", "metadatas"], limit=page_size, offset=_offset)
+                    if not _page["ids"]:
+                        break
+                    _offset += len(_page["ids"])
+                    _page_vectors = np.asarray(_page["embeddings"], dtype=np.float32)
+                    # a collection may grow while it is exported, the rows counted at the start are exported
+                    _size = min(len(_page["ids"]), _count - _row)
+                    _page_vectors = _page_vectors[:_size]
+                    if _vectors is None:
+                        _vectors = np.lib.format.open_memmap(
+                            os.path.join(_temporary_path, "vectors.npy"), mode="w+", dtype=dtype, shape=(_count, _page_vectors.shape[1]))
+                    _norms[_row:_row + _size] = np.einsum("ij,ij->i", _page_vectors, _page_vectors)
+                    if dtype == "int8":
+                        _page_scales = np.abs(_page_vectors).max(axis=1) / 127.0
+                        _page_scales[_page_scales == 0] = 1.0
+                        _scales[_row:_row + _size] = _page_scales
+                        _vectors[_row:_row + _size] = np.rint(_page_vectors / _page_scales[:, None]).astype(np.int8)
+                    else:
+                        _vectors[_row:_row + _size] = _page_vectors
+                    for index in range(_size):
+                        _ids.append(_page["ids"][index])
+                        _source = (_page["metadatas"][index] or {}).get("source", "")
+                        _source_index[_row + index] = _sources.setdefault(_source, len(_sources))
+                        _text = (_page["documents"][index] or "").encode("utf-8")
+                        texts.write(_text)
+                        _text_offsets[_row + index + 1] = _text_offsets[_row + index] + len(_text)
+                    _row += _size
+
+        _dimension = 0 if _vectors is None else int(_vectors.shape[1])
+        if _vectors is None:
+            np.save(os.path.join(_temporary_path, "vectors.npy"), np.zeros((0, 0), dtype=dtype))
+        else:
+            _vectors.flush()
+            del _vectors
+        _id_array = np.array([chunk_id.encode("utf-8") for chunk_id in _ids]) if _ids else np.zeros(0, dtype="S1")
+        _order = np.argsort(_id_array, kind="stable")
+        for name, array in (("norms.npy", _norms[:_row]), ("ids.npy", _id_array), ("sorted_ids.npy", _id_array[_order]),
+                            ("sorted_rows.npy", _order.astype(np.int64)), ("sources.npy", _source_index[:_row]),
+                            ("text_offsets.npy", _text_offsets[:_row + 1])):
+            np.save(os.path.join(_temporary_path, name), array)
+        if dtype == "int8":
+            np.save(os.path.join(_temporary_path, "scales.npy"), _scales[:_row])
+        with open(os.path.join(_temporary_path, "sources.json"), "w", encoding="utf-8") as f:
+            json.dump(list(_sources), f)
+        if keyword_index is not None:
+            keyword_index.backup(os.path.join(_temporary_path, "keywords.sqlite3"))
+        with open(os.path.join(_temporary_path, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                "format_version": _FORMAT_VERSION,
+                "dtype": dtype,
+                "count": _row,
+                "dimension": _dimension,
+                "index_version": index_version,
+                "collections": [vectorstore._collection.name for vectorstore in vectorstores],
+            }, f, indent=2)
+
+        # a directory cannot be replaced in one step, the old one is moved aside first
+        _old_path = f"{path.rstrip(os.sep)}.{os.getpid()}.old"
+        if os.path.exists(path):
+            os.replace(path, _old_path)
+        os.replace(_temporary_path, path)
+        shutil.rmtree(_old_path, ignore_errors=True)
+        return True
+
+    def count(self) -> int:
+        return int(self._norms.shape[0])
+
+    def keyword_index_path(self) -> Optional[str]:
+        _path = os.path.join(self.path, "keywords.sqlite3")
+        return _path if os.path.exists(_path) else None
+
+    def search(self, query: Sequence[float], k: int = 4) -> List[Tuple[int, float]]:
+        """
+        Returns the rows closest to the query.
+        Args:
+            query (Sequence[float]): The embedding of the query.
+            k (int): The number of rows to return. Default is 4.
+        Returns:
+            List[Tuple[int, float]]: The rows and their squared L2 distance to the query, the closest first.
+        """
+        _count = self.count()
+        if _count == 0 or k <= 0:
+            return []
+        _query = np.asarray(query, dtype=np.float32)
+        _query_norm = float(np.dot(_query, _query))
+        _block_rows = max(1, self.block_bytes // (self._vectors.shape[1] * self._vectors.dtype.itemsize))
+        _best_rows: List[np.ndarray] = []
+        _best_distances: List[np.ndarray] = []
+        for start in range(0, _count, _block_rows):
+            _block = self._vectors[start:start + _block_rows]
+            _products = (_block.astype(np.float32) if self._scales is not None else _block) @ _query
+            if self._scales is not None:
+                _products *= self._scales[start:start + _block_rows]
+            # |x - q|^2 = |x|^2 - 2 x.q + |q|^2
+            _distances = self._norms[start:start + _block_rows] - 2.0 * _products + _query_norm
+            if len(_distances) > k:
+                _top = np.argpartition(_distances, k)[:k]
+                _best_rows.append(_top + start)
+                _best_distances.append(_distances[_top])
+            else:
+                _best_rows.append(np.arange(start, start + len(_distances)))
+                _best_distances.append(_distances)
+        _rows = np.concatenate(_best_rows)
+        _distances = np.concatenate(_best_distances)
+        _order = np.argsort(_distances, kind="stable")[:k]
+        return [(int(_rows[index]), max(0.0, float(_distances[index]))) for index in _order]
+
+    def _text(self, row: int) -> str:
+        return bytes(self._texts[self._text_offsets[row]:self._text_offsets[row + 1]]).decode("utf-8")
+
+    def document(self, row: int) -> Document:
+        return Document(
+            id=self._ids[row].decode("utf-8"),
+            page_content=self._text(row),
+            metadata={"source": self._sources[self._source_index[row]]})
+
+    def _row_of(self, chunk_id: str) -> Optional[int]:
+        _key = chunk_id.encode("utf-8")
+        _position = int(np.searchsorted(self._sorted_ids, _key))
+        if _position < len(self._sorted_ids) and self._sorted_ids[_position] == _key:
+            return int(self._sorted_rows[_position])
+        return None
+
+    def vectors_by_ids(self, ids: Sequence[str]) -> Dict[str, np.ndarray]:
+        """
+        Returns the vectors of the chunks, the int8 rows are scaled back.
+        Args:
+            ids (Sequence[str]): The chunk IDs.
+        Returns:
+            Dict[str, np.ndarray]: The vectors by the chunk ID, chunks missing in the snapshot are left out.
+        """
+        _vectors = {}
+        for chunk_id in ids:
+            _row = self._row_of(chunk_id)
+            if _row is None:
+                continue
+            _vector = np.asarray(self._vectors[_row], dtype=np.float32)
+            _vectors[chunk_id] = _vector * self._scales[_row] if self._scales is not None else _vector
+        return _vectors
@@ -0,0 +1,28 @@
+import pytest
+from src.arguments.chat import RunArguments as ChatArguments
+from src.arguments.serve import RunArguments as ServeArguments
+
+
+def _options(arguments):
+    return {option for action in arguments.parser._actions for option in action.option_strings}
+
+
+def test_chat_and_serve_share_the_llm_arguments():
+    shared = {"--semantic-cache-distance", "--retrieval", "--context-budget", "--snapshot", "--keep-alive"}
+    assert shared <= _options(ChatArguments()) & _options(ServeArguments())
+
+
+def test_serve_passes_the_semantic_cache_distance():
+    assert ServeArguments().parse(["--semantic-cache-distance", "0.05"]).semantic_cache_distance == 0.05
+
+
+def test_serve_rejects_no_concurrency():
+    with pytest.raises(SystemExit):
+        ServeArguments().parse(["--max-concurrency", "0"])
+
+
+@pytest.mark.parametrize("option", ["--batch-concurrency", "--retrieval-workers"])
+def test_chat_rejects_no_batch_workers(option, monkeypatch):
+    monkeypatch.setattr("sys.argv", ["chat.py", "--batch", "in.jsonl", "--out", "out.jsonl", option, "0"])
+    with pytest.raises(SystemExit):
+        ChatArguments().parse()
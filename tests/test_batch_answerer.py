@@ -0,0 +1,84 @@
+import json
+from types import SimpleNamespace
+import pytest
+from langchain_core.documents import Document
+from src.LLM import TalkTimings
+from src.batch_answerer import BatchAnswerer
+
+
+class _FakeLLM:
+    def __init__(self):
+        self.questions = []
+
+    def prefetch_embeddings(self, questions):
+        pass
+
+    def prepare_answer(self, question):
+        self.questions.append(question)
+        return SimpleNamespace(human_prompt=question, sources=[Document(page_content="text", metadata={"source": "a.md"})])
+
+    def generate_answer(self, prepared):
+        return f"answer to {prepared.human_prompt}", TalkTimings(0.1, 0.0, 0.2)
+
+
+def _write_lines(path, lines):
+    path.write_text("".join(f"{line}\n" for line in lines), encoding="utf-8")
+
+
+def test_a_question_is_a_string_or_an_object_and_defaults_to_its_line_number(tmp_path):
+    _write_lines(tmp_path / "in.jsonl", ['"first"', '', '{"id": "x", "question": "second"}'])
+    assert BatchAnswerer.read_questions(str(tmp_path / "in.jsonl")) == [
+        {"question": "first", "id": 1}, {"id": "x", "question": "second"}]
+
+
+def test_an_id_used_twice_is_rejected(tmp_path):
+    _write_lines(tmp_path / "in.jsonl", ['{"id": 1, "question": "a"}', '{"id": 1, "question": "b"}'])
+    with pytest.raises(ValueError, match="used twice"):
+        BatchAnswerer.read_questions(str(tmp_path / "in.jsonl"))
+
+
+def test_ids_of_another_type_do_not_clash(tmp_path):
+    _write_lines(tmp_path / "in.jsonl", ['{"id": 1, "question": "a"}', '{"id": "1", "question": "b"}'])
+    assert len(BatchAnswerer.read_questions(str(tmp_path / "in.jsonl"))) == 2
+
+
+def test_a_cut_last_line_is_removed(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_bytes(b'{"id": 1, "answer": "a"}\n{"id": 2, "ans')
+    assert BatchAnswerer(_FakeLLM())._read_answered(str(output)) == {"1"}
+    assert output.read_bytes() == b'{"id": 1, "answer": "a"}\n'
+
+
+def test_a_complete_last_line_gets_its_line_end(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_bytes(b'{"id": 1, "answer": "a"}')
+    assert BatchAnswerer(_FakeLLM())._read_answered(str(output)) == {"1"}
+    assert output.read_bytes() == b'{"id": 1, "answer": "a"}\n'
+
+
+def test_a_broken_line_in_the_middle_is_an_error(tmp_path):
+    output = tmp_path / "out.jsonl"
+    output.write_bytes(b'not json\n{"id": 1, "answer": "a"}\n')
+    with pytest.raises(ValueError, match="byte 0"):
+        BatchAnswerer(_FakeLLM())._read_answered(str(output))
+
+
+def test_a_resumed_run_answers_only_the_missing_questions(tmp_path):
+    _write_lines(tmp_path / "in.jsonl", ['"q1"', '"q2"', '"q3"'])
+    output = tmp_path / "out.jsonl"
+    output.write_bytes(b'{"id": 1, "question": "q1", "answer": "old"}\n{"id": 2, "quest')
+    llm = _FakeLLM()
+
+    report = BatchAnswerer(llm, embed_batch_size=1).run(str(tmp_path / "in.jsonl"), str(output))
+
+    assert llm.questions == ["q2", "q3"]
+    assert (report.questions, report.answered, report.resumed, report.failed) == (3, 2, 1, 0)
+    answers = [json.loads(line) for line in output.read_text(encoding="utf-8").splitlines()]
+    assert [(answer["id"], answer["answer"]) for answer in answers] == [(1, "old"), (2, "answer to q2"), (3, "answer to q3")]
+    assert answers[1]["sources"] == ["a.md"]
+
+
+@pytest.mark.parametrize("kwargs", [{"max_concurrency": 0}, {"retrieval_workers": 0}, {"embed_batch_size": 0}])
+def test_no_worker_is_rejected(kwargs):
+    with pytest.raises(ValueError):
+        BatchAnswerer(_FakeLLM(), **kwargs)
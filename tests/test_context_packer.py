@@ -0,0 +1,53 @@
+from langchain_core.documents import Document
+from src.context_packer import ContextPacker
+
+
+def _document(id, text, source="a.md"):
+    return Document(id=id, page_content=text, metadata={"source": source})
+
+
+def _texts(documents):
+    return [document.page_content for document in documents]
+
+
+def test_a_chunk_contained_in_a_better_one_is_dropped():
+    packed = ContextPacker().pack([_document("1", "the whole sentence of the chunk"), _document("2", "sentence of", "b.md")], k=4)
+    assert [document.id for document in packed] == ["1"]
+
+
+def test_adjacent_chunks_of_a_file_are_merged_without_the_overlap():
+    overlap = "shared overlap of the two chunks"
+    packed = ContextPacker(min_overlap=10).pack([
+        _document("2", overlap + " and the end"),
+        _document("1", "the start and the " + overlap)], k=4)
+    assert _texts(packed) == ["the start and the " + overlap + " and the end"]
+    assert packed[0].id == "2"
+
+
+def test_chunks_of_other_files_are_not_merged():
+    overlap = "shared overlap of the two chunks"
+    packed = ContextPacker(min_overlap=10).pack([_document("1", "start " + overlap), _document("2", overlap + " end", "b.md")], k=4)
+    assert len(packed) == 2
+
+
+def test_mmr_moves_a_redundant_chunk_down():
+    documents = [_document("1", "first chunk"), _document("2", "second chunk"), _document("3", "third chunk")]
+    embeddings = {"1": [1.0, 0.0], "2": [1.0, 0.01], "3": [0.0, 1.0]}
+    assert [document.id for document in ContextPacker(lambda_mult=0.5).pack(documents, k=3, embeddings=embeddings)] == ["1", "3", "2"]
+    assert [document.id for document in ContextPacker(lambda_mult=1.0).pack(documents, k=3, embeddings=embeddings)] == ["1", "2", "3"]
+
+
+def test_the_budget_skips_a_large_chunk_for_a_smaller_one():
+    documents = [_document("1", "a" * 40), _document("2", "b" * 400), _document("3", "c" * 40)]
+    packed = ContextPacker(token_budget=25, chars_per_token=4.0).pack(documents, k=4)
+    assert [document.id for document in packed] == ["1", "3"]
+
+
+def test_the_best_chunk_over_the_budget_is_cut():
+    packed = ContextPacker(token_budget=10, chars_per_token=4.0).pack([_document("1", "x" * 100)], k=4)
+    assert _texts(packed) == ["x" * 40]
+
+
+def test_k_limits_the_number_of_chunks():
+    documents = [_document(str(number), f"chunk number {number}") for number in range(10)]
+    assert len(ContextPacker().pack(documents, k=3)) == 3
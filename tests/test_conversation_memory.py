@@ -0,0 +1,46 @@
+from src.conversation_memory import ConversationMemory
+
+
+def _turn(number, chars=36):
+    # a question of 4 and an answer of 36 characters are 10 tokens
+    return f"q{number:03d}", "a" * chars
+
+
+def test_turns_within_the_budget_are_kept():
+    memory = ConversationMemory(token_budget=30)
+    for number in range(3):
+        memory.add(*_turn(number))
+    assert len(memory) == 3 and memory.estimate_tokens() == 30 and memory.dropped == 0
+
+
+def test_the_oldest_turns_are_dropped_down_to_the_trim_share():
+    memory = ConversationMemory(token_budget=30, trim_to=0.5)
+    for number in range(4):
+        memory.add(*_turn(number))
+    assert [question for question, _ in memory.pairs()] == ["q003"]
+    assert memory.dropped == 3
+
+
+def test_the_start_of_the_history_stays_the_same_after_a_trim():
+    memory = ConversationMemory(token_budget=40, trim_to=0.5)
+    starts = []
+    for number in range(8):
+        memory.add(*_turn(number))
+        starts.append(memory.turns[0].question)
+    # a trim drops several turns at once, so the first turn changes only every few turns
+    assert starts == ["q000", "q000", "q000", "q000", "q003", "q003", "q003", "q006"]
+
+
+def test_a_turn_longer_than_the_budget_is_cut():
+    memory = ConversationMemory(token_budget=10)
+    memory.add("question", "a" * 200)
+    assert memory.turns[0].question == "question"
+    assert memory.estimate_tokens() == 10
+
+
+def test_clear_and_messages():
+    memory = ConversationMemory()
+    memory.add("question", "answer")
+    assert [message.content for message in memory.messages()] == ["question", "answer"]
+    memory.clear()
+    assert memory.pairs() == [] and memory.messages() == []
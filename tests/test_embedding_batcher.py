@@ -0,0 +1,21 @@
+import pytest
+from argparse import ArgumentTypeError
+from src.arguments.common import positive_int
+from src.embedding_batcher import EmbeddingBatcher
+
+
+@pytest.mark.parametrize("value", ["0", "-3", "x"])
+def test_positive_int_rejects_values_below_one(value):
+    with pytest.raises(ArgumentTypeError):
+        positive_int(value)
+
+
+def test_positive_int_accepts_one():
+    assert positive_int("1") == 1
+
+
+@pytest.mark.parametrize("kwargs", [{"batch_size": 0}, {"max_inflight": 0}])
+def test_batcher_rejects_an_empty_batch_or_queue(kwargs):
+    # a batch size of 0 would flush empty batches forever
+    with pytest.raises(ValueError):
+        EmbeddingBatcher(None, **kwargs)
@@ -0,0 +1,64 @@
+from types import SimpleNamespace
+from langchain_core.documents import Document
+from src.embeding_manager import EmbeddingManager, PreparedContent
+
+
+class _FakeCollection:
+    def __init__(self, ids_by_source):
+        self.ids_by_source = ids_by_source
+        self.deleted_ids = []
+
+    def get(self, where, include):
+        return {"ids": list(self.ids_by_source.get(where["source"], []))}
+
+    def delete(self, ids):
+        self.deleted_ids.extend(ids)
+
+
+def _manager(tmp_path, collection):
+    manager = EmbeddingManager(ollama_base_url="http://127.0.0.1:9", chroma_db_name="docs", chroma_db_path=str(tmp_path))
+    manager._vectorstore = SimpleNamespace(_collection=collection)
+    return manager
+
+
+def _prepared(texts, update_existing=True):
+    splits = [Document(page_content=text, metadata={"source": "a.md"}) for text in texts]
+    return PreparedContent("a.md", "checksum", update_existing, splits, EmbeddingManager.chunk_ids("a.md", splits))
+
+
+def test_chunk_ids_depend_on_the_text_and_its_occurrence():
+    first, second, repeated = _prepared(["one", "two", "one"]).ids
+    assert _prepared(["two", "one"]).ids == [second, first]
+    assert len({first, second, repeated}) == 3
+    assert EmbeddingManager.chunk_ids("b.md", [Document(page_content="one")]) != [first]
+
+
+def test_only_the_changed_chunks_are_deleted_and_added(tmp_path):
+    stored = _prepared(["kept", "removed"])
+    collection = _FakeCollection({"a.md": stored.ids})
+    prepared = _prepared(["kept", "added"])
+
+    splits, ids, kept_ids = _manager(tmp_path, collection).update_stored_chunks(prepared)
+
+    assert [split.page_content for split in splits] == ["added"]
+    assert ids == [prepared.ids[1]]
+    assert kept_ids == [stored.ids[0]]
+    assert collection.deleted_ids == [stored.ids[1]]
+
+
+def test_a_new_file_is_added_without_a_lookup(tmp_path):
+    collection = _FakeCollection({})
+    prepared = _prepared(["one", "two"], update_existing=False)
+
+    assert _manager(tmp_path, collection).update_stored_chunks(prepared) == (prepared.splits, prepared.ids, [])
+    assert collection.deleted_ids == []
+
+
+def test_a_chunk_update_marks_the_version_without_writing_it(tmp_path):
+    stored = _prepared(["removed"])
+    manager = _manager(tmp_path, _FakeCollection({"a.md": stored.ids}))
+
+    manager.update_stored_chunks(_prepared(["added"]))
+
+    assert manager.index_version.read() == ""
+    assert manager.index_version.commit() is not None
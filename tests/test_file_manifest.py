@@ -0,0 +1,77 @@
+import os
+from src.checksum import calculate_checksum
+from src.file_manifest import FileManifest
+from src.files_processor import FilesProcessor
+
+
+class _FakeEmbedding:
+    def __init__(self, prepared=None):
+        self.prepared = prepared
+        self.prepared_paths = []
+
+    def prepare_content_from_path(self, file_path, checksum, reload, stored_checksums=None):
+        self.prepared_paths.append(file_path)
+        return self.prepared
+
+
+def _fail_to_hash(file_path):
+    raise AssertionError(f"{file_path} was hashed")
+
+
+def _processor(tmp_path, embedding, manifest):
+    return FilesProcessor(embedding, str(tmp_path), [".md"], [], manifest=manifest)
+
+
+def _file(tmp_path, text="some text"):
+    path = tmp_path / "a.md"
+    path.write_text(text)
+    return str(path)
+
+
+def test_manifest_entries_survive_a_reopen(tmp_path):
+    file_path = _file(tmp_path)
+    with FileManifest(str(tmp_path / "db" / "manifest.sqlite3")) as manifest:
+        manifest.put(file_path, os.stat(file_path), "checksum")
+        manifest.put("gone.md", os.stat(file_path), "other")
+        manifest.remove("gone.md")
+    with FileManifest(str(tmp_path / "db" / "manifest.sqlite3")) as manifest:
+        assert manifest.paths() == [file_path]
+        assert manifest.get(file_path).checksum == "checksum"
+        assert manifest.get(file_path).matches(os.stat(file_path))
+
+
+def test_an_unchanged_file_is_skipped_without_hashing(tmp_path, monkeypatch):
+    file_path = _file(tmp_path)
+    embedding = _FakeEmbedding()
+    with FileManifest(str(tmp_path / "manifest.sqlite3")) as manifest:
+        manifest.put(file_path, os.stat(file_path), calculate_checksum(file_path))
+        processor = _processor(tmp_path, embedding, manifest)
+        monkeypatch.setattr(processor, "_calculate_checksum", _fail_to_hash)
+
+        assert processor._prepare_file(file_path, os.stat(file_path), {}) is None
+    assert embedding.prepared_paths == []
+    assert processor.stats.to_dict()["counters"]["files_skipped"] == 1
+
+
+def test_a_touched_file_with_the_same_content_only_refreshes_its_entry(tmp_path):
+    file_path = _file(tmp_path)
+    embedding = _FakeEmbedding()
+    with FileManifest(str(tmp_path / "manifest.sqlite3")) as manifest:
+        manifest.put(file_path, os.stat(file_path), calculate_checksum(file_path))
+        os.utime(file_path, ns=(1, 1))
+
+        assert _processor(tmp_path, embedding, manifest)._prepare_file(file_path, os.stat(file_path), {}) is None
+        assert manifest.get(file_path).mtime_ns == 1
+    assert embedding.prepared_paths == []
+
+
+def test_a_changed_file_kept_without_reload_is_not_recorded(tmp_path):
+    file_path = _file(tmp_path)
+    embedding = _FakeEmbedding(prepared=None)
+    with FileManifest(str(tmp_path / "manifest.sqlite3")) as manifest:
+        processor = _processor(tmp_path, embedding, manifest)
+
+        assert processor._prepare_file(file_path, os.stat(file_path), {file_path: "old checksum"}) is None
+        assert manifest.get(file_path) is None
+        processor._prepare_file(file_path, os.stat(file_path), {file_path: calculate_checksum(file_path)})
+        assert manifest.get(file_path) is not None
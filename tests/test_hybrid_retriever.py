@@ -0,0 +1,49 @@
+import os
+from typing import List
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from src.hybrid_retriever import HybridRetriever, document_key, reciprocal_rank_fusion
+from src.keyword_index import KeywordIndex
+
+
+class _FixedRetriever(BaseRetriever):
+    documents: List[Document]
+
+    def _get_relevant_documents(self, query, *, run_manager):
+        return self.documents
+
+
+def _documents(*names):
+    return [Document(id=name, page_content=f"text of {name}", metadata={"source": f"{name}.md"}) for name in names]
+
+
+def test_a_document_of_both_lists_wins():
+    fused = reciprocal_rank_fusion([_documents("a", "b", "c"), _documents("c", "d")], [1.0, 1.0], rrf_k=60)
+    assert [document.id for document in fused] == ["c", "a", "b", "d"]
+
+
+def test_weights_decide_between_equal_ranks():
+    fused = reciprocal_rank_fusion([_documents("a"), _documents("b")], [1.0, 2.0])
+    assert [document.id for document in fused] == ["b", "a"]
+
+
+def test_a_fused_document_is_the_one_of_the_first_list():
+    vector_document = Document(id="a", page_content="vector text")
+    fused = reciprocal_rank_fusion([[vector_document], _documents("a")], [1.0, 1.0])
+    assert fused == [vector_document]
+
+
+def test_documents_without_an_id_are_told_apart_by_source_and_text():
+    first = Document(page_content="same", metadata={"source": "a.md"})
+    assert document_key(first) == document_key(Document(page_content="same", metadata={"source": "a.md"}))
+    assert document_key(first) != document_key(Document(page_content="same", metadata={"source": "b.md"}))
+
+
+def test_the_keyword_hit_is_fused_into_the_vector_results(tmp_path):
+    index = KeywordIndex(os.path.join(tmp_path, "keywords.sqlite3"))
+    try:
+        index.upsert(["a", "e"], ["a.md", "e.md"], ["text of a", "the ERR_CONN_RESET error"])
+        retriever = HybridRetriever(vector_retriever=_FixedRetriever(documents=_documents("a", "b", "c")), keyword_index=index, k=2)
+        assert [document.id for document in retriever.invoke("ERR_CONN_RESET")] == ["a", "e"]
+    finally:
+        index.close()
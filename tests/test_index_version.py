@@ -0,0 +1,21 @@
+from src.index_version import IndexVersion
+
+
+def test_a_version_is_bumped_once_for_many_changes(tmp_path):
+    version = IndexVersion(str(tmp_path / "docs.version"))
+    assert version.commit() is None and version.read() == ""
+
+    version.mark_changed()
+    version.mark_changed()
+    assert version.read() == ""
+    bumped = version.commit()
+
+    assert bumped and version.read() == bumped
+    assert version.commit() is None and version.read() == bumped
+
+
+def test_a_bump_clears_the_changes(tmp_path):
+    version = IndexVersion(str(tmp_path / "docs.version"))
+    version.mark_changed()
+    bumped = version.bump()
+    assert version.commit() is None and version.read() == bumped
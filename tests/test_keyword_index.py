@@ -0,0 +1,38 @@
+import os
+from src.keyword_index import KeywordIndex
+
+
+def _index(tmp_path, texts):
+    index = KeywordIndex(os.path.join(tmp_path, "keywords.sqlite3"))
+    index.upsert([f"chunk-{number}" for number in range(len(texts))],
+                 [f"doc_{number}.md" for number in range(len(texts))],
+                 texts)
+    return index
+
+
+def test_small_index_finds_a_rare_identifier(tmp_path):
+    index = _index(tmp_path, [f"the connection of chunk {number} is fine" for number in range(9)] +
+                   ["the connection failed with ERR_CONN_RESET"])
+    try:
+        hits = index.search("ERR_CONN_RESET")
+        assert [hit.chunk_id for hit in hits] == ["chunk-9"]
+    finally:
+        index.close()
+
+
+def test_small_index_keeps_a_repeated_identifier(tmp_path):
+    index = _index(tmp_path, [f"report {number}: ERR_DISK_FULL seen" if number % 4 == 0 else f"report {number}: all good"
+                              for number in range(40)])
+    try:
+        assert {hit.chunk_id for hit in index.search("ERR_DISK_FULL")} == {f"chunk-{number}" for number in range(0, 40, 4)}
+    finally:
+        index.close()
+
+
+def test_common_terms_are_dropped_from_a_large_index(tmp_path):
+    index = _index(tmp_path, [f"the chunk number {number}" for number in range(400)])
+    try:
+        assert index.search("the") == []
+        assert [hit.chunk_id for hit in index.search("the 123")] == ["chunk-123"]
+    finally:
+        index.close()
@@ -0,0 +1,46 @@
+import pytest
+from src.path_filter import PathFilter
+
+
+@pytest.mark.parametrize("pattern, path, matches", [
+    ("*.md", "a.md", True),
+    ("*.md", "docs/deep/a.md", True),
+    ("docs/*.md", "docs/a.md", True),
+    ("docs/*.md", "docs/deep/a.md", False),
+    ("docs/*.md", "other/docs/a.md", False),
+    ("/a.md", "a.md", True),
+    ("/a.md", "docs/a.md", False),
+    ("docs/**/*.md", "docs/a.md", True),
+    ("docs/**/*.md", "docs/x/y/a.md", True),
+    ("**/a.md", "x/y/a.md", True),
+    ("a?.md", "ab.md", True),
+    ("a?.md", "a/.md", False),
+    ("[ab].md", "b.md", True),
+    ("[!ab].md", "b.md", False),
+    ("[!ab].md", "c.md", True),
+    ("a+b.md", "a+b.md", True),
+    ("a+b.md", "aab.md", False),
+])
+def test_include_patterns(pattern, path, matches):
+    assert PathFilter(include=[pattern]).includes_file(path) is matches
+
+
+def test_a_folder_pattern_excludes_folders_only():
+    path_filter = PathFilter(exclude=["build/"])
+    assert path_filter.excludes_folder("build")
+    assert path_filter.excludes_folder("src/build")
+    assert path_filter.includes_file("build")
+
+
+def test_exclude_wins_over_include():
+    path_filter = PathFilter(include=["**/*.md"], exclude=["drafts/*.md", "node_modules"])
+    assert path_filter.includes_file("docs/a.md")
+    assert not path_filter.includes_file("drafts/a.md")
+    assert path_filter.excludes_folder("web/node_modules")
+    assert not path_filter.includes_file("a.txt")
+
+
+def test_no_pattern_includes_everything():
+    assert not PathFilter()
+    assert PathFilter().includes_file("any/file.txt")
+    assert not PathFilter().excludes_folder("any")
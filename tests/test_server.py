@@ -0,0 +1,70 @@
+import asyncio
+import json
+import pytest
+from langchain_core.documents import Document
+from src.LLM import TalkStream
+from src.server import ChatServer
+
+
+class _FakeLLM:
+    def __init__(self, sources, tokens, timings=None):
+        self.sources = sources
+        self.tokens = tokens
+        self.timings = timings
+
+    def stream_talk(self, prompt, memory=None):
+        return TalkStream(self.sources, iter(self.tokens), self.timings)
+
+
+async def _send(llm, request):
+    server = ChatServer(llm, port=0)
+    await server.start()
+    try:
+        reader, writer = await asyncio.open_connection(server.host, server.port)
+        writer.write(request)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response
+    finally:
+        await server.close()
+
+
+async def _post_chat(llm, stream):
+    body = json.dumps({"prompt": "question", "stream": stream}).encode("utf-8")
+    return await _send(llm, b"POST /chat HTTP/1.1\r\nHost: test\r\nContent-Type: application/json\r\n"
+                            b"Content-Length: " + str(len(body)).encode("ascii") + b"\r\n\r\n" + body)
+
+
+def _chunks(response):
+    head, _, body = response.partition(b"\r\n\r\n")
+    messages = []
+    while True:
+        size, _, body = body.partition(b"\r\n")
+        if int(size, 16) == 0:
+            assert body == b"\r\n"
+            return head, messages
+        messages.append(json.loads(body[:int(size, 16)]))
+        body = body[int(size, 16) + 2:]
+
+
+def test_a_failure_after_the_headers_ends_the_stream_with_an_error():
+    # a set in the metadata can not be serialized, it fails once the status line is sent
+    llm = _FakeLLM([Document(page_content="text", metadata={"source": {"a.md"}})], ["answer"])
+    head, messages = _chunks(asyncio.run(_post_chat(llm, stream=True)))
+    assert head.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert len(messages) == 1 and "error" in messages[0]
+
+
+def test_an_answer_without_timings_is_sent():
+    llm = _FakeLLM([Document(page_content="text", metadata={"source": "a.md"})], ["an ", "answer"])
+    head, _, body = asyncio.run(_post_chat(llm, stream=False)).partition(b"\r\n\r\n")
+    assert head.startswith(b"HTTP/1.1 200 OK\r\n")
+    assert json.loads(body) == {"answer": "an answer", "sources": [{"source": "a.md", "content": "text"}], "timings": None}
+
+
+@pytest.mark.parametrize("length, status", [(b"abc", b"400"), (b"-1", b"400"), (b"1073741824", b"413")])
+def test_an_invalid_or_too_large_content_length_is_rejected(length, status):
+    request = b"POST /chat HTTP/1.1\r\nHost: test\r\nContent-Length: " + length + b"\r\n\r\n"
+    response = asyncio.run(_send(_FakeLLM([], []), request))
+    assert response.startswith(b"HTTP/1.1 " + status + b" ")
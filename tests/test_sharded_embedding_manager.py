@@ -0,0 +1,28 @@
+import pytest
+from src.embeding_manager import EmbeddingManager
+from src.sharded_embedding_manager import ShardedEmbeddingManager
+
+
+def _factory(chroma_db_path):
+    return lambda name: EmbeddingManager(ollama_base_url="http://127.0.0.1:9", chroma_db_name=name, chroma_db_path=chroma_db_path)
+
+
+def test_hash_sharding_needs_a_shard(tmp_path):
+    with pytest.raises(ValueError):
+        ShardedEmbeddingManager(str(tmp_path), "hash", 0, "docs", str(tmp_path / "db"), _factory(str(tmp_path / "db")))
+
+
+def test_reads_and_deletes_do_not_create_a_shard(tmp_path):
+    chroma_db_path = str(tmp_path / "db")
+    (tmp_path / "docs").mkdir()
+    file_path = tmp_path / "docs" / "a.md"
+    file_path.write_text("some text to split")
+    manager = ShardedEmbeddingManager(str(tmp_path), "directory", 1, "docs", chroma_db_path, _factory(chroma_db_path))
+
+    assert manager.find_documents_in_vectorstore(str(file_path)) == []
+    assert manager._delete_documents_by_paths([str(file_path)]) == 0
+    prepared = manager.prepare_content_from_path(str(file_path), "checksum", reload=False)
+
+    assert [split.page_content for split in prepared.splits] == ["some text to split"]
+    assert manager.shard_names() == []
+    assert ShardedEmbeddingManager.read_collections(chroma_db_path, "docs") is None